@@ -0,0 +1,57 @@
+import os
+import sys
+import tempfile
+import argparse
+
+from benchmarks import serving, cleaning, artifacts, models
+
+
+BENCHMARKS = {
+    'recommender': serving.benchmark_recommender,
+    'batch': serving.benchmark_batch,
+    'pivot': artifacts.benchmark_pivot,
+    'neighbours': artifacts.benchmark_neighbours,
+    'artifacts': artifacts.benchmark_artifacts,
+    'cleaning': cleaning.benchmark_cleaning,
+    'age': cleaning.benchmark_age,
+    'location': cleaning.benchmark_location,
+    'parquet': cleaning.benchmark_parquet,
+    'filter': cleaning.benchmark_filter,
+    'svd': models.benchmark_svd,
+    'items': models.benchmark_items,
+    'ann': models.benchmark_ann,
+    'incremental': artifacts.benchmark_incremental,
+    'stages': artifacts.benchmark_stages,
+    'parallel': artifacts.benchmark_parallel,
+    'similarity': artifacts.benchmark_similarity,
+    'tuning': models.benchmark_tuning,
+    'service': serving.benchmark_service,
+    'precomputed': serving.benchmark_precomputed,
+    'coldstart': serving.benchmark_coldstart,
+    'als': models.benchmark_als,
+    'spark': artifacts.benchmark_spark,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic benchmarks and parity checks")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--users', type=int, default=600)
+    parser.add_argument('--books', type=int, default=1500)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--block-size', type=int, default=256)
+    parser.add_argument('--jobs', type=int, default=2)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--ratings', type=int, default=1000000)
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet')
+    parser.add_argument('--tastes', type=int, default=50)
+    args = parser.parse_args()
+
+    # Benchmarks write their artifacts to a scratch directory, never to ./artifacts
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        passed = BENCHMARKS[args.benchmark](args)
+
+    sys.exit(0 if passed else 1)
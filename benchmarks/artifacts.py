@@ -0,0 +1,525 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from src.utils import save_object
+from tests.synthetic import make_synthetic_data, make_raw_data, build_artifacts, split_delta
+from tests.legacy import legacy_top_recommendations, build_legacy_artifacts
+from benchmarks.utils import directory_size
+
+
+def benchmark_pivot(args):
+    """
+    Compares the dense pivot_table(...).fillna(0) user-item matrix with the sparse
+    matrix built from factorized ids, at several filter thresholds, and checks that
+    the recommender serves the same results from the sparse artifact.
+    """
+    from src.components.matrix import user_item_bundle
+    from src.components.recommender import BookRecommendationSystem
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, ratings_per_user=(5, 450), seed=args.seed)
+    print(f"ratings={len(data)}")
+    print(f"{'filter':>8} {'shape':>12} {'dense MB':>9} {'dense s':>8} {'sparse MB':>10} {'sparse s':>9} {'equal':>6}")
+
+    passed = True
+    for min_user, min_book in [(200, 50), (100, 20), (50, 10), (10, 5), (1, 1)]:
+        users = data.loc[data.groupby('User-ID')['Book-Rating'].transform('count') >= min_user]
+        filtered = users.loc[users.groupby('Book-Title')['Book-Rating'].transform('count') >= min_book]
+
+        start = time.perf_counter()
+        dense = filtered.pivot_table(index='User-ID', columns='Book-Title', values='Book-Rating').fillna(0)
+        dense_time = time.perf_counter() - start
+        dense_mb = dense.memory_usage(deep=True).sum() / 1e6
+
+        start = time.perf_counter()
+        sparse = user_item_bundle(filtered)
+        sparse_time = time.perf_counter() - start
+        matrix = sparse['matrix']
+        sparse_mb = (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 1e6
+
+        equal = (np.array_equal(dense.index.to_numpy(), sparse['user_ids'])
+                 and np.array_equal(dense.columns.to_numpy(), sparse['book_titles'])
+                 and np.allclose(dense.to_numpy(), matrix.toarray()))
+        passed = passed and equal
+        print(f"{min_user:>4}/{min_book:<3} {str(matrix.shape):>12} {dense_mb:9.1f} {dense_time:8.3f} "
+              f"{sparse_mb:10.2f} {sparse_time:9.3f} {str(equal):>6}")
+
+    # The recommender must serve the same results from the sparse artifact
+    final_filtered_data, user_item_matrix, user_similarity_matrix = build_legacy_artifacts(data)
+    save_object(os.path.join('artifacts', 'user_item_matrix.pkl'), user_item_bundle(final_filtered_data))
+    recommender = BookRecommendationSystem()
+    mismatches = sum(
+        legacy_top_recommendations(final_filtered_data, user_item_matrix, user_similarity_matrix, user_id)
+        != recommender.get_top_recommendations(user_id)
+        for user_id in user_item_matrix.index[:args.requests]
+    )
+    print(f"recommendation mismatches from the sparse artifact: {mismatches}")
+
+    return passed and mismatches == 0
+
+
+def benchmark_neighbours(args):
+    """
+    Compares the blocked top-k user neighbour build with the full users x users cosine
+    matrix (time and peak traced memory), and checks that the recommender serves the
+    same results from the neighbour table.
+    """
+    import tracemalloc
+    from sklearn.metrics.pairwise import cosine_similarity
+    from src.components.matrix import user_item_bundle
+    from src.components.scoring import top_k_rows
+    from src.components.similarity import top_k_cosine
+    from src.components.recommender import BookRecommendationSystem
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed)
+    final_filtered_data, user_item_matrix, user_similarity_matrix = build_legacy_artifacts(data)
+    matrix = user_item_bundle(final_filtered_data)['matrix']
+    n_users = matrix.shape[0]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    full = cosine_similarity(matrix)
+    reference = top_k_rows(full, args.k, exclude=np.arange(n_users))
+    full_time = time.perf_counter() - start
+    full_peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    del full
+
+    print(f"users={n_users} books={matrix.shape[1]} k={args.k}")
+    print(f"full N x N matrix   : {full_time:6.3f} s  peak {full_peak:7.1f} MB")
+
+    passed = True
+    for block_size in (64, 256, 1024):
+        tracemalloc.start()
+        start = time.perf_counter()
+        indices, scores = top_k_cosine(matrix, k=args.k, block_size=block_size)
+        block_time = time.perf_counter() - start
+        block_peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+
+        equal = np.array_equal(indices, reference)
+        passed = passed and equal
+        print(f"blocks of {block_size:<5}     : {block_time:6.3f} s  peak {block_peak:7.1f} MB  equal={equal}")
+
+    save_object(os.path.join('artifacts', 'user_item_matrix.pkl'), user_item_bundle(final_filtered_data))
+    save_object(os.path.join('artifacts', 'user_neighbours.pkl'), {'indices': indices, 'scores': scores})
+    recommender = BookRecommendationSystem()
+    mismatches = sum(
+        legacy_top_recommendations(final_filtered_data, user_item_matrix, user_similarity_matrix, user_id)
+        != recommender.get_top_recommendations(user_id)
+        for user_id in user_item_matrix.index[:args.requests]
+    )
+    print(f"recommendation mismatches from the neighbour table: {mismatches}")
+
+    return passed and mismatches == 0
+
+
+def benchmark_artifacts(args):
+    """
+    Compares recommender startup from pickled artifacts with startup from the
+    memory-mapped array store, and checks that both serve the same results. The store
+    is slower to open at the default size (about 2.6 ms against 0.9 ms) and on par
+    around --users 6000 --books 12000, its gain is shared, lazily read memory.
+    """
+    import shutil
+    from src.utils import load_arrays
+    from src.components.helper import Helper
+    from src.components.recommender import BookRecommendationSystem
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed)
+    os.makedirs('artifacts', exist_ok=True)
+    data.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+
+    helper = Helper()
+    filtered = helper.filter_data()
+    helper.book_catalog(filtered_data=filtered)
+    user_item_matrix = helper.pivot_table_data(filtered_data=filtered)
+    helper.user_neighbours(pivot_table=user_item_matrix)
+
+    def startup_time():
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            recommender = BookRecommendationSystem()
+            timings.append(time.perf_counter() - start)
+        return recommender, min(timings)
+
+    store_backed, store_time = startup_time()
+
+    # Same artifacts as legacy pickles
+    for name in ('book_catalog', 'user_item_matrix', 'user_neighbours'):
+        path = os.path.join('artifacts', name)
+        arrays = {key: np.array(value) if isinstance(value, np.ndarray) else value.copy()
+                  for key, value in load_arrays(path, mmap_mode=None).items()}
+        shutil.rmtree(path)
+        save_object(path + '.pkl', arrays)
+
+    pickle_backed, pickle_time = startup_time()
+
+    user_ids = list(store_backed.user_ids[:args.requests])
+    mismatches = sum(store_backed.get_top_recommendations(user_id) != pickle_backed.get_top_recommendations(user_id)
+                     for user_id in user_ids)
+
+    print(f"users={len(store_backed.user_ids)} books={len(store_backed.book_titles)}")
+    print(f"startup from pickles      : {1000 * pickle_time:7.1f} ms")
+    print(f"startup from mmap store   : {1000 * store_time:7.1f} ms ({store_time / pickle_time:.1f}x the pickles)")
+    print(f"mismatches                : {mismatches}")
+
+    return mismatches == 0
+
+
+def benchmark_incremental(args):
+    """
+    Folds a delta of new ratings into existing artifacts with Helper.update_artifacts
+    and checks the result against a full rebuild on the same ratings: identical
+    filtered ratings, catalog and matrix, same neighbour similarities and similarity
+    matrix. SVD factors cannot match a retrain, their RMSE is reported instead.
+    """
+    import shutil
+    from src.utils import load_object
+    from src.components.helper import Helper
+    from src.components.ratings import ratings_frame
+    from src.components.factors import svd_scores
+    from src.components.incremental import id_positions, warm_start_factors
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed,
+                               n_tastes=args.tastes, taste_boost=100.0)
+    base, delta = split_delta(data, args.seed)
+
+    def run_full(frame, directory):
+        os.makedirs(directory, exist_ok=True)
+        os.makedirs('artifacts', exist_ok=True)
+        frame.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+        start = time.perf_counter()
+        build_artifacts(Helper())
+        elapsed = time.perf_counter() - start
+        shutil.copytree('artifacts', directory, dirs_exist_ok=True)
+        shutil.rmtree('artifacts')
+        return elapsed
+
+    full_time = run_full(pd.concat([base, delta]), 'full')
+    run_full(base, 'incremental')
+    delta.to_csv('delta.csv', index=False)
+
+    shutil.copytree('incremental', 'artifacts')
+    start = time.perf_counter()
+    summary = Helper(load_data=False).update_artifacts(delta_data_path='delta.csv', svd_epochs=3)
+    incremental_time = time.perf_counter() - start
+
+    load = lambda directory, name: load_object(os.path.join(directory, name))
+    full = {name: load('full', name) for name in ('final_filtered_data', 'book_catalog', 'user_item_matrix',
+                                                  'user_neighbours', 'item_neighbours', 'similarity_scores', 'svd_factors')}
+    incremental = {name: load('artifacts', name) for name in full}
+
+    checks = {
+        'filtered ratings': ratings_frame(full['final_filtered_data']).astype(str).equals(
+            ratings_frame(incremental['final_filtered_data']).astype(str)),
+        'book catalog': all(np.array_equal(full['book_catalog'][key], incremental['book_catalog'][key])
+                            for key in full['book_catalog']),
+        'user-item matrix': (np.array_equal(full['user_item_matrix']['user_ids'], incremental['user_item_matrix']['user_ids'])
+                             and np.array_equal(full['user_item_matrix']['book_titles'], incremental['user_item_matrix']['book_titles'])
+                             and (full['user_item_matrix']['matrix'] != incremental['user_item_matrix']['matrix']).nnz == 0),
+        'user neighbours': np.allclose(full['user_neighbours']['scores'], incremental['user_neighbours']['scores'], atol=1e-6),
+        'item neighbours': np.allclose(full['item_neighbours']['scores'], incremental['item_neighbours']['scores'], atol=1e-6),
+        'similarity scores': np.allclose(full['similarity_scores']['similarity'], incremental['similarity_scores']['similarity'], atol=1e-6),
+    }
+    for name in ('user_neighbours', 'item_neighbours'):
+        same = (full[name]['indices'] == incremental[name]['indices']).mean()
+        print(f"{name} identical indices : {same:.4f}")
+
+    # RMSE of the factors on the delta ratings and on every filtered rating
+    table = incremental['final_filtered_data']
+    previous = load_object(os.path.join('incremental', 'svd_factors'))
+    previous_bundle = load_object(os.path.join('incremental', 'user_item_matrix'))
+    carried = warm_start_factors(previous, id_positions(previous_bundle['user_ids'], table['user_ids']),
+                                 id_positions(np.asarray(previous_bundle['book_titles']).astype(str),
+                                              np.asarray(table['book_titles']).astype(str)), table, n_epochs=0)
+    users_codes, book_codes = np.asarray(table['user_codes']), np.asarray(table['book_codes'])
+    ratings = np.asarray(table['ratings'], dtype=np.float64)
+    in_delta_rows = np.isin(np.asarray(table['user_ids'])[users_codes], delta['User-ID'].unique())
+
+    def rmse(factors, rows):
+        estimates = np.concatenate([svd_scores(factors, users_codes[rows][start:start + 1024])[
+            np.arange(len(rows[start:start + 1024])), book_codes[rows][start:start + 1024]]
+            for start in range(0, len(rows), 1024)])
+        return np.sqrt(np.mean((estimates - ratings[rows]) ** 2))
+
+    delta_rows = np.flatnonzero(in_delta_rows)
+    all_rows = np.arange(len(ratings))
+    print(f"full rebuild       : {full_time:7.2f} s")
+    print(f"incremental update : {incremental_time:7.2f} s  {summary}")
+    for name, factors in (('previous factors', carried), ('warm start', incremental['svd_factors']),
+                          ('full retrain', full['svd_factors'])):
+        print(f"svd {name:<16}: rmse delta users {rmse(factors, delta_rows):.3f}  all {rmse(factors, all_rows):.3f}")
+    for name, passed in checks.items():
+        print(f"{name:<18}: {passed}")
+
+    return all(checks.values())
+
+
+def benchmark_stages(args):
+    """
+    Runs the cleaning and artifacts stage DAGs cold, then again unchanged, then with one
+    changed input (Users.csv) or parameter (svd n_factors), and checks that only the
+    affected stages run, that a cached run restores the same artifacts and that the
+    cleaned data matches an uncached run.
+    """
+    from src.utils import load_object, artifacts_fingerprint
+    from src.components.helper import Helper
+    from src.components.datacleaning import DataIngestion, read_cleaned_data
+    from src.components.stagecache import StagePipeline
+
+    def run(stages, label, **params):
+        start = time.perf_counter()
+        report = StagePipeline(stages, **params).run()
+        elapsed = time.perf_counter() - start
+        ran = [entry['stage'] for entry in report if entry['status'] == 'ran']
+        print(f"{label:<28}: {elapsed:7.2f} s  ran {ran if len(ran) < len(report) else 'every stage'}")
+        return set(ran)
+
+    checks = {}
+
+    # Cleaning pipeline
+    make_raw_data(n_ratings=args.ratings, seed=args.seed)
+    ingestion = DataIngestion()
+    output = ingestion.ingestion_config.cleaned_parquet_path
+    run(ingestion.cleaning_stages(), "cleaning cold")
+    checks['cleaning warm skips all'] = run(ingestion.cleaning_stages(), "cleaning warm") == set()
+
+    users = pd.read_csv(ingestion.ingestion_config.users_data_path)
+    users.loc[0, 'Age'] = 33
+    users.to_csv(ingestion.ingestion_config.users_data_path, index=False)
+    checks['users change'] = run(ingestion.cleaning_stages(), "cleaning Users.csv changed") == {
+        'ingest_users', 'split_location', 'merge', 'impute_age', 'save'}
+    cached_output = read_cleaned_data(output)
+    run(ingestion.cleaning_stages(), "cleaning without cache", use_cache=False)
+    checks['cleaned data'] = cached_output.equals(read_cleaned_data(output))
+
+    # Artifacts pipeline
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed)
+    os.remove(output)
+    data.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+    helper = Helper(load_data=False)
+    svd_params = helper.helper_config.svd_params
+    factors_path = helper.helper_config.svd_factors_path
+
+    run(helper.artifact_stages(), "artifacts cold")
+    cold_factors = artifacts_fingerprint([factors_path])
+    checks['artifacts warm skips all'] = run(helper.artifact_stages(), "artifacts warm") == set()
+    checks['svd params change'] = run(helper.artifact_stages(svd_params=dict(svd_params, n_factors=50)),
+                                      "artifacts svd n_factors=50") == {'svd', 'recommendations'}
+    checks['svd factors changed'] = load_object(factors_path)['user_factors'].shape[1] == 50
+    checks['svd params back'] = run(helper.artifact_stages(), "artifacts svd n_factors=100") == set()
+    checks['svd factors restored'] = artifacts_fingerprint([factors_path]) == cold_factors
+
+    # Eviction keeps the entries of the last run only when the budget is tiny
+    pipeline = StagePipeline(helper.artifact_stages(), max_size_bytes=1)
+    before = sum(entry['size'] for entry in pipeline.entries())
+    pipeline.evict()
+    after = sum(entry['size'] for entry in pipeline.entries())
+    print(f"stage cache        : {before / 1e6:.1f} MB, {after / 1e6:.1f} MB after evicting to a 1 byte budget")
+    checks['eviction'] = after == 0
+
+    for name, passed in checks.items():
+        print(f"{name:<25}: {passed}")
+
+    return all(checks.values())
+
+
+def benchmark_parallel(args):
+    """
+    Builds the artifacts stage DAG uncached with one worker and with --jobs worker
+    processes, prints the per-stage timings and critical path of both runs and checks
+    that the deterministic artifacts are identical (the svd split is random).
+    """
+    import shutil
+    from src.utils import load_object
+    from src.components.helper import Helper
+    from src.components.stagecache import StagePipeline
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed)
+    os.makedirs('artifacts', exist_ok=True)
+    data.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+    print(f"ratings={len(data)} workers={args.jobs}")
+
+    names = ('final_filtered_data', 'book_catalog', 'user_item_matrix', 'similarity_scores', 'user_neighbours',
+             'item_neighbours', 'book_pivot')
+    results = {}
+    for n_workers in (1, args.jobs):
+        pipeline = StagePipeline(Helper(load_data=False).artifact_stages(), use_cache=False, n_workers=n_workers)
+        report = pipeline.run()
+        print(f"\n{n_workers} worker(s)")
+        for line in pipeline.format_report(report):
+            print(line)
+        results[n_workers] = {name: load_object(os.path.join('artifacts', name)) for name in names}
+        shutil.copytree('artifacts', f'artifacts_{n_workers}')
+
+    def same(first, second):
+        if isinstance(first, dict):
+            return first.keys() == second.keys() and all(same(first[key], second[key]) for key in first)
+        if hasattr(first, 'nnz'):
+            return first.shape == second.shape and (first != second).nnz == 0
+        return np.array_equal(first, second)
+
+    identical = all(same(results[1][name], results[args.jobs][name]) for name in names)
+    print(f"\nidentical artifacts: {identical}")
+    return identical
+
+
+def benchmark_similarity(args):
+    """
+    Compares the in-memory sklearn cosine_similarity with Helper.similarity_score, which
+    writes tiles straight into a memory-mapped store, in float64, float32, float16 and
+    top-k: time, peak traced memory, size on disk and largest error.
+    """
+    import tracemalloc
+    from sklearn.metrics.pairwise import cosine_similarity
+    from src.utils import load_object, save_arrays
+    from src.components.helper import Helper
+    from src.components.ratings import encode_ratings, filter_ratings, table_user_item_bundle
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed)
+    bundle = table_user_item_bundle(filter_ratings(encode_ratings(data), min_user_ratings=50, min_book_ratings=5))
+    book_matrix = bundle['matrix'].T.tocsr()
+    print(f"books={book_matrix.shape[0]} users={book_matrix.shape[1]} ratings={bundle['matrix'].nnz} "
+          f"block_size={args.block_size} jobs={args.jobs}")
+
+    helper = Helper(load_data=False)
+    path = helper.helper_config.similarity_scores_path
+
+    # The previous similarity_score: whole matrix in memory, then saved
+    tracemalloc.start()
+    start = time.perf_counter()
+    reference = cosine_similarity(book_matrix)
+    save_arrays(path, {'similarity': reference})
+    reference_time = time.perf_counter() - start
+    reference_peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    print(f"{'sklearn float64':<19}: {reference_time:6.2f} s  peak {reference_peak:8.1f} MB  "
+          f"size {directory_size(path) / 1e6:8.1f} MB")
+    top_reference = None
+    passed = True
+    for dtype, top_k, tolerance in (('float64', None, 1e-12), ('float32', None, 1e-6), ('float16', None, 1e-3),
+                                    ('float32', args.k, 1e-6)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        helper.similarity_score(bundle, dtype=dtype, top_k=top_k, block_size=args.block_size, n_jobs=args.jobs)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+
+        stored = load_object(path)
+        if top_k:
+            # Stored scores must be the reference similarities of the stored books
+            if top_reference is None:
+                top_reference = reference.copy()
+                np.fill_diagonal(top_reference, -np.inf)
+            rows = np.arange(len(stored['indices']))[:, None]
+            error = np.abs(top_reference[rows, stored['indices']] - stored['scores']).max()
+            kth = np.sort(top_reference, axis=1)[:, -top_k]
+            error = max(error, np.abs(stored['scores'][:, -1] - kth).max())
+        else:
+            error = max(np.abs(np.asarray(stored['similarity'][start_row:start_row + 1024], dtype=np.float64)
+                               - reference[start_row:start_row + 1024]).max()
+                        for start_row in range(0, len(reference), 1024))
+        label = f"blocked {dtype}" + (f" top{top_k}" if top_k else "")
+        print(f"{label:<19}: {elapsed:6.2f} s  peak {peak:8.1f} MB  size {directory_size(path) / 1e6:8.1f} MB  "
+              f"max error {error:.2e}")
+        passed = passed and error <= tolerance
+
+    return passed
+
+
+def benchmark_spark(args):
+    """
+    Builds the artifacts with the pandas stages and with the Spark local-mode builder
+    (see sparkbuilder.py) on the same synthetic ratings and checks that the ratings
+    tables, user-item matrix, top-k similarities, neighbour tables and cosine
+    recommendations are identical and that the Spark ALS model ranks held-out books
+    about as well. Then times every Spark stage with 1, 2, 4 and every core. Needs
+    pyspark and a Java runtime.
+    """
+    import shutil
+    import importlib.util
+    from src.utils import load_object, read_manifest
+    from src.components.helper import Helper
+    from src.components.stagecache import StagePipeline
+    from src.components.sparkbuilder import SparkArtifactsBuilder
+
+    if importlib.util.find_spec('pyspark') is None:
+        print("pyspark is not installed: pip install pyspark, with a Java runtime on the PATH")
+        return False
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed, n_tastes=args.tastes)
+    os.makedirs('artifacts', exist_ok=True)
+    data.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+    print(f"ratings={len(data)} cores={os.cpu_count()}")
+
+    names = ('ratings_table', 'final_filtered_data', 'book_catalog', 'user_item_matrix', 'similarity_scores',
+             'user_neighbours', 'item_neighbours')
+    similarity_params = {'top_k': args.k}
+    results, ndcg = {}, {}
+    for builder in ('pandas', 'spark'):
+        helper = Helper(load_data=False)
+        stages = helper.artifact_stages(similarity_params=similarity_params, builder=builder)
+        pipeline = StagePipeline(stages, use_cache=False, n_workers=1)
+        report = pipeline.run()
+        if builder == 'spark':
+            # The scaling runs below start sessions with other core counts
+            stages[0].func.__self__.stop()
+        print(f"\n{builder} builder")
+        for line in pipeline.format_report(report):
+            print(line)
+
+        results[builder] = {name: load_object(os.path.join('artifacts', name)) for name in names}
+        results[builder]['recommendations'] = {key: value for key, value in
+                                               load_object(helper.helper_config.user_recommendations_path).items()
+                                               if key.startswith('cosine_')}
+        ndcg[builder] = read_manifest(helper.helper_config.als_factors_path)['metadata']['ndcg@10']
+        shutil.copytree('artifacts', f'artifacts_{builder}')
+
+    def same(first, second):
+        if isinstance(first, dict):
+            return first.keys() == second.keys() and all(same(first[key], second[key]) for key in first)
+        if hasattr(first, 'nnz'):
+            return first.shape == second.shape and (first != second).nnz == 0
+        if first.dtype == object:
+            return first.shape == second.shape and (first.astype(str) == second.astype(str)).all()
+        return first.dtype == second.dtype and np.array_equal(first, second)
+
+    checks = {name: same(results['pandas'][name], results['spark'][name]) for name in names + ('recommendations',)}
+    print(f"\nals ndcg@10: pandas {ndcg['pandas']:.3f}, spark {ndcg['spark']:.3f}")
+    checks['als ndcg@10'] = ndcg['spark'] >= 0.9 * ndcg['pandas']
+
+    # Scaling of the Spark stages with the cores of the local session
+    print("\ncores  " + "  ".join(f"{name:>15}" for name in ('filter', 'pivot', 'similarity', 'user_neighbours',
+                                                           'item_neighbours', 'als')))
+    cleaned_data_path = os.path.join('artifacts', 'cleaned_data.csv')
+    for n_cores in sorted({1, 2, 4, os.cpu_count() or 1}):
+        builder = SparkArtifactsBuilder(Helper(load_data=False), n_cores=n_cores)
+        timings = []
+
+        def timed(func, *func_args, **params):
+            start = time.perf_counter()
+            result = func(*func_args, **params)
+            timings.append(time.perf_counter() - start)
+            return result
+
+        try:
+            # Session startup is not timed
+            builder.spark
+            filtered = timed(builder.filter_file, cleaned_data_path)
+            bundle = timed(builder.pivot_table_data, filtered)
+            timed(builder.similarity_score, bundle, top_k=args.k)
+            timed(builder.user_neighbours, bundle, n_neighbors=args.k)
+            timed(builder.item_neighbours, bundle, n_neighbors=args.k)
+            timed(builder.als_model, filtered)
+        finally:
+            builder.stop()
+        print(f"{n_cores:>5}  " + "  ".join(f"{elapsed:>13.2f} s" for elapsed in timings))
+
+    for name, passed in checks.items():
+        print(f"{name:<25}: {passed}")
+
+    return all(checks.values())
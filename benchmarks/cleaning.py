@@ -0,0 +1,249 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from src.utils import save_object
+from tests.synthetic import make_synthetic_data, make_raw_data
+from benchmarks.utils import directory_size
+
+
+def benchmark_cleaning(args):
+    """
+    Runs the data cleaning pipeline in batch and in streaming mode on synthetic raw
+    data, compares the cleaned outputs (CSV byte for byte, parquet by content) and
+    reports time and peak RSS.
+    """
+    import filecmp
+    import resource
+    import subprocess
+
+    make_raw_data(n_ratings=args.ratings, seed=args.seed)
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=repo_root)
+
+    def run(*extra_args):
+        # Peak RSS of children is cumulative, so the smaller run goes first
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'src.pipeline.datacleaningpipeline', '--no-cache', '--workers', '1',
+                        *extra_args],
+                       check=True, env=env)
+        elapsed = time.perf_counter() - start
+        return elapsed, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+    if args.format == 'parquet':
+        from src.components.datacleaning import read_cleaned_data
+        output = os.path.join('artifacts', 'cleaned_data.parquet')
+        same_output = lambda first, second: read_cleaned_data(first).equals(read_cleaned_data(second))
+    else:
+        output = os.path.join('artifacts', 'cleaned_data.csv')
+        same_output = lambda first, second: filecmp.cmp(first, second, shallow=False)
+
+    stream_time, stream_rss = run('--chunk-size', str(args.chunk_size), '--format', args.format)
+    os.replace(output, output + '.streamed')
+    batch_time, batch_rss = run('--format', args.format)
+
+    identical = same_output(output, output + '.streamed')
+    print(f"ratings={args.ratings} chunk_size={args.chunk_size} format={args.format}")
+    print(f"batch     : {batch_time:6.1f} s  peak RSS {batch_rss:7.0f} MB")
+    print(f"streaming : {stream_time:6.1f} s  peak RSS {stream_rss:7.0f} MB")
+    print(f"identical : {identical}")
+
+    return identical
+
+
+def benchmark_age(args):
+    """
+    Compares the vectorized age imputation with the original row-wise apply on a
+    synthetic merged dataset and checks that both impute the same ages.
+    """
+    from src.components.datacleaning import DataIngestion
+
+    rng = np.random.default_rng(args.seed)
+    n_rows = args.ratings
+    ages = rng.integers(0, 110, n_rows).astype(float)
+    ages[rng.random(n_rows) < 0.4] = np.nan
+    merged = pd.DataFrame({
+        'Book-Rating': rng.integers(0, 11, n_rows),
+        'Year-Of-Publication': rng.integers(1900, 2010, n_rows).astype(float),
+        'Age': ages,
+    })
+    # Every age of rating 10 is missing, so its group median is NaN
+    merged.loc[merged['Book-Rating'] == 10, 'Age'] = np.nan
+
+    ingestion = DataIngestion()
+    reference = ingestion.replace_out_of_range_ages(merged.copy())
+    rating_medians = reference.groupby('Book-Rating')['Age'].median()
+    year_medians = reference.groupby('Year-Of-Publication')['Age'].median()
+    overall_median = reference['Age'].median()
+
+    # Original row-wise implementation
+    def impute_age(row):
+        if pd.notna(row['Age']):
+            return row['Age']
+        elif row['Book-Rating'] in rating_medians:
+            return rating_medians[row['Book-Rating']]
+        elif row['Year-Of-Publication'] in year_medians:
+            return year_medians[row['Year-Of-Publication']]
+        else:
+            return overall_median
+
+    start = time.perf_counter()
+    reference['Age'] = reference.apply(impute_age, axis=1)
+    reference['Age'] = reference['Age'].fillna(overall_median)
+    apply_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = ingestion.handling_age_nan_values(merged.copy())
+    vectorized_time = time.perf_counter() - start
+
+    identical = reference['Age'].equals(vectorized['Age'])
+    print(f"rows={n_rows}")
+    print(f"row-wise apply : {apply_time:7.2f} s")
+    print(f"vectorized     : {vectorized_time:7.2f} s (including the median computation)")
+    print(f"identical      : {identical}")
+
+    return identical
+
+
+def benchmark_location(args):
+    """
+    Compares the vectorized split_location with the original per-row function on
+    synthetic locations and checks that both produce the same columns.
+    """
+    from src.components.datacleaning import DataIngestion
+
+    rng = np.random.default_rng(args.seed)
+    templates = np.array(['nyc, new york, usa', ' toronto ,ontario,  canada ', 'london, n/a, united kingdom',
+                          'berlin, germany', 'madrid', 'porto, porto, porto, portugal', 'sydney, N/A, australia',
+                          '', ',', 'a,,b', 'x, , y, z, w', 'n/a, n/a, n/a', 'paris, N/a'], dtype=object)
+    locations = templates[rng.integers(0, len(templates), args.users)]
+    locations[rng.random(args.users) < 0.01] = np.nan
+    users = pd.DataFrame({'User-ID': np.arange(args.users), 'Location': locations, 'Age': 30.0})
+
+    # Original per-row implementation, without the per-row logging
+    def extract_location(location):
+        parts = [part.strip() for part in str(location).split(',')]
+        city, state, country = "", "", ""
+        if len(parts) == 3:
+            city, state, country = parts
+        elif len(parts) == 2:
+            city, state, country = parts[0], "", parts[1]
+        elif len(parts) == 1:
+            city = parts[0]
+        if state.lower() == "n/a":
+            state = ""
+        return pd.Series([city, state, country])
+
+    start = time.perf_counter()
+    reference = users['Location'].apply(extract_location)
+    apply_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = DataIngestion().split_location(users.copy())
+    vectorized_time = time.perf_counter() - start
+
+    identical = all(np.array_equal(reference[position].to_numpy(dtype=object), vectorized[column].to_numpy(dtype=object))
+                    for position, column in enumerate(['City', 'State', 'Country']))
+    print(f"users={args.users}")
+    print(f"per-row apply : {apply_time:7.2f} s (the original also logged 3 lines per row)")
+    print(f"vectorized    : {vectorized_time:7.2f} s")
+    print(f"identical     : {identical}")
+
+    return identical
+
+
+def benchmark_parquet(args):
+    """
+    Compares loading the cleaned dataset in Helper from the CSV and from the typed
+    parquet file (time, file size and in-memory size), and checks that both hold the
+    same values.
+    """
+    from src.components.datacleaning import DataIngestion
+    from src.components.helper import Helper
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed)
+    ingestion = DataIngestion()
+    ingestion.save_cleaned_csv(data)
+    ingestion.save_cleaned_parquet(data)
+
+    def load(path_to_hide):
+        # Helper prefers the parquet file, hiding it forces the CSV path
+        hidden = path_to_hide + '.hidden'
+        if path_to_hide:
+            os.replace(path_to_hide, hidden)
+        start = time.perf_counter()
+        helper = Helper()
+        elapsed = time.perf_counter() - start
+        if path_to_hide:
+            os.replace(hidden, path_to_hide)
+        return helper.data, elapsed
+
+    csv_data, csv_time = load(ingestion.ingestion_config.cleaned_parquet_path)
+    parquet_data, parquet_time = load('')
+
+    identical = all(
+        np.array_equal(csv_data[column].to_numpy(dtype=object), parquet_data[column].to_numpy(dtype=object))
+        if csv_data[column].dtype == object or isinstance(parquet_data[column].dtype, pd.CategoricalDtype)
+        else np.array_equal(csv_data[column].to_numpy(), parquet_data[column].to_numpy())
+        for column in csv_data.columns
+    )
+
+    csv_size = os.path.getsize(ingestion.ingestion_config.cleaned_data_path) / 1e6
+    parquet_size = os.path.getsize(ingestion.ingestion_config.cleaned_parquet_path) / 1e6
+    print(f"rows={len(data)}")
+    print(f"csv     : file {csv_size:7.1f} MB  load {csv_time:6.2f} s  in memory {csv_data.memory_usage(deep=True).sum() / 1e6:7.1f} MB")
+    print(f"parquet : file {parquet_size:7.1f} MB  load {parquet_time:6.2f} s  in memory {parquet_data.memory_usage(deep=True).sum() / 1e6:7.1f} MB")
+    print(f"identical : {identical}")
+
+    return identical
+
+
+def benchmark_filter(args):
+    """
+    Compares the groupby-transform filter and pickled DataFrame with the integer-coded
+    ratings table filtered with np.bincount, at several thresholds, and checks that both
+    give the same ratings, book catalog and user-item matrix.
+    """
+    from src.components.helper import Helper
+    from src.components.catalog import build_book_catalog
+    from src.components.matrix import user_item_bundle
+    from src.components.ratings import ratings_frame, table_book_catalog, table_user_item_bundle
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, ratings_per_user=(5, 450), seed=args.seed)
+    os.makedirs('artifacts', exist_ok=True)
+    data.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+    helper = Helper()
+    print(f"ratings={len(data)}")
+    print(f"{'filter':>8} {'rows':>8} {'groupby s':>10} {'pickle MB':>10} {'bincount s':>11} {'store MB':>9} {'equal':>6}")
+
+    passed = True
+    for min_user, min_book in [(200, 50), (100, 20), (50, 10), (10, 5)]:
+        start = time.perf_counter()
+        users = data.loc[data.groupby('User-ID')['Book-Rating'].transform('count') >= min_user]
+        legacy = users.loc[users.groupby('Book-Title')['Book-Rating'].transform('count') >= min_book]
+        save_object(os.path.join('artifacts', 'legacy_filtered_data.pkl'), legacy)
+        legacy_time = time.perf_counter() - start
+        pickle_mb = os.path.getsize(os.path.join('artifacts', 'legacy_filtered_data.pkl')) / 1e6
+
+        # The first call also encodes the ratings, later thresholds reuse the codes
+        start = time.perf_counter()
+        table = helper.filter_data(min_user_ratings=min_user, min_book_ratings=min_book)
+        table_time = time.perf_counter() - start
+        store_mb = directory_size(helper.helper_config.final_filtered_data_path) / 1e6
+
+        frame = ratings_frame(table)
+        legacy_catalog, catalog = build_book_catalog(legacy), table_book_catalog(table)
+        legacy_matrix, matrix = user_item_bundle(legacy), table_user_item_bundle(table)
+        equal = (all(np.array_equal(frame[column].to_numpy(dtype=object), legacy[column].to_numpy(dtype=object))
+                     for column in frame.columns)
+                 and all(np.array_equal(catalog[key], legacy_catalog[key].astype(str)) for key in catalog)
+                 and np.array_equal(matrix['user_ids'], legacy_matrix['user_ids'])
+                 and np.array_equal(matrix['book_titles'], legacy_matrix['book_titles'])
+                 and (matrix['matrix'] != legacy_matrix['matrix']).nnz == 0)
+        passed = passed and equal
+        print(f"{min_user:>4}/{min_book:<3} {len(legacy):>8} {legacy_time:10.3f} {pickle_mb:10.1f} "
+              f"{table_time:11.3f} {store_mb:9.2f} {str(equal):>6}")
+
+    return passed
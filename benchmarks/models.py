@@ -0,0 +1,328 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from tests.synthetic import make_synthetic_data, build_artifacts
+
+
+def benchmark_svd(args):
+    """
+    Compares SVD top-N scoring through model.test over every unrated book with the
+    exported factor matrices, per user and in blocks, and checks that both pick books
+    with the same estimated ratings.
+    """
+    from src.components.helper import Helper
+    from src.components.recommender import BookRecommendationSystem
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed)
+    os.makedirs('artifacts', exist_ok=True)
+    data.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+
+    helper = Helper()
+    filtered = helper.filter_data()
+    helper.book_catalog(filtered_data=filtered)
+    user_item_matrix = helper.pivot_table_data(filtered_data=filtered)
+    helper.user_neighbours(pivot_table=user_item_matrix)
+    model = helper.svd_model(final_filtered_data=filtered)
+
+    recommender = BookRecommendationSystem(method='svd')
+    user_ids = list(recommender.user_ids[:args.requests])
+    titles = np.asarray(filtered['book_titles'])
+    rated_titles = pd.Series(titles[filtered['book_codes']]).groupby(np.asarray(filtered['user_ids'])[filtered['user_codes']]).agg(set)
+
+    def legacy(user_id, top_n=5):
+        predictions = model.test([(user_id, title, 0) for title in titles if title not in rated_titles[user_id]])
+        return sorted(predictions, key=lambda x: x.est, reverse=True)[:top_n]
+
+    start = time.perf_counter()
+    legacy_results = [legacy(user_id) for user_id in user_ids]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single = [recommender.get_top_recommendations(user_id) for user_id in user_ids]
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = {}
+    for chunk in recommender.get_top_recommendations_batch(user_ids, block_size=args.block_size):
+        batched.update(chunk)
+    batch_time = time.perf_counter() - start
+
+    # Ties between estimates may be ordered differently, so compare the estimates
+    estimate = lambda user_id, title: model.predict(user_id, title).est
+    mismatches = 0
+    for user_id, old, new in zip(user_ids, legacy_results, single):
+        new_estimates = [estimate(user_id, book['Title']) for book in new]
+        mismatches += not np.allclose([prediction.est for prediction in old], new_estimates, atol=1e-4)
+        mismatches += batched[user_id] != new
+
+    print(f"users={len(recommender.user_ids)} books={len(titles)} requests={len(user_ids)}")
+    print(f"model.test + sort : {1000 * legacy_time / len(user_ids):8.2f} ms/request")
+    print(f"factors, per user : {1000 * single_time / len(user_ids):8.2f} ms/request")
+    print(f"factors, batched  : {1000 * batch_time / len(user_ids):8.3f} ms/user")
+    print(f"mismatches        : {mismatches}")
+
+    return mismatches == 0
+
+
+def benchmark_items(args):
+    """
+    Compares the startup loop of kneighbors calls on the knn model, one per book, with
+    the precomputed item-item neighbour table, and checks that both find neighbours
+    with the same similarities.
+    """
+    from sklearn.neighbors import NearestNeighbors
+    from src.components.matrix import user_item_bundle
+    from src.components.similarity import top_k_cosine
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed)
+    book_pivot = user_item_bundle(data)['matrix'].T.tocsr()
+    k = args.k
+
+    start = time.perf_counter()
+    knn_model = NearestNeighbors(metric="cosine", algorithm="brute", n_neighbors=5, n_jobs=-1).fit(book_pivot)
+    legacy = []
+    for idx in range(book_pivot.shape[0]):
+        distances, indices = knn_model.kneighbors(book_pivot[idx], n_neighbors=k + 1)
+        keep = indices[0] != idx
+        legacy.append(1 - distances[0][keep][:k])
+    legacy_time = time.perf_counter() - start
+
+    timings = {}
+    for n_jobs in (1, args.jobs):
+        start = time.perf_counter()
+        indices, scores = top_k_cosine(book_pivot, k=k, block_size=args.block_size, n_jobs=n_jobs)
+        timings[n_jobs] = time.perf_counter() - start
+
+    # Neighbours with equal similarity may come in another order, so compare similarities
+    mismatches = sum(not np.allclose(old, new, atol=1e-5) for old, new in zip(legacy, scores))
+
+    print(f"books={book_pivot.shape[0]} users={book_pivot.shape[1]} k={k}")
+    print(f"kneighbors loop        : {legacy_time:8.2f} s")
+    for n_jobs, elapsed in timings.items():
+        print(f"blocked table (jobs={n_jobs}) : {elapsed:8.2f} s")
+    print(f"mismatches             : {mismatches}")
+
+    return mismatches == 0
+
+
+def benchmark_ann(args):
+    """
+    Compares the exact and IVF neighbour indexes on users and on books: build and
+    query time of the full top-k table and recall@k against the exact table, for
+    several n_probe settings.
+    """
+    from src.components.matrix import user_item_bundle
+    from src.components.neighbours import ExactIndex, IVFIndex
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, ratings_per_user=(5, 150),
+                               seed=args.seed, n_tastes=args.tastes, taste_boost=100.0)
+    matrix = user_item_bundle(data)['matrix']
+    print(f"users={matrix.shape[0]} books={matrix.shape[1]} ratings={matrix.nnz} tastes={args.tastes} k={args.k}")
+
+    passed = True
+    for name, rows in (('users', matrix), ('books', matrix.T.tocsr())):
+        start = time.perf_counter()
+        exact, _ = ExactIndex(block_size=args.block_size).fit(rows).query_all(args.k)
+        exact_time = time.perf_counter() - start
+        valid = exact >= 0
+        print(f"{name:>5} exact         : {exact_time:7.2f} s")
+
+        for n_probe in (1, 4, 8, 16):
+            start = time.perf_counter()
+            found, _ = IVFIndex(n_probe=n_probe, block_size=args.block_size).fit(rows).query_all(args.k)
+            ivf_time = time.perf_counter() - start
+            recall = ((exact[:, :, None] == found[:, None, :]) & valid[:, :, None]).any(axis=2).sum() / valid.sum()
+            print(f"{name:>5} ivf n_probe={n_probe:<2} : {ivf_time:7.2f} s  recall@{args.k} {recall:.3f}")
+
+        # Probing every list must give the exact neighbours back, up to ties
+        n_lists = len(IVFIndex().fit(rows).list_offsets) - 1
+        found, _ = IVFIndex(n_probe=n_lists, block_size=args.block_size).fit(rows).query_all(args.k)
+        full_recall = ((exact[:, :, None] == found[:, None, :]) & valid[:, :, None]).any(axis=2).sum() / valid.sum()
+        print(f"{name:>5} ivf all lists : recall@{args.k} {full_recall:.3f}")
+        passed = passed and full_recall > 0.99
+
+    return passed
+
+
+def benchmark_tuning(args):
+    """
+    Runs the SVD tuning harness on synthetic ratings: an exhaustive search and a
+    successive halving search over the same grid, then the halving search again from
+    its trial cache. Checks that the harness RMSE/MAE match surprise.accuracy on the
+    same split, that a seeded trial is reproducible, that the cached rerun trains
+    nothing and that halving finds the configuration of the exhaustive search.
+    """
+    from surprise import accuracy
+    from src.utils import load_object
+    from src.components.helper import Helper
+    from src.components.svdtuning import (SVDTuningConfig, fold_assignment, train_svd, run_trial, tune_svd)
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed, n_tastes=args.tastes)
+    os.makedirs('artifacts', exist_ok=True)
+    data.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+    helper = Helper()
+    table = helper.filter_data()
+    table_path = helper.helper_config.final_filtered_data_path
+    grid = {'n_factors': [10, 50, 100], 'n_epochs': [10], 'lr_all': [0.005], 'reg_all': [0.02, 0.1, 0.2]}
+    print(f"ratings={len(table['ratings'])} configurations=9 folds=3 workers={args.jobs}")
+
+    # Harness metrics against surprise on one split
+    params = {'n_factors': 20, 'n_epochs': 5, 'lr_all': 0.005, 'reg_all': 0.1}
+    folds = fold_assignment(len(table['ratings']), 3, args.seed)
+    trial = run_trial(table_path, params, 0, 3, 1.0, args.seed, args.k, 7)
+    model, trainset = train_svd(load_object(table_path), np.flatnonzero(folds != 0), params, args.seed)
+    test_rows = np.flatnonzero(folds == 0)
+    testset = list(zip(np.asarray(table['user_ids'])[table['user_codes'][test_rows]].tolist(),
+                       np.asarray(table['book_titles'])[table['book_codes'][test_rows]].tolist(),
+                       table['ratings'][test_rows].astype(float).tolist()))
+    predictions = model.test(testset)
+    surprise_rmse, surprise_mae = accuracy.rmse(predictions, verbose=False), accuracy.mae(predictions, verbose=False)
+    print(f"harness rmse {trial['rmse']:.6f} mae {trial['mae']:.6f} | surprise rmse {surprise_rmse:.6f} mae {surprise_mae:.6f}")
+    repeated = run_trial(table_path, params, 0, 3, 1.0, args.seed, args.k, 7)
+
+    searches = {}
+    for label, n_rungs, use_cache in (('exhaustive', 1, False), ('halving', 2, True), ('halving cached', 2, True)):
+        start = time.perf_counter()
+        results, best = tune_svd(table_path, param_grid=grid, n_folds=3, eta=3, n_rungs=n_rungs, n_workers=args.jobs,
+                                 seed=args.seed, k=args.k, use_cache=use_cache)
+        elapsed = time.perf_counter() - start
+        trained = int((~results['cached']).sum())
+        searches[label] = (best, trained)
+        print(f"{label:<15}: {elapsed:7.2f} s  {trained:3d} trials trained  best {best['params']}  "
+              f"rmse {best['rmse']:.4f}  precision@{args.k} {best[f'precision@{args.k}']:.4f}  "
+              f"ndcg@{args.k} {best[f'ndcg@{args.k}']:.4f}")
+
+    written = pd.read_csv(SVDTuningConfig().results_path)
+    print(f"results file: {len(written)} rows, columns {list(written.columns)}")
+
+    # svd_model reports the metrics of its held-out fold with the factors
+    helper.svd_model(table, params=searches['exhaustive'][0]['params'])
+    from src.utils import read_manifest
+    print(f"svd_model test metrics: { {key: value for key, value in read_manifest(helper.helper_config.svd_factors_path)['metadata'].items() if '@' in key or key in ('rmse', 'mae')} }")
+
+    checks = {
+        'rmse/mae match surprise': abs(trial['rmse'] - surprise_rmse) < 1e-6 and abs(trial['mae'] - surprise_mae) < 1e-6,
+        'seeded trial reproducible': all(trial[key] == repeated[key] for key in ('rmse', 'mae', f'ndcg@{args.k}')),
+        'cached rerun trains nothing': searches['halving cached'][1] == 0,
+        'halving finds the best': searches['halving'][0]['params'] == searches['exhaustive'][0]['params'],
+    }
+    for name, passed in checks.items():
+        print(f"{name:<28}: {passed}")
+
+    return all(checks.values())
+
+
+def benchmark_als(args):
+    """
+    Trains the implicit-feedback ALS model with 1 and --jobs threads (and with the
+    implicit library when it is installed) and compares it with the cosine and SVD
+    paths on the same held-out fold, with precision/recall/ndcg@10 for the held-out
+    books rated 7 or more and for every held-out interaction, implicit 0 ratings
+    included. With many --tastes every community only has a few books, which users
+    exhaust in training, so popularity is hard to beat; --tastes 5 leaves room for
+    personalization. Then checks that the served and precomputed als lists agree and reports
+    the latency of every method.
+    """
+    from scipy.sparse import coo_matrix
+    from src.utils import load_object, read_manifest
+    from src.components.helper import Helper
+    from src.components.recommender import BookRecommendationSystem
+    from src.components.svdtuning import fold_assignment, rated_pattern, ranking_metrics
+    from src.components.factors import svd_scores
+    from src.components.similarity import top_k_cosine
+    from src.components.als import confidence_matrix, train_als, resolve_backend, als_scores
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed, n_tastes=args.tastes,
+                               taste_boost=100.0)
+    os.makedirs('artifacts', exist_ok=True)
+    data.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+    helper = Helper()
+    build_artifacts(helper)
+    table = load_object('artifacts/final_filtered_data')
+    params = helper.helper_config.als_params
+    print(f"users={len(table['user_ids'])} books={len(table['book_titles'])} interactions={len(table['ratings'])} "
+          f"implicit={np.mean(np.asarray(table['ratings']) == 0):.0%}")
+
+    # Training time and thread-count independence on the training fold
+    folds = fold_assignment(len(table['ratings']), n_folds=5, seed=42)
+    train_rows, test_rows = np.flatnonzero(folds != 0), np.flatnonzero(folds == 0)
+    weights = confidence_matrix(table, train_rows, alpha=params['alpha'], implicit_rating=params['implicit_rating'])
+    trained = {}
+    backends = [('numpy', 1), ('numpy', args.jobs)]
+    if resolve_backend('auto') == 'implicit':
+        backends.append(('implicit', args.jobs))
+    else:
+        print("implicit library not installed, training with the numpy backend only")
+    for backend, n_threads in backends:
+        start = time.perf_counter()
+        trained[(backend, n_threads)] = train_als(weights, n_factors=params['n_factors'],
+                                                  regularization=params['regularization'],
+                                                  n_iterations=params['n_iterations'], n_threads=n_threads,
+                                                  backend=backend)
+        print(f"als training {backend:<8} threads={n_threads}: {time.perf_counter() - start:6.2f} s")
+    same_threads = all(np.array_equal(a, b) for a, b in zip(trained[('numpy', 1)], trained[('numpy', args.jobs)]))
+
+    # Cosine scores from the neighbours of the explicit training ratings, like the pivot
+    explicit = train_rows[np.asarray(table['ratings'])[train_rows] > 0]
+    shape = (len(table['user_ids']), len(table['book_titles']))
+    train_matrix = coo_matrix((np.asarray(table['ratings'])[explicit].astype(np.float32),
+                               (np.asarray(table['user_codes'])[explicit], np.asarray(table['book_codes'])[explicit])),
+                              shape=shape).tocsr()
+    neighbours, _ = top_k_cosine(train_matrix, k=20)
+
+    def cosine_scores(n_neighbors):
+        def score_users(user_indices):
+            rows = np.asarray(neighbours)[user_indices, :n_neighbors]
+            owner = np.repeat(np.arange(len(user_indices)), rows.shape[1])[rows.ravel() >= 0]
+            selection = coo_matrix((np.ones(len(owner), dtype=np.float32), (owner, rows.ravel()[rows.ravel() >= 0])),
+                                   shape=(len(user_indices), shape[0])).tocsr()
+            return (selection @ train_matrix).toarray()
+        return score_users
+
+    popularity = np.bincount(np.asarray(table['book_codes'])[train_rows], minlength=shape[1]).astype(np.float64)
+    svd_factors = load_object('artifacts/svd_factors')
+    als_factors = dict(zip(('user_factors', 'item_factors'), trained[('numpy', 1)]))
+    models = {
+        'popularity': lambda user_indices: np.tile(popularity, (len(user_indices), 1)),
+        'cosine (5 neighbours)': cosine_scores(5),
+        'cosine (20 neighbours)': cosine_scores(20),
+        'svd': lambda user_indices: svd_scores(svd_factors, user_indices),
+        'als': lambda user_indices: als_scores(als_factors, user_indices),
+    }
+    rated = rated_pattern(table, train_rows)
+    results = {}
+    for relevance_threshold, label in ((7, 'held-out ratings >= 7'), (0, 'every held-out interaction')):
+        print(f"\n{label}:")
+        for name, score_users in models.items():
+            metrics = ranking_metrics(score_users, rated, table, test_rows, k=10, relevance_threshold=relevance_threshold)
+            results[(name, relevance_threshold)] = metrics
+            print(f"  {name:<23}: precision@10 {metrics['precision@10']:.4f}  recall@10 {metrics['recall@10']:.4f}  "
+                  f"ndcg@10 {metrics['ndcg@10']:.4f}  ({metrics['ranked_users']} users)")
+    stored = read_manifest('artifacts/als_factors')['metadata']
+
+    # Serving: precomputed als lists against live scoring, latency of every method
+    helper.recommendation_table(pivot_table=load_object('artifacts/user_item_matrix'), top_n=20, n_jobs=1)
+    live = BookRecommendationSystem(cache_size=0, precomputed=False)
+    served = BookRecommendationSystem(cache_size=0)
+    user_ids = list(live.user_ids)
+    print(f"\nprecomputed methods: {served.precomputed['methods']}")
+    for method in ('cosine', 'svd', 'hybrid', 'als'):
+        start = time.perf_counter()
+        expected = [live.get_top_recommendations(user_id, method=method) for user_id in user_ids]
+        elapsed = 1000 * (time.perf_counter() - start) / len(user_ids)
+        print(f"{method:<6}: live {elapsed:.3f} ms/request")
+    same_table = [served.get_top_recommendations(user_id, method='als') for user_id in user_ids] == expected
+
+    checks = {
+        'threads give the same factors': same_threads,
+        'stage metrics match': np.isclose(stored['ndcg@10'], results[('als', 7)]['ndcg@10']),
+        'precomputed als identical': same_table,
+        'als beats svd and cosine': results[('als', 0)]['ndcg@10'] > max(results[('svd', 0)]['ndcg@10'],
+                                                                         results[('cosine (20 neighbours)', 0)]['ndcg@10']),
+    }
+    for name, passed in checks.items():
+        print(f"{name:<30}: {passed}")
+
+    return all(checks.values())
@@ -0,0 +1,347 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from tests.synthetic import make_synthetic_data, build_artifacts, split_delta
+from tests.legacy import legacy_top_recommendations, build_legacy_artifacts
+from benchmarks.utils import directory_size
+
+
+def benchmark_recommender(args):
+    """
+    Checks that the vectorized scoring engine returns the same recommendations as the
+    original loop and reports the per-request latency of both.
+    """
+    from src.components.recommender import BookRecommendationSystem
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed)
+    final_filtered_data, user_item_matrix, user_similarity_matrix = build_legacy_artifacts(data)
+    recommender = BookRecommendationSystem()
+
+    user_ids = user_item_matrix.index[:args.requests]
+
+    start = time.perf_counter()
+    legacy = [legacy_top_recommendations(final_filtered_data, user_item_matrix, user_similarity_matrix, user_id)
+              for user_id in user_ids]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    current = [recommender.get_top_recommendations(user_id) for user_id in user_ids]
+    current_time = time.perf_counter() - start
+
+    # Second pass is answered from the LRU cache
+    start = time.perf_counter()
+    cached = [recommender.get_top_recommendations(user_id) for user_id in user_ids]
+    cached_time = time.perf_counter() - start
+
+    mismatches = sum(old != new for old, new in zip(legacy, current))
+    mismatches += sum(old != new for old, new in zip(legacy, cached))
+    print(f"users={len(user_item_matrix)} books={user_item_matrix.shape[1]} requests={len(user_ids)}")
+    print(f"legacy loop : {1000 * legacy_time / len(user_ids):.2f} ms/request")
+    print(f"vectorized  : {1000 * current_time / len(user_ids):.2f} ms/request")
+    print(f"cached      : {1000 * cached_time / len(user_ids):.3f} ms/request")
+    print(f"mismatches  : {mismatches}")
+
+    return mismatches == 0
+
+
+def benchmark_batch(args):
+    """
+    Compares the throughput of get_top_recommendations_batch against a per-user loop
+    and checks that both return the same recommendations. With --jobs the batch stays
+    in process below PARALLEL_MIN_USERS users, the forced pool shows why: at the default
+    size it is slower than one process.
+    """
+    from src.components.recommender import BookRecommendationSystem, PARALLEL_MIN_USERS
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed)
+    build_legacy_artifacts(data)
+    recommender = BookRecommendationSystem()
+    user_ids = list(recommender.user_ids)
+
+    start = time.perf_counter()
+    looped = {user_id: recommender.get_top_recommendations(user_id) for user_id in user_ids}
+    loop_time = time.perf_counter() - start
+    print(f"users={len(user_ids)} books={len(recommender.book_titles)}")
+    print(f"loop                 : {len(user_ids) / loop_time:8.0f} users/sec")
+
+    passed = True
+    for label, n_jobs, parallel_min_users in (('n_jobs=1', 1, PARALLEL_MIN_USERS),
+                                              (f'n_jobs={args.jobs}', args.jobs, PARALLEL_MIN_USERS),
+                                              (f'n_jobs={args.jobs} pool', args.jobs, 0)):
+        start = time.perf_counter()
+        batched = {}
+        for chunk in recommender.get_top_recommendations_batch(user_ids, block_size=args.block_size, n_jobs=n_jobs,
+                                                               parallel_min_users=parallel_min_users):
+            batched.update(chunk)
+        batch_time = time.perf_counter() - start
+
+        identical = batched == looped
+        passed = passed and identical
+        print(f"batch ({label:<13}): {len(user_ids) / batch_time:8.0f} users/sec  identical={identical}")
+
+    return passed
+
+
+def benchmark_service(args):
+    """
+    Serves synthetic artifacts with the HTTP recommendation service and load tests it
+    without micro-batching, with micro-batching, and with --jobs worker processes,
+    next to the sequential in-process loop. The LRU cache is disabled so every request
+    is scored. Checks that the service answers like get_top_recommendations and that
+    no request failed.
+    """
+    import socket
+    import subprocess
+    from src.components.helper import Helper
+    from src.components.recommender import BookRecommendationSystem
+    from src.components.recommendationservice import load_test, request_json
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed)
+    os.makedirs('artifacts', exist_ok=True)
+    data.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+    build_artifacts(Helper())
+    recommender = BookRecommendationSystem(cache_size=0)
+    user_ids = recommender.user_ids
+    concurrency = 32
+
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=repo_root)
+
+    def start_service(*extra_args):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        process = subprocess.Popen([sys.executable, '-m', 'src.pipeline.servicepipeline', '--port', str(port),
+                                    '--cache-size', '0', *extra_args], env=env, stdout=subprocess.DEVNULL)
+        for _ in range(600):
+            try:
+                request_json('127.0.0.1', port, '/health')
+                return process, port
+            except OSError:
+                time.sleep(0.1)
+        process.kill()
+        raise RuntimeError("The recommendation service did not start")
+
+    # Same Zipf-like request sequence as the load test, scored one by one in process
+    rng = np.random.default_rng(args.seed)
+    weights = 1.0 / np.arange(1, len(user_ids) + 1) ** 1.1
+    ranks = rng.choice(len(user_ids), args.requests, p=weights / weights.sum())
+    start = time.perf_counter()
+    for user_id in np.asarray(user_ids)[rng.permutation(len(user_ids))[ranks]]:
+        recommender.get_top_recommendations(user_id)
+    loop_time = time.perf_counter() - start
+    print(f"users={len(user_ids)} books={len(recommender.book_titles)} requests={args.requests} concurrency={concurrency}")
+    print(f"{'in-process loop':<22}: {args.requests / loop_time:8.1f} requests/sec")
+
+    passed = True
+    for label, extra_args in (('no batching', ('--max-batch', '1')), ('micro-batching', ()),
+                              (f'{args.jobs} workers', ('--workers', str(args.jobs)))):
+        process, port = start_service(*extra_args)
+        try:
+            if label == 'no batching':
+                sample = [int(user_id) for user_id in user_ids[:20]]
+                identical = all(request_json('127.0.0.1', port, f'/recommendations?user_id={user_id}')[1]['recommendations']
+                                == recommender.get_top_recommendations(user_id) for user_id in sample)
+                missing = request_json('127.0.0.1', port, '/recommendations?user_id=-1')[0] == 404
+                print(f"{'identical results':<22}: {identical}  unknown user 404: {missing}")
+                passed = passed and identical and missing
+
+            result = load_test('127.0.0.1', port, user_ids, n_requests=args.requests, concurrency=concurrency,
+                               seed=args.seed)
+            health = request_json('127.0.0.1', port, '/health')[1]
+        finally:
+            process.terminate()
+            process.wait()
+
+        passed = passed and result['errors'] == 0 and result['requests'] == args.requests
+        print(f"{label:<22}: {result['qps']:8.1f} requests/sec  p50 {result['p50']:6.2f} ms  p95 {result['p95']:6.2f} ms  "
+              f"p99 {result['p99']:6.2f} ms  errors {result['errors']}  "
+              f"(one worker: coalesced {health['coalesced']}, mean batch {health['mean_batch']:.1f})")
+
+    return passed
+
+
+def benchmark_precomputed(args):
+    """
+    Precomputes the recommendation table of every user with one and with --jobs worker
+    processes and compares serving from it with live scoring: per-request latency and
+    identical results for every user, method and top_n. Then folds a delta of ratings
+    into the artifacts and checks that the carried-over table, with the stale and new
+    users scored live, still answers like live scoring.
+    """
+    from src.utils import load_object, read_manifest
+    from src.components.helper import Helper
+    from src.components.recommender import BookRecommendationSystem
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed,
+                               n_tastes=args.tastes, taste_boost=100.0)
+    base, delta = split_delta(data, args.seed)
+    os.makedirs('artifacts', exist_ok=True)
+    base.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+    delta.to_csv('delta.csv', index=False)
+    helper = Helper()
+    build_artifacts(helper)
+    bundle = load_object('artifacts/user_item_matrix')
+
+    for n_jobs in (1, args.jobs):
+        start = time.perf_counter()
+        helper.recommendation_table(pivot_table=bundle, top_n=20, n_jobs=n_jobs)
+        print(f"precompute (n_jobs={n_jobs}) : {time.perf_counter() - start:6.2f} s")
+    print(f"table size           : {directory_size('artifacts/user_recommendations') / 2 ** 20:6.2f} MB")
+
+    def compare(label):
+        live = BookRecommendationSystem(cache_size=0, precomputed=False)
+        served = BookRecommendationSystem(cache_size=0)
+        user_ids = list(live.user_ids)
+        served_users = int((served.precomputed['rows'] >= 0).sum())
+        print(f"\n{label}: users={len(user_ids)} served from the table={served_users} "
+              f"methods={served.precomputed['methods']}")
+
+        identical = True
+        for method, top_n in (('cosine', 5), ('cosine', 20), ('svd', 5), ('svd', 20), ('hybrid', 5)):
+            timings = {}
+            for name, recommender in (('live', live), ('table', served)):
+                start = time.perf_counter()
+                results = [recommender.get_top_recommendations(user_id, top_n=top_n, method=method) for user_id in user_ids]
+                timings[name] = (1000 * (time.perf_counter() - start) / len(user_ids), results)
+            same = timings['live'][1] == timings['table'][1]
+            identical = identical and same
+            print(f"{method:<6} top_n={top_n:<2}: live {timings['live'][0]:6.3f} ms/request  "
+                  f"table {timings['table'][0]:6.3f} ms/request  identical={same}")
+
+        batched = {}
+        for chunk in served.get_top_recommendations_batch(user_ids, block_size=args.block_size, n_jobs=args.jobs,
+                                                          parallel_min_users=0):
+            batched.update(chunk)
+        same = batched == {user_id: live.get_top_recommendations(user_id) for user_id in user_ids}
+        print(f"batch (n_jobs={args.jobs})   : identical={same}")
+        return identical and same
+
+    passed = compare('full build')
+
+    summary = Helper(load_data=False).update_artifacts(delta_data_path='delta.csv', svd_epochs=1)
+    metadata = read_manifest('artifacts/user_recommendations')['metadata']
+    print(f"\nupdate: {summary['changed_users']} changed users, {summary['stale_recommendations']} stale "
+          f"recommendation rows, methods kept {metadata['methods']}")
+    passed = compare('after the delta') and passed
+
+    return passed
+
+
+def benchmark_coldstart(args):
+    """
+    Serves users outside the filtered matrix from the cold-start arrays: users filtered
+    out with many ratings and new users with 2 to 12 ratings. Checks the segment scores
+    against a pandas Bayesian average, the projected neighbours against a brute-force
+    cosine search and that every cold user gets top_n books, reports the latency per
+    request, and the hit rate@10 on held-out ratings of the new users for neighbour
+    search, their country and age segment and the global ranking.
+    """
+    from sklearn.metrics.pairwise import cosine_similarity
+    from src.utils import load_object
+    from src.components.helper import Helper
+    from src.components.recommender import BookRecommendationSystem
+    from src.components.coldstart import age_bands, neighbour_books, clean_countries
+    from src.components.scoring import top_k_indices
+
+    data = make_synthetic_data(n_users=args.users, n_books=args.books, seed=args.seed, n_tastes=args.tastes,
+                               taste_boost=100.0)
+    new_users = make_synthetic_data(n_users=300, n_books=args.books, ratings_per_user=(2, 13), seed=args.seed + 7,
+                                    n_tastes=args.tastes, taste_boost=100.0)
+    new_users['User-ID'] += 10 ** 6
+    new_users['Book-Rating'] = np.random.default_rng(args.seed).integers(1, 11, len(new_users))
+
+    # Half of the ratings of every new user is held out
+    rng = np.random.default_rng(args.seed)
+    held_out = new_users.groupby('User-ID')['ISBN'].transform(lambda isbns: rng.random(len(isbns)) < 0.5).astype(bool)
+    os.makedirs('artifacts', exist_ok=True)
+    pd.concat([data, new_users[~held_out]]).to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+
+    helper = Helper()
+    build_artifacts(helper)
+    start = time.perf_counter()
+    cold_start = helper.cold_start_model(pivot_table=load_object('artifacts/user_item_matrix'))
+    print(f"cold-start build : {time.perf_counter() - start:6.2f} s  {directory_size('artifacts/cold_start') / 2 ** 20:.2f} MB")
+
+    recommender = BookRecommendationSystem(cache_size=0)
+    cold_users = np.setdiff1d(cold_start['user_ids'], recommender.user_ids)
+    print(f"matrix users={len(recommender.user_ids)} books={len(recommender.book_titles)} cold users={len(cold_users)} "
+          f"segments={len(cold_start['countries'])} countries x {cold_start['segment_books'].shape[1] - 1} age bands")
+
+    # Segment scores against a pandas Bayesian average over the same ratings
+    frame = pd.concat([data, new_users[~held_out]])
+    frame = frame[frame['Book-Title'].isin(recommender.book_titles) & (frame['Book-Rating'] > 0)]
+    prior = 10
+    global_stats = frame.groupby('Book-Title')['Book-Rating'].agg(['sum', 'count'])
+    global_mean = global_stats['sum'].sum() / global_stats['count'].sum()
+    global_score = (prior * global_mean + global_stats['sum']) / (prior + global_stats['count'])
+    score_errors = []
+    for country_idx in range(len(cold_start['countries'])):
+        for band in (0, 3):
+            segment = frame[(clean_countries(frame['Country']) == cold_start['countries'][country_idx])
+                            & (age_bands(frame['Age']) == band)]
+            stats = segment.groupby('Book-Title')['Book-Rating'].agg(['sum', 'count'])
+            stats = stats.reindex(recommender.book_titles, fill_value=0)
+            prior_scores = global_score.reindex(recommender.book_titles).fillna(global_mean).to_numpy()
+            expected = (prior * prior_scores + stats['sum'].to_numpy()) / (prior + stats['count'].to_numpy())
+            books = cold_start['segment_books'][country_idx, band]
+            score_errors.append(np.abs(expected[books] - cold_start['segment_scores'][country_idx, band]).max())
+            score_errors.append(expected.max() - cold_start['segment_scores'][country_idx, band][0])
+
+    # Projected neighbours against brute-force cosine similarity
+    matrix = recommender.rating_matrix
+    same_neighbours = 0
+    sample = [user_id for user_id in cold_users if user_id >= 10 ** 6][:100]
+    for user_id in sample:
+        row = cold_start['user_ratings'][np.searchsorted(cold_start['user_ids'], user_id)]
+        similarity = cosine_similarity(row, matrix).ravel()
+        similarity[similarity <= 0] = -np.inf
+        projected = np.asarray(cold_start['normalized_items'][row.indices].T @ row.data).ravel()
+        projected[projected <= 0] = -np.inf
+        same_neighbours += np.array_equal(top_k_indices(similarity, 5), top_k_indices(projected, 5))
+
+    # Latency of the cold path, users filtered out and new users
+    timings = {}
+    for label, users in (('filtered-out users', [user_id for user_id in cold_users if user_id < 10 ** 6]),
+                         ('new users', [user_id for user_id in cold_users if user_id >= 10 ** 6]),
+                         ('unknown users', list(range(-1, -201, -1)))):
+        latencies, sizes = [], []
+        for user_id in users:
+            start = time.perf_counter()
+            sizes.append(len(recommender.get_top_recommendations(user_id)))
+            latencies.append(time.perf_counter() - start)
+        timings[label] = min(sizes) == 5
+        p50, p99 = 1000 * np.percentile(latencies, [50, 99])
+        print(f"{label:<19}: {len(users):5d} users  p50 {p50:.3f} ms  p99 {p99:.3f} ms  all got 5 books={timings[label]}")
+
+    # Hit rate@10 on the held-out ratings of the new users
+    hidden = new_users[held_out & new_users['Book-Title'].isin(recommender.book_titles)].groupby('User-ID')['Book-Title'].agg(set)
+    visible = new_users[~held_out & new_users['Book-Title'].isin(recommender.book_titles)]
+    visible = visible.groupby('User-ID').apply(lambda rows: dict(zip(rows['Book-Title'], rows['Book-Rating'])))
+    demographics = new_users.drop_duplicates('User-ID').set_index('User-ID')
+    hits = {'neighbours + segment': 0, 'segment': 0, 'global': 0}
+    evaluated = [user_id for user_id in hidden.index if user_id in visible.index]
+    for user_id in evaluated:
+        country, age = demographics.loc[user_id, 'Country'], demographics.loc[user_id, 'Age']
+        for label, kwargs in (('neighbours + segment', dict(country=country, age=age)),
+                              ('segment', dict(country=country, age=age, n_neighbors=0)),
+                              ('global', dict(n_neighbors=0))):
+            kwargs.setdefault('n_neighbors', 20)
+            books = recommender.cold_start_recommendations(top_n=10, ratings=visible[user_id], **kwargs)
+            hits[label] += bool({book['Title'] for book in books} & hidden[user_id])
+    for label, count in hits.items():
+        print(f"hit rate@10 {label:<21}: {count / max(len(evaluated), 1):.3f}  ({len(evaluated)} new users)")
+
+    checks = {
+        'segment scores match pandas': max(score_errors) < 1e-4,
+        'projected neighbours exact': same_neighbours == len(sample),
+        'every cold user served': all(timings.values()),
+        'neighbours beat popularity': hits['neighbours + segment'] > hits['global'],
+    }
+    for name, passed in checks.items():
+        print(f"{name:<28}: {passed}")
+
+    return all(checks.values())
@@ -0,0 +1,12 @@
+import os
+
+
+def directory_size(path):
+    """
+    Size of the files of a directory, only those of the current version for an array store.
+    """
+    from src.utils import is_array_store, read_manifest, store_files
+
+    if is_array_store(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in store_files(read_manifest(path)) | {'manifest.json'})
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
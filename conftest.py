@@ -0,0 +1 @@
+# Makes the repository root importable (the src package) when pytest runs from it
@@ -1,6 +1,27 @@
+import time
 import streamlit as st
 import requests
-from src.components.recommender import BookRecommendationSystem
+from src.logger import logging
+from src.utils import artifacts_fingerprint
+from src.components.recommender import BookRecommendationSystem, ARTIFACT_PATHS
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_recommender(fingerprint):
+    '''
+    Loads the recommender once per process and shares it across sessions. The cache is
+    keyed by the artifacts fingerprint, so new artifacts on disk trigger a reload and
+    the previous instance is evicted.
+    '''
+    start = time.perf_counter()
+    recommender = BookRecommendationSystem()
+    logging.info(f"Recommender loaded for artifacts {fingerprint[:12]} in {1000 * (time.perf_counter() - start):.1f} ms")
+    return recommender
+
+def get_recommender():
+    '''
+    Returns the shared recommender, reloading it when the artifacts changed on disk.
+    '''
+    return load_recommender(artifacts_fingerprint(ARTIFACT_PATHS))
 
 def run_app():
     # Custom CSS styling
@@ -102,8 +123,8 @@ def run_app():
         unsafe_allow_html=True
     )
 
-    # Initialize recommender system
-    recommender = BookRecommendationSystem()
+    # Shared recommender system, loaded once per process
+    recommender = get_recommender()
 
     # Input section with aligned button
     col1, col2 = st.columns([4, 1])
@@ -114,6 +135,16 @@ def run_app():
         recommend_button = st.button("🌟 Get My Recommendations")
         st.markdown("</div>", unsafe_allow_html=True)
 
+    # Matrix factorization is offered once its factors are part of the artifacts
+    methods = {"Readers like you": "cosine"}
+    if recommender.svd_factors is not None:
+        methods["Predicted ratings (SVD)"] = "svd"
+        if recommender.item_neighbours is not None:
+            methods["Predicted ratings + similar books"] = "hybrid"
+    if recommender.als_factors is not None:
+        methods["Books readers like you read (ALS)"] = "als"
+    method = methods[st.radio("Recommendation method", list(methods), horizontal=True)]
+
     if recommend_button:
         if not user_id.strip():
             st.markdown(
@@ -123,16 +154,30 @@ def run_app():
         else:
             try:
                 user_id_int = int(user_id)
+                # Users outside the filtered matrix are served by the cold-start rankings
+                known_user = user_id_int in recommender.user_index
                 with st.spinner('🔍 Analyzing your reading preferences...'):
-                    recommendations = recommender.get_top_recommendations(user_id_int)
+                    start = time.perf_counter()
+                    recommendations = []
+                    if known_user or recommender.cold_start is not None:
+                        recommendations = recommender.get_top_recommendations(user_id_int, method=method)
+                    logging.info(f"Recommendations for {user_id_int} served in {1000 * (time.perf_counter() - start):.2f} ms")
 
-                if 'message' in recommendations[0]:
+                if not recommendations:
+                    st.markdown(
+                        f'<div class="error-message">⚠️ No recommendations found for User {user_id_int}</div>',
+                        unsafe_allow_html=True
+                    )
+                elif 'message' in recommendations[0]:
                     st.markdown(
                         f'<div class="error-message">⚠️ {recommendations[0]["message"]}</div>',
                         unsafe_allow_html=True
                     )
                 else:
-                    st.subheader(f"📖 Recommended for You (User {user_id})")
+                    if known_user:
+                        st.subheader(f"📖 Recommended for You (User {user_id})")
+                    else:
+                        st.subheader(f"📖 Popular with Readers Like You (User {user_id})")
                     st.markdown("<br>", unsafe_allow_html=True)
 
                     # Create responsive columns
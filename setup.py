@@ -20,6 +20,6 @@ setup(
     author= 'Ayush',
     author_email='dhabaleayush96@gmail.com',
     install_requires = get_requirements("requirements.txt"),
-    packages= find_packages()
+    packages= find_packages(exclude=['tests', 'benchmarks'])
 
 )
\ No newline at end of file
@@ -0,0 +1,229 @@
+import os
+import importlib.util
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from scipy.sparse import coo_matrix, csr_matrix
+
+from src.logger import logging
+from src.components.scoring import top_k_rows
+
+# Training backends: the conjugate-gradient solver of this module, or the implicit
+# library when it is installed
+ALS_BACKENDS = ('numpy', 'implicit')
+
+
+def resolve_backend(backend='auto'):
+    """
+    Training backend by name, 'auto' picks implicit when it is installed.
+    """
+    if backend == 'auto':
+        return 'implicit' if importlib.util.find_spec('implicit') is not None else 'numpy'
+    if backend not in ALS_BACKENDS:
+        raise ValueError(f"Unknown ALS backend {backend!r}, expected 'auto' or one of {ALS_BACKENDS}")
+
+    return backend
+
+
+def confidence_matrix(table, rows=None, alpha=2.0, implicit_rating=5):
+    """
+    Builds the users x books confidence weights of the implicit-feedback model from the
+    interactions of a ratings table, in the row and column order of
+    table_user_item_bundle.
+
+    Every interaction, implicit 0 ratings included, means the user read the book. Its
+    confidence is 1 + alpha * strength / 10, where the strength is the explicit rating
+    or implicit_rating for a 0, and repeated interactions add up. The matrix stores the
+    weights above 1 (alpha * strength / 10), the confidence of the pairs without an
+    interaction is 1.
+
+    Args:
+        table (dict): Ratings table built by encode_ratings.
+        rows (np.ndarray, optional): Positions of the interactions used, every one by default.
+        alpha (float): Confidence gained per unit of strength.
+        implicit_rating (float): Strength of an implicit 0 rating, on the 1-10 scale.
+
+    Returns:
+        scipy.sparse.csr_matrix: float32 users x books weights.
+    """
+    rows = np.arange(len(table['ratings'])) if rows is None else np.asarray(rows)
+    ratings = np.asarray(table['ratings'])[rows].astype(np.float32)
+    strength = np.where(ratings > 0, ratings, implicit_rating) / 10
+
+    shape = (len(table['user_ids']), len(table['book_titles']))
+    weights = coo_matrix(((alpha * strength).astype(np.float32),
+                          (np.asarray(table['user_codes'])[rows], np.asarray(table['book_codes'])[rows])),
+                         shape=shape).tocsr()
+    weights.sum_duplicates()
+
+    return weights
+
+
+def _solve_rows(weights, X, Y, gram, cg_steps, start, stop):
+    """
+    Refines rows start:stop of X with a few conjugate-gradient steps on their systems
+    (Y^T C_u Y + reg I) x_u = Y^T C_u p_u, where Y^T C_u Y = gram + Y^T (C_u - I) Y only
+    involves the rows of Y the user interacted with.
+    """
+    block = weights[start:stop]
+    owner = np.repeat(np.arange(stop - start), np.diff(block.indptr))
+    item_rows = Y[block.indices]
+
+    def product(vectors):
+        # (gram + Y^T (C_u - I) Y) v for every row v
+        dots = np.einsum('ij,ij->i', item_rows, vectors[owner]) * block.data
+        return vectors @ gram + csr_matrix((dots, block.indices, block.indptr), shape=block.shape) @ Y
+
+    x = X[start:stop].copy()
+    targets = csr_matrix((block.data + 1, block.indices, block.indptr), shape=block.shape) @ Y
+    residual = targets - product(x)
+    direction = residual.copy()
+    residual_norm = np.einsum('ij,ij->i', residual, residual)
+    for _ in range(cg_steps):
+        # Converged rows keep their solution
+        active = residual_norm > 1e-20
+        image = product(direction)
+        curvature = np.einsum('ij,ij->i', direction, image)
+        step = np.where(active, residual_norm / np.where(active, curvature, 1), 0).astype(np.float32)
+        x += step[:, None] * direction
+        residual -= step[:, None] * image
+        new_norm = np.einsum('ij,ij->i', residual, residual)
+        direction = residual + np.where(active, new_norm / np.where(active, residual_norm, 1), 0)[:, None] * direction
+        residual_norm = new_norm
+
+    X[start:stop] = x
+
+
+def _least_squares(weights, X, Y, regularization, cg_steps, n_threads, block_size):
+    """
+    One half-iteration of ALS: solves every row of X with Y fixed, blocks of rows in
+    parallel threads (the products release the GIL).
+    """
+    gram = (Y.T @ Y + regularization * np.eye(Y.shape[1], dtype=np.float32)).astype(np.float32)
+    blocks = [(start, min(start + block_size, X.shape[0])) for start in range(0, X.shape[0], block_size)]
+
+    with ThreadPoolExecutor(max_workers=max(n_threads, 1)) as executor:
+        list(executor.map(lambda bounds: _solve_rows(weights, X, Y, gram, cg_steps, *bounds), blocks))
+
+
+def implicit_confidence(weights):
+    """
+    Confidence matrix of the implicit library for confidence_matrix weights. implicit
+    uses the stored values themselves as the confidences C_ui of the interactions (and
+    1 for the other pairs), so the stored weights are shifted by 1.
+    """
+    confidence = weights.tocsr().astype(np.float32)
+    confidence.data += 1
+    return confidence
+
+
+def _train_implicit(weights, n_factors, regularization, n_iterations, seed, n_threads, item_factors):
+    """
+    Same model trained by the implicit library, on the confidences of implicit_confidence.
+    """
+    from implicit.cpu.als import AlternatingLeastSquares
+
+    model = AlternatingLeastSquares(factors=n_factors, regularization=regularization, alpha=1.0,
+                                    iterations=n_iterations, calculate_training_loss=False,
+                                    num_threads=n_threads, random_state=seed)
+    if item_factors is not None:
+        # Factors that are already set are not initialized again
+        model.user_factors = np.zeros((weights.shape[0], n_factors), dtype=np.float32)
+        model.item_factors = np.ascontiguousarray(item_factors, dtype=np.float32)
+    model.fit(implicit_confidence(weights), show_progress=False)
+
+    return np.asarray(model.user_factors, dtype=np.float32), np.asarray(model.item_factors, dtype=np.float32)
+
+
+def train_als(weights, n_factors=64, regularization=50.0, n_iterations=15, cg_steps=3, seed=42, n_threads=-1,
+              backend='numpy', item_factors=None, block_size=2048):
+    """
+    Trains a confidence-weighted matrix factorization of implicit feedback (Hu, Koren
+    and Volinsky) by alternating least squares. Every half-iteration solves the user
+    (then book) factors with the others fixed, each system approximately with a few
+    conjugate-gradient steps started from the previous solution, so the cost is linear
+    in the number of interactions.
+
+    Args:
+        weights (scipy.sparse.csr_matrix): Users x books weights built by confidence_matrix.
+        n_factors (int): Number of latent factors.
+        regularization (float): L2 penalty of the factors.
+        n_iterations (int): Number of alternating iterations.
+        cg_steps (int): Conjugate-gradient steps per system and half-iteration.
+        seed (int): Seed of the initial factors.
+        n_threads (int): Number of threads, -1 for every core.
+        backend (str): 'numpy' or 'implicit', see resolve_backend.
+        item_factors (np.ndarray, optional): Initial book factors, to continue training
+            after new interactions; random when None.
+        block_size (int): Number of rows solved together by a thread.
+
+    Returns:
+        tuple: float32 (user_factors, item_factors) arrays.
+    """
+    n_threads = (os.cpu_count() or 1) if n_threads == -1 else n_threads
+    weights = weights.tocsr().astype(np.float32)
+    if backend == 'implicit':
+        return _train_implicit(weights, n_factors, regularization, n_iterations, seed, n_threads, item_factors)
+
+    rng = np.random.default_rng(seed)
+    X = (rng.standard_normal((weights.shape[0], n_factors)) * 0.01).astype(np.float32)
+    if item_factors is None:
+        Y = (rng.standard_normal((weights.shape[1], n_factors)) * 0.01).astype(np.float32)
+    else:
+        Y = np.array(item_factors, dtype=np.float32)
+    item_weights = weights.T.tocsr()
+
+    for iteration in range(n_iterations):
+        _least_squares(weights, X, Y, regularization, cg_steps, n_threads, block_size)
+        _least_squares(item_weights, Y, X, regularization, cg_steps, n_threads, block_size)
+        logging.info(f"ALS iteration {iteration + 1}/{n_iterations} done")
+
+    return X, Y
+
+
+def warm_start_item_factors(old_item_factors, item_map, n_items, seed=42):
+    """
+    Book factors of a previous model moved to the book positions of a new matrix, new
+    books start from small random factors.
+    """
+    old_item_factors = np.asarray(old_item_factors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    item_factors = (rng.standard_normal((n_items, old_item_factors.shape[1])) * 0.01).astype(np.float32)
+    kept = np.flatnonzero(item_map >= 0)
+    item_factors[item_map[kept]] = old_item_factors[kept]
+
+    return item_factors
+
+
+def als_scores(factors, user_indices):
+    """
+    Preference scores of every book for a block of users, one matrix product.
+    """
+    return factors['user_factors'][np.asarray(user_indices, dtype=np.int64)] @ factors['item_factors'].T
+
+
+def als_recommend_block(factors, user_indices, top_n):
+    """
+    Picks the top N books of a block of users by preference score, skipping every book
+    each user interacted with, implicitly or not.
+
+    Args:
+        factors (dict): 'user_factors', 'item_factors' and the 'rated' pattern.
+        user_indices (np.ndarray): Row indices of the users being scored.
+        top_n (int): Number of books to return per user.
+
+    Returns:
+        list: One (book indices, scores) tuple per user, ordered by descending score.
+    """
+    user_indices = np.asarray(user_indices, dtype=np.int64)
+    scores = als_scores(factors, user_indices)
+    rated_rows, rated_cols = factors['rated'][user_indices].nonzero()
+    scores[rated_rows, rated_cols] = -np.inf
+
+    books = top_k_rows(scores, top_n)
+
+    result = []
+    for row, row_books in enumerate(books):
+        row_books = row_books[row_books >= 0]
+        result.append((row_books, scores[row, row_books]))
+
+    return result
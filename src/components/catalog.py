@@ -0,0 +1,49 @@
+import numpy as np
+
+
+def build_book_catalog(data):
+    """
+    Builds a deduplicated book catalog from a ratings table.
+
+    Each title keeps the author, image URL and ISBN of its first row in the table, which
+    is the row the recommender used to look up with a boolean scan. The catalog is a
+    dictionary of aligned arrays sorted by title, so the row of a title is also its
+    position in the pivot table columns.
+
+    Args:
+        data (pandas DataFrame): Ratings table with Book-Title, Book-Author, Image-URL-M and ISBN.
+
+    Returns:
+        dict: Aligned 'titles', 'authors', 'image_urls' and 'isbns' arrays.
+    """
+    books = data.drop_duplicates(subset='Book-Title', keep='first').sort_values('Book-Title')
+
+    return {
+        'titles': books['Book-Title'].to_numpy(),
+        'authors': books['Book-Author'].to_numpy(),
+        'image_urls': books['Image-URL-M'].to_numpy(),
+        'isbns': books['ISBN'].to_numpy(),
+    }
+
+
+def catalog_rows(catalog, titles):
+    """
+    Maps book titles to their rows in the catalog.
+
+    Args:
+        catalog (dict): Catalog built by build_book_catalog.
+        titles (array-like): Titles to look up.
+
+    Returns:
+        np.ndarray: Catalog row of every title.
+    """
+    # The catalog is sorted by title, so a binary search finds every row
+    catalog_titles = np.asarray(catalog['titles'])
+    titles = np.asarray(titles)
+    rows = np.minimum(np.searchsorted(catalog_titles, titles), len(catalog_titles) - 1)
+
+    missing = catalog_titles[rows] != titles
+    if missing.any():
+        raise KeyError(f"Titles missing from the book catalog: {titles[missing][:5].tolist()}")
+
+    return rows
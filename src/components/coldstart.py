@@ -0,0 +1,258 @@
+from bisect import bisect_right
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from sklearn.preprocessing import normalize
+
+from src.components.incremental import id_positions
+from src.components.scoring import top_k_indices, rank_books
+
+# Lower bounds of the age bands of the cold-start segments
+AGE_BANDS = (0, 18, 25, 35, 45, 55, 65)
+
+
+def age_bands(ages):
+    """
+    Age band of every age, len(AGE_BANDS) (any age) when it is missing.
+    """
+    ages = np.asarray(ages, dtype=np.float64)
+    bands = np.searchsorted(AGE_BANDS, np.nan_to_num(ages, nan=-1), side='right') - 1
+    return np.where(np.isnan(ages) | (bands < 0), len(AGE_BANDS), bands).astype(np.int8)
+
+
+def age_band(age):
+    """
+    Age band of a single age, see age_bands.
+    """
+    if age is None or np.isnan(age) or age < AGE_BANDS[0]:
+        return len(AGE_BANDS)
+
+    return bisect_right(AGE_BANDS, age) - 1
+
+
+def clean_countries(countries):
+    """
+    Lower-cased, stripped country names, '' when missing.
+    """
+    countries = pd.Series(countries, dtype=object)
+    return countries.where(countries.notna(), '').astype(str).str.strip().str.lower().to_numpy(dtype=object)
+
+
+def _rank_segments(scores, global_counts, top_n):
+    """
+    Top N books of every segment by score, ties broken by the global number of ratings
+    then by the lower index.
+    """
+    top_n = min(top_n, scores.shape[-1])
+    books = np.empty(scores.shape[:-1] + (top_n,), dtype=np.int32)
+    for segment in np.ndindex(scores.shape[:-1]):
+        order = np.lexsort((np.arange(scores.shape[-1]), -global_counts, -scores[segment]))
+        books[segment] = order[:top_n]
+
+    return books, np.take_along_axis(scores, books, axis=-1).astype(np.float32)
+
+
+def build_cold_start(ratings_table, bundle, users, top_n=50, prior_weight=10, max_countries=50):
+    """
+    Builds the cold-start arrays served to users outside the filtered user-item matrix.
+
+    Segments are the max_countries countries with the most users, crossed with the
+    AGE_BANDS, plus an 'any' entry on both axes. Every segment ranks the books of the
+    user-item matrix by the Bayesian average of its explicit (non-zero) ratings from
+    every cleaned user, shrunk towards the book's global Bayesian average with
+    prior_weight pseudo-ratings, which is itself shrunk towards the global mean. Small
+    segments therefore fall back to the global ranking smoothly.
+
+    Users with a few ratings are served by neighbour search instead: the ratings of
+    every cleaned user on the matrix books are kept, with the L2-normalized matrix
+    stored book-major, so the similarities of a sparse rating vector to all matrix
+    users are one product over the rows of the books it rated.
+
+    Args:
+        ratings_table (dict): Encoded ratings of every cleaned user (see encode_ratings).
+        bundle (dict): User-item matrix bundle the recommender serves.
+        users (pandas DataFrame): User-ID, Country and Age of the cleaned users.
+        top_n (int): Number of books kept per segment.
+        prior_weight (float): Weight of the prior, in ratings.
+        max_countries (int): Number of countries with their own segments.
+
+    Returns:
+        dict: 'countries' of the segments, 'segment_books' and 'segment_scores' of shape
+        (n_countries + 1, n_bands + 1, top_n) where the last entries mean any country or
+        age, the sorted 'user_ids' of every cleaned user with their 'user_countries' and
+        'user_ages', 'country_names' (every country, 'user_countries' indexes it) and
+        its 'country_segments', the 'user_ratings' matrix of every cleaned user over the
+        matrix books and the book x user 'normalized_items' matrix.
+    """
+    n_books = len(bundle['book_titles'])
+
+    # Demographics of every user that has ratings, the last row of a user wins
+    users = users.drop_duplicates('User-ID', keep='last')
+    user_ids = np.asarray(ratings_table['user_ids'])
+    positions = id_positions(users['User-ID'].to_numpy(), user_ids)
+    found = positions >= 0
+    country_names, country_codes = np.unique(clean_countries(users['Country'])[found].astype(str), return_inverse=True)
+    user_countries = np.full(len(user_ids), -1, dtype=np.int32)
+    user_countries[positions[found]] = country_codes
+    user_ages = np.full(len(user_ids), np.nan, dtype=np.float32)
+    user_ages[positions[found]] = users['Age'].to_numpy(dtype=np.float64)[found]
+
+    # Segment countries, most users first; the others only count towards 'any country'
+    user_counts = np.bincount(user_countries[user_countries >= 0], minlength=len(country_names))
+    known = np.flatnonzero((country_names != '') & (country_names != 'n/a') & (user_counts > 0))
+    countries = known[np.lexsort((known, -user_counts[known]))][:max_countries]
+    n_countries, n_bands = len(countries), len(AGE_BANDS)
+    # One extra entry, so users without demographics (country -1) map to 'any country'
+    country_segments = np.full(len(country_names) + 1, n_countries, dtype=np.int16)
+    country_segments[countries] = np.arange(n_countries)
+
+    # Ratings of every cleaned user on the books of the matrix
+    book_columns = id_positions(np.asarray(ratings_table['book_titles']).astype(str),
+                                np.asarray(bundle['book_titles']).astype(str))
+    columns = book_columns[np.asarray(ratings_table['book_codes'])]
+    rows = np.asarray(ratings_table['user_codes'])[columns >= 0]
+    ratings = np.asarray(ratings_table['ratings'])[columns >= 0].astype(np.float32)
+    columns = columns[columns >= 0]
+    user_ratings = coo_matrix((ratings, (rows, columns)), shape=(len(user_ids), n_books)).tocsr()
+    user_ratings.sum_duplicates()
+
+    # Explicit rating counts and sums per segment cell, then the 'any' margins
+    explicit = ratings > 0
+    segment_country = country_segments[user_countries[rows[explicit]]]
+    segment_band = age_bands(user_ages[rows[explicit]])
+    cells = (segment_country.astype(np.int64) * (n_bands + 1) + segment_band) * n_books + columns[explicit]
+    shape = (n_countries + 1, n_bands + 1, n_books)
+    counts = np.bincount(cells, minlength=np.prod(shape)).reshape(shape).astype(np.float64)
+    sums = np.bincount(cells, weights=ratings[explicit], minlength=np.prod(shape)).reshape(shape)
+    for margins in (counts, sums):
+        margins[:, n_bands] = margins.sum(axis=1)
+        margins[n_countries] = margins.sum(axis=0)
+
+    global_counts, global_sums = counts[n_countries, n_bands], sums[n_countries, n_bands]
+    global_mean = global_sums.sum() / max(global_counts.sum(), 1)
+    global_scores = (prior_weight * global_mean + global_sums) / (prior_weight + global_counts)
+
+    # Segments shrink towards the global score, 'any country, any age' is the global ranking
+    scores = (prior_weight * global_scores + sums) / (prior_weight + counts)
+    scores[n_countries, n_bands] = global_scores
+    segment_books, segment_scores = _rank_segments(scores, global_counts, top_n)
+
+    return {
+        'countries': country_names[countries],
+        'segment_books': segment_books,
+        'segment_scores': segment_scores,
+        'user_ids': user_ids,
+        'user_countries': user_countries,
+        'user_ages': user_ages,
+        'country_names': country_names,
+        'country_segments': country_segments,
+        'user_ratings': user_ratings,
+        'normalized_items': normalize(bundle['matrix'].tocsr().astype(np.float64), norm='l2', axis=1).T.tocsr(),
+    }
+
+
+def segment_books(cold_start, country_segment, band, top_n, exclude=()):
+    """
+    Top N books of a segment, skipping the excluded ones.
+    """
+    books = np.asarray(cold_start['segment_books'][country_segment, band])
+    if len(exclude):
+        books = books[~np.isin(books, exclude)]
+
+    return books[:top_n]
+
+
+def gather_rows(matrix, rows):
+    """
+    Nonzeros of some rows of a CSR matrix straight from its arrays, which avoids the
+    overhead of sparse fancy indexing on the few rows of a single request.
+
+    Returns:
+        tuple: Position of the row in rows, column and value of every nonzero, in order.
+    """
+    starts, ends = matrix.indptr[rows], matrix.indptr[np.asarray(rows) + 1]
+    lengths = ends - starts
+    owner = np.repeat(np.arange(len(lengths)), lengths)
+    positions = np.arange(lengths.sum()) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+
+    return owner, matrix.indices[positions], matrix.data[positions]
+
+
+def neighbour_books(cold_start, rating_matrix, book_indices, ratings, top_n, n_neighbors):
+    """
+    Recommends books to a user outside the matrix from the few ratings it has.
+
+    The sparse rating vector is projected onto the book-major normalized matrix, which
+    gives its cosine similarity (up to the norm of the vector) to every matrix user,
+    then the ratings of its n_neighbors most similar users are summed and ranked like
+    for a matrix user. Only the explicit ratings are projected, but every book the
+    user rated, implicit 0 ratings included, is excluded.
+
+    Args:
+        cold_start (dict): Arrays built by build_cold_start.
+        rating_matrix (scipy.sparse.csr_matrix): User x book rating matrix.
+        book_indices (np.ndarray): Matrix columns of the books the user rated.
+        ratings (np.ndarray): The user's ratings of these books, 0 for implicit ones.
+        top_n (int): Number of books to return.
+        n_neighbors (int): Number of similar users aggregated.
+
+    Returns:
+        np.ndarray: Up to top_n book indices, empty when no user shares a rated book.
+    """
+    book_indices = np.asarray(book_indices, dtype=np.int64)
+    ratings = np.asarray(ratings, dtype=np.float64)
+    explicit = ratings > 0
+    normalized_items = cold_start['normalized_items']
+    owner, users, values = gather_rows(normalized_items, book_indices[explicit])
+    similarity = np.bincount(users, weights=values * ratings[explicit][owner], minlength=normalized_items.shape[1])
+    similarity[similarity <= 0] = -np.inf
+    neighbours = top_k_indices(similarity, n_neighbors)
+    if len(neighbours) == 0:
+        return neighbours
+
+    owner, columns, values = gather_rows(rating_matrix, neighbours)
+    scores = np.bincount(columns, weights=values, minlength=rating_matrix.shape[1])
+    scores[book_indices] = 0
+
+    # Rank of the nearest neighbour that rated each book, used to break ties
+    first_seen = np.full(rating_matrix.shape[1], len(neighbours), dtype=np.int32)
+    np.minimum.at(first_seen, columns, owner.astype(np.int32))
+
+    return rank_books(scores, first_seen, top_n)
+
+
+def cold_start_books(cold_start, rating_matrix, top_n=5, n_neighbors=5, country=None, age=None, book_indices=(),
+                     ratings=()):
+    """
+    Top N books of a user outside the matrix: neighbour search from its explicit
+    ratings when it has some, completed with the ranking of its country and age band.
+
+    Args:
+        cold_start (dict): Arrays built by build_cold_start.
+        rating_matrix (scipy.sparse.csr_matrix): User x book rating matrix.
+        top_n (int): Number of books to return.
+        n_neighbors (int): Number of similar users aggregated, 0 disables neighbour search.
+        country (int): Country segment, the last one (any country) when None.
+        age (float): Age of the user, any age band when None.
+        book_indices (array-like): Matrix columns of the books the user rated.
+        ratings (array-like): The user's ratings of these books.
+
+    Returns:
+        np.ndarray: Up to top_n book indices.
+    """
+    book_indices = np.asarray(book_indices, dtype=np.int64)
+    ratings = np.asarray(ratings, dtype=np.float64)
+    country = len(cold_start['countries']) if country is None else country
+    band = age_band(age)
+
+    books = np.empty(0, dtype=np.int64)
+    explicit = ratings > 0
+    if n_neighbors > 0 and explicit.any():
+        books = neighbour_books(cold_start, rating_matrix, book_indices, ratings, top_n, n_neighbors)
+
+    if len(books) < top_n:
+        popular = segment_books(cold_start, country, band, top_n - len(books), exclude=np.concatenate((book_indices, books)))
+        books = np.concatenate((books, popular))
+
+    return books.astype(np.int64)
@@ -1,10 +1,31 @@
 import os
 import sys
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from dataclasses import dataclass
 from src.logger import logging
 from src.exception import CustomException
+from src.components.stagecache import Stage
+
+# Column types of the cleaned parquet file, the remaining columns are plain strings
+CATEGORICAL_COLUMNS = ['Book-Title', 'Book-Author', 'Publisher', 'City', 'State', 'Country']
+INTEGER_COLUMNS = ['User-ID', 'Book-Rating']
+FLOAT_COLUMNS = ['Year-Of-Publication', 'Age']
+
+def read_cleaned_data(file_path, columns=None):
+    '''
+    Reads the cleaned parquet file, only the requested columns are decoded. Categories
+    are put in sorted order, so that sorting or factorizing a categorical column gives
+    the same order as the plain strings would.
+    '''
+    df = pd.read_parquet(file_path, columns=columns)
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].cat.reorder_categories(sorted(df[column].cat.categories))
+    return df
 
 #Initializze the Data Ingestion Configuration
 
@@ -20,6 +41,10 @@ class DataIngestionConfig:
     '''
     
     cleaned_data_path = os.path.join('artifacts', 'cleaned_data.csv')
+    cleaned_parquet_path = os.path.join('artifacts', 'cleaned_data.parquet')
+    books_data_path = os.path.join('notebooks', 'data', 'Books.csv')
+    ratings_data_path = os.path.join('notebooks', 'data', 'Ratings.csv')
+    users_data_path = os.path.join('notebooks', 'data', 'Users.csv')
     
 
 ##Create a class for Data Ingestion
@@ -33,10 +58,14 @@ class DataIngestion:
         self.ingestion_config = DataIngestionConfig()
         logging.info("Data Ingestion Configuration completed")
         
-    def initiate_data_ingestion(self):
+    def initiate_data_ingestion(self, load_ratings=True):
         """
         Reads the required datasets (Books, Ratings, Users) from the given file paths 
         and returns them as pandas DataFrames.
+
+        Args:
+            load_ratings (bool): When False the ratings are not read (ratings_df is None),
+                for the streaming mode which reads them in chunks later.
         
         Returns:
             tuple: books_df, ratings_df, users_df (pandas DataFrames)
@@ -47,9 +76,9 @@ class DataIngestion:
         try:
             
             logging.info("Readin the datasets")
-            books_df = pd.read_csv('notebooks/data/Books.csv', encoding='ISO-8859-1')
-            ratings_df = pd.read_csv('notebooks/data/Ratings.csv', encoding='ISO-8859-1')
-            users_df = pd.read_csv('notebooks/data/Users.csv', encoding='ISO-8859-1')
+            books_df = pd.read_csv(self.ingestion_config.books_data_path, encoding='ISO-8859-1')
+            ratings_df = pd.read_csv(self.ingestion_config.ratings_data_path, encoding='ISO-8859-1') if load_ratings else None
+            users_df = pd.read_csv(self.ingestion_config.users_data_path, encoding='ISO-8859-1')
             
             return books_df,ratings_df,users_df
         
@@ -58,6 +87,18 @@ class DataIngestion:
             raise CustomException(e,sys)
         
         
+    def read_dataset(self,file_path):
+        """
+        Reads one of the raw datasets (Books, Ratings or Users).
+        """
+        logging.info(f"Reading the dataset {file_path}")
+        try:
+            return pd.read_csv(file_path, encoding='ISO-8859-1')
+
+        except Exception as e:
+            logging.info(f'Error occured while reading the dataset {file_path}')
+            raise CustomException(e,sys)
+
     def split_location(self,users_df):
         """
         Splits the 'Location' column in the Users dataset into 'City', 'State', and 'Country' 
@@ -70,44 +111,24 @@ class DataIngestion:
         logging.info("Spliting the Location feature of the user dataset")
         
         try:
-
             
-            # Function to extract City, State, and Country
-            def extract_location(location):
-                """
-                Helper function to split the 'Location' column into 'City', 'State', and 'Country'.
+            # Locations are split column-wise: "city, state, country" (3 parts),
+            # "city, country" (2 parts) or "city" (1 part); anything longer is left empty
+            logging.info("Spliting the location feature by ','")
+            locations = users_df['Location'].fillna('nan').astype(str)
+            n_parts = locations.str.count(',') + 1
+            parts = locations.str.split(',', n=2, expand=True).reindex(columns=range(3))
+            parts = parts.fillna("").apply(lambda part: part.str.strip())
 
-                Args:
-                    location (str): Location string containing comma-separated values.
+            logging.info("Setting the values of city , state, country")
+            city = parts[0].where(n_parts <= 3, "")
+            state = parts[1].where(n_parts == 3, "")
+            country = parts[2].where(n_parts == 3, parts[1].where(n_parts == 2, ""))
 
-                Returns:
-                    pandas Series: Extracted City, State, and Country.
-                """
-                
-                logging.info("Spliting the location feature by ','")
-                parts = [part.strip() for part in str(location).split(',')]
-    
-                logging.info("Defining the city, state and country variables")
-                # Assign default empty values
-                city, state, country = "", "", ""
-
-                logging.info("Setting the values of city , state, country")
-                # Extract based on available parts
-                if len(parts) == 3:
-                    city, state, country = parts
-                elif len(parts) == 2:
-                    city, state, country = parts[0], "", parts[1]
-                elif len(parts) == 1:
-                    city = parts[0]
-
-                # Handling cases where 'n/a' appears in the state field
-                if state.lower() == "n/a":
-                    state = ""
-
-                return pd.Series([city, state, country])
-            
-            logging.info("Calling the function to split the location feature")
-            users_df[['City', 'State', 'Country']] = users_df['Location'].apply(extract_location)
+            # Handling cases where 'n/a' appears in the state field
+            state = state.mask(state.str.lower() == "n/a", "")
+
+            users_df['City'], users_df['State'], users_df['Country'] = city, state, country
             logging.info("Splited the location feature")
             
             #Now the location feature in the user dataset is no longer required , so just remove it
@@ -215,6 +236,14 @@ class DataIngestion:
             raise CustomException(e,sys)
       
                 
+    def clean_books(self,books_df):
+        """
+        Cleans the Books dataset: missing values, image urls and year of publication.
+        """
+        books_df = self.handle_nullvalues_booksdataset(books_df= books_df)
+        books_df = self.remove_imageUrls(books_df= books_df)
+        return self.clean_year_of_publication(books_df= books_df)
+
     def megring_datasets(self,users_df,ratings_df,books_df):
         """
         Merges the Users, Ratings, and Books datasets into a single DataFrame.
@@ -246,6 +275,13 @@ class DataIngestion:
             logging.info("Error occured while merging the datasets")
             raise CustomException(e,sys)
         
+    def replace_out_of_range_ages(self,final_merged_df):
+        """
+        Replaces the out-of-range values (below 5 or above 100) of the 'Age' feature by NaN.
+        """
+        final_merged_df.loc[(final_merged_df['Age'] < 5) | (final_merged_df['Age'] > 100), 'Age'] = None
+        return final_merged_df
+
     def handling_age_nan_values(self,final_merged_df):
         """
         Handles missing and out-of-range values in the 'Age' feature using median imputation.
@@ -262,7 +298,7 @@ class DataIngestion:
         try:
             logging.info("Replacing the out of range values by nan")
             # Replace out-of-range values
-            final_merged_df.loc[(final_merged_df['Age'] < 5) | (final_merged_df['Age'] > 100), 'Age'] = None
+            final_merged_df = self.replace_out_of_range_ages(final_merged_df)
             
             # Compute median ages by book rating and publication year
             
@@ -272,27 +308,40 @@ class DataIngestion:
             year_medians = final_merged_df.groupby('Year-Of-Publication')['Age'].median()
             logging.info("Defining the over_all median of age")
             overall_median = final_merged_df['Age'].median()
-    
-            logging.info("Defining the function to impute the age")
-            def impute_age(row):
-                if pd.notna(row['Age']):
-                    return row['Age']
-                elif row['Book-Rating'] in rating_medians:
-                    return rating_medians[row['Book-Rating']]
-                elif row['Year-Of-Publication'] in year_medians:
-                    return year_medians[row['Year-Of-Publication']]
-                else:
-                    return overall_median
-            logging.info("Imputing the age feature")
-            final_merged_df['Age'] = final_merged_df.apply(impute_age, axis=1)
-            final_merged_df['Age'].fillna(overall_median, inplace=True)
 
-            return final_merged_df
+            return self.impute_age(final_merged_df, rating_medians, year_medians, overall_median)
             
         except Exception as e:
             
             logging.info("Error occured while handlin the nan values of age feature")
             raise CustomException(e,sys)
+
+    def impute_age(self,final_merged_df,rating_medians,year_medians,overall_median):
+        """
+        Imputes the missing 'Age' values from precomputed medians: the median age of the
+        book rating, then of the publication year, then the overall median.
+
+        Args:
+            final_merged_df (pandas DataFrame): Merged dataset with out-of-range ages already set to NaN.
+            rating_medians (pandas Series): Median age per 'Book-Rating'.
+            year_medians (pandas Series): Median age per 'Year-Of-Publication'.
+            overall_median (float): Median age of the whole dataset.
+
+        Returns:
+            pandas DataFrame: Updated dataset with imputed 'Age' feature.
+        """
+        # Resolved column-wise: the rating median when the rating has a group, else the
+        # year median when the year has a group, else the overall median
+        logging.info("Looking up the median age of every row's book rating and publication year")
+        rating_fill = final_merged_df['Book-Rating'].map(rating_medians)
+        year_fill = final_merged_df['Year-Of-Publication'].map(year_medians)
+        year_fill = year_fill.where(final_merged_df['Year-Of-Publication'].isin(year_medians.index), overall_median)
+        age_fill = rating_fill.where(final_merged_df['Book-Rating'].isin(rating_medians.index), year_fill)
+
+        logging.info("Imputing the age feature")
+        final_merged_df['Age'] = final_merged_df['Age'].fillna(age_fill).fillna(overall_median)
+
+        return final_merged_df
         
     def save_cleaned_csv(self,df, index=False):
         """
@@ -320,4 +369,239 @@ class DataIngestion:
 
         except Exception as e:
             logging.error(f"Error while saving the DataFrame to {file_path}")
-            raise CustomException(e, sys)
\ No newline at end of file
+            raise CustomException(e, sys)
+
+    def stream_cleaned_data(self,users_df,books_df,chunk_size=100000,file_format='parquet'):
+        """
+        Streaming alternative to megring_datasets + handling_age_nan_values + save_cleaned_parquet.
+
+        Books and users are small lookup tables that are cleaned in memory beforehand. The
+        ratings are read in chunks of chunk_size rows and every chunk is merged, has its
+        ages imputed and is appended to the cleaned file, so peak memory is bounded by the
+        chunk size rather than by the size of the ratings dump.
+
+        The age medians depend on the whole dataset, so the ratings are read twice: a first
+        pass accumulates age histograms per book rating and publication year (from which
+        the medians are exact), the second pass imputes and writes. The output is identical
+        to the batch result.
+
+        Args:
+            users_df (pandas DataFrame): Cleaned Users dataset (split location).
+            books_df (pandas DataFrame): Cleaned Books dataset.
+            chunk_size (int): Number of ratings processed at a time.
+            file_format (str): 'parquet' (one row group per chunk) or 'csv'.
+
+        Returns:
+            int: Number of rows written.
+        """
+        logging.info(f"Streaming the ratings in chunks of {chunk_size} rows")
+
+        try:
+            # Pass 1: age histograms of the merged data
+            logging.info("Accumulating the age histograms")
+            rating_counts, year_counts = [], []
+            for chunk in self.read_ratings_chunks(chunk_size):
+                merged_chunk = self.replace_out_of_range_ages(self.megring_datasets(users_df, chunk, books_df))
+                rating_counts.append(merged_chunk.groupby(['Book-Rating', 'Age'], dropna=False).size())
+                year_counts.append(merged_chunk.groupby(['Year-Of-Publication', 'Age'], dropna=False).size())
+
+            rating_counts = pd.concat(rating_counts).groupby(level=[0, 1], dropna=False).sum()
+            year_counts = pd.concat(year_counts).groupby(level=[0, 1], dropna=False).sum()
+
+            rating_medians = self.median_from_counts(rating_counts)
+            year_medians = self.median_from_counts(year_counts)
+            overall_median = self.median_from_histogram(rating_counts.groupby(level=1, dropna=False).sum())
+
+            # Pass 2: merge, impute and append every chunk
+            if file_format == 'parquet':
+                file_path = self.ingestion_config.cleaned_parquet_path
+            else:
+                file_path = self.ingestion_config.cleaned_data_path
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+            logging.info(f"Writing the cleaned chunks to {file_path}")
+            n_rows = 0
+            writer = None
+            for chunk in self.read_ratings_chunks(chunk_size):
+                merged_chunk = self.replace_out_of_range_ages(self.megring_datasets(users_df, chunk, books_df))
+                if merged_chunk.empty:
+                    continue
+                cleaned_chunk = self.impute_age(merged_chunk, rating_medians, year_medians, overall_median)
+
+                if file_format == 'parquet':
+                    if writer is None:
+                        schema = self.cleaned_data_schema(cleaned_chunk.columns)
+                        writer = pq.ParquetWriter(file_path, schema, compression='zstd')
+                    writer.write_table(pa.Table.from_pandas(self.typed_cleaned_data(cleaned_chunk),
+                                                            schema=schema, preserve_index=False))
+                else:
+                    cleaned_chunk.to_csv(file_path, index=False, encoding="utf-8",
+                                         mode='w' if n_rows == 0 else 'a', header=n_rows == 0)
+                n_rows += len(cleaned_chunk)
+
+            if writer is not None:
+                writer.close()
+
+            logging.info(f"Streamed {n_rows} cleaned rows to {file_path}")
+
+            return n_rows
+
+        except Exception as e:
+            logging.info("Error occured while streaming the cleaned data")
+            raise CustomException(e,sys)
+
+    def read_ratings_chunks(self,chunk_size):
+        """
+        Reads the Ratings dataset in chunks of chunk_size rows. ISBN is always read as a
+        string so that every chunk has the same dtypes.
+        """
+        return pd.read_csv(self.ingestion_config.ratings_data_path, encoding='ISO-8859-1',
+                           dtype={'ISBN': str}, chunksize=chunk_size)
+
+    @staticmethod
+    def median_from_histogram(value_counts):
+        """
+        Computes the exact median of a histogram, ignoring the NaN bucket.
+
+        Args:
+            value_counts (pandas Series): Number of rows per value.
+
+        Returns:
+            float: The median, NaN if there is no value.
+        """
+        value_counts = value_counts[value_counts.index.notna()].sort_index()
+        total = value_counts.sum()
+        if total == 0:
+            return np.nan
+
+        cumulative = value_counts.cumsum().to_numpy()
+        values = value_counts.index.to_numpy(dtype=np.float64)
+        lower = values[np.searchsorted(cumulative, (total + 1) // 2)]
+        upper = values[np.searchsorted(cumulative, total // 2 + 1)]
+
+        return (lower + upper) / 2
+
+    def median_from_counts(self,counts):
+        """
+        Computes exact medians per group from a (group, value) histogram.
+
+        Args:
+            counts (pandas Series): Number of rows per (group, value), NaN values included.
+
+        Returns:
+            pandas Series: Median value per group, NaN for groups without any value, in
+            the same form as groupby(group)[value].median().
+        """
+        medians = {group: self.median_from_histogram(group_counts.droplevel(0))
+                   for group, group_counts in counts.groupby(level=0, dropna=False)}
+
+        return pd.Series(medians, dtype=np.float64)
+
+    def typed_cleaned_data(self,df):
+        """
+        Casts the cleaned dataset to compact types: categorical text columns, int32 ids and
+        ratings, float32 year and age.
+        """
+        df = df.copy()
+        for column in df.columns:
+            if column in CATEGORICAL_COLUMNS:
+                df[column] = df[column].astype('category')
+            elif column in INTEGER_COLUMNS:
+                df[column] = df[column].astype(np.int32)
+            elif column in FLOAT_COLUMNS:
+                df[column] = df[column].astype(np.float32)
+        return df
+
+    def cleaned_data_schema(self,columns):
+        """
+        Arrow schema of the cleaned parquet file, categorical columns are dictionary encoded.
+        """
+        fields = []
+        for column in columns:
+            if column in CATEGORICAL_COLUMNS:
+                fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+            elif column in INTEGER_COLUMNS:
+                fields.append(pa.field(column, pa.int32()))
+            elif column in FLOAT_COLUMNS:
+                fields.append(pa.field(column, pa.float32()))
+            else:
+                fields.append(pa.field(column, pa.string()))
+        return pa.schema(fields)
+
+    def save_cleaned_parquet(self,df):
+        """
+        Saves the cleaned dataset as a typed, zstd-compressed parquet file.
+
+        Args:
+            df (pd.DataFrame): The cleaned dataset.
+
+        Raises:
+        CustomException: If any error occurs during the saving process.
+        """
+        try:
+            file_path = self.ingestion_config.cleaned_parquet_path
+            logging.info(f"Saving DataFrame to {file_path}")
+
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+            table = pa.Table.from_pandas(self.typed_cleaned_data(df), schema=self.cleaned_data_schema(df.columns),
+                                         preserve_index=False)
+            pq.write_table(table, file_path, compression='zstd')
+
+            logging.info(f"DataFrame successfully saved to {file_path}")
+
+        except Exception as e:
+            logging.error(f"Error while saving the DataFrame to {file_path}")
+            raise CustomException(e, sys)
+
+    def cleaning_stages(self,chunk_size=0,file_format='parquet'):
+        """
+        Describes the data cleaning pipeline as a DAG of stages for StagePipeline (see
+        stagecache.py): the raw datasets are read, users and books are cleaned, then
+        merged with the ratings and the ages imputed before saving (or all of it chunk by
+        chunk when chunk_size > 0). Intermediate DataFrames are kept in the stage cache,
+        keyed by the raw file contents and the code of every step.
+
+        Args:
+            chunk_size (int): Stream the ratings in chunks of this many rows, 0 loads them at once.
+            file_format (str): 'parquet' or 'csv'.
+
+        Returns:
+            list: The stages of the pipeline.
+        """
+        config = self.ingestion_config
+        output_path = config.cleaned_parquet_path if file_format == 'parquet' else config.cleaned_data_path
+
+        stages = [
+            Stage('ingest_books', self.read_dataset, params={'file_path': config.books_data_path},
+                  files=(config.books_data_path,)),
+            Stage('ingest_users', self.read_dataset, params={'file_path': config.users_data_path},
+                  files=(config.users_data_path,)),
+            Stage('split_location', self.split_location, inputs={'users_df': 'ingest_users'}),
+            Stage('clean_books', self.clean_books, inputs={'books_df': 'ingest_books'},
+                  code=(self.handle_nullvalues_booksdataset, self.remove_imageUrls, self.clean_year_of_publication)),
+        ]
+
+        if chunk_size > 0:
+            # The ratings are read chunk by chunk inside the stage, they are a file input
+            stages.append(Stage('stream', self.stream_cleaned_data,
+                                inputs={'users_df': 'split_location', 'books_df': 'clean_books'},
+                                params={'chunk_size': chunk_size, 'file_format': file_format},
+                                files=(config.ratings_data_path,), outputs=(output_path,),
+                                code=(self.read_ratings_chunks, self.megring_datasets, self.replace_out_of_range_ages,
+                                      self.impute_age, self.median_from_histogram, self.median_from_counts,
+                                      self.typed_cleaned_data, self.cleaned_data_schema)))
+            return stages
+
+        save = self.save_cleaned_parquet if file_format == 'parquet' else self.save_cleaned_csv
+        save_code = (self.typed_cleaned_data, self.cleaned_data_schema) if file_format == 'parquet' else ()
+        stages += [
+            Stage('ingest_ratings', self.read_dataset, params={'file_path': config.ratings_data_path},
+                  files=(config.ratings_data_path,)),
+            Stage('merge', self.megring_datasets,
+                  inputs={'users_df': 'split_location', 'ratings_df': 'ingest_ratings', 'books_df': 'clean_books'}),
+            Stage('impute_age', self.handling_age_nan_values, inputs={'final_merged_df': 'merge'},
+                  code=(self.replace_out_of_range_ages, self.impute_age)),
+            Stage('save', save, inputs={'df': 'impute_age'}, outputs=(output_path,), code=save_code),
+        ]
+        return stages
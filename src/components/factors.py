@@ -0,0 +1,153 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from src.components.scoring import top_k_rows
+
+
+def export_svd_factors(model, trainset, user_ids, book_titles, rated):
+    """
+    Exports the factors of a trained surprise SVD model as dense float32 arrays aligned
+    with the rows (users) and columns (books) of the user-item matrix.
+
+    Users and books the model was not trained on get zero factors and biases, so the
+    dot-product formula gives the same estimate as surprise's predict for them
+    (global mean plus whatever biases are known).
+
+    Args:
+        model (surprise.SVD): Trained model.
+        trainset (surprise.Trainset): Trainset the model was fitted on.
+        user_ids (np.ndarray): User-ID of every matrix row.
+        book_titles (np.ndarray): Book-Title of every matrix column.
+        rated (scipy.sparse.csr_matrix): Users x books pattern of the ratings to mask
+            at serving time, including implicit 0 ratings.
+
+    Returns:
+        dict: 'user_factors', 'item_factors', 'user_biases', 'item_biases', 'global_mean',
+        'rating_bounds', the raw -> inner id maps 'user_inner_ids' and 'item_inner_ids'
+        (-1 when unknown) and the 'rated' matrix.
+    """
+    user_inner_ids = np.array([trainset._raw2inner_id_users.get(user_id, -1) for user_id in user_ids.tolist()],
+                              dtype=np.int32)
+    item_inner_ids = np.array([trainset._raw2inner_id_items.get(title, -1) for title in book_titles.tolist()],
+                              dtype=np.int32)
+
+    def aligned(values, inner_ids):
+        # Rows of the trained arrays in matrix order, zeros for unknown ids
+        values = np.asarray(values, dtype=np.float32)
+        result = np.zeros((len(inner_ids),) + values.shape[1:], dtype=np.float32)
+        known = inner_ids >= 0
+        result[known] = values[inner_ids[known]]
+        return result
+
+    return {
+        'user_factors': aligned(model.pu, user_inner_ids),
+        'item_factors': aligned(model.qi, item_inner_ids),
+        'user_biases': aligned(model.bu, user_inner_ids),
+        'item_biases': aligned(model.bi, item_inner_ids),
+        'global_mean': np.float32(trainset.global_mean),
+        'rating_bounds': np.array(trainset.rating_scale, dtype=np.float32),
+        'user_inner_ids': user_inner_ids,
+        'item_inner_ids': item_inner_ids,
+        'rated': csr_matrix(rated, dtype=np.bool_),
+    }
+
+
+def svd_scores(factors, user_indices):
+    """
+    Estimates the ratings of every book for a block of users with one matrix product.
+
+    Args:
+        factors (dict): Factors exported by export_svd_factors.
+        user_indices (np.ndarray): Row indices of the users being scored.
+
+    Returns:
+        np.ndarray: (n_users, n_books) float32 estimates clipped to the rating scale.
+    """
+    user_indices = np.asarray(user_indices, dtype=np.int64)
+    scores = factors['user_factors'][user_indices] @ factors['item_factors'].T
+    scores += factors['item_biases'][None, :]
+    scores += (factors['user_biases'][user_indices] + factors['global_mean'])[:, None]
+
+    low, high = factors['rating_bounds']
+    return np.clip(scores, low, high, out=scores)
+
+
+def unrated_svd_scores(factors, user_indices):
+    """
+    svd_scores with the books each user already rated set to -inf.
+    """
+    user_indices = np.asarray(user_indices, dtype=np.int64)
+    scores = svd_scores(factors, user_indices)
+
+    rated_rows, rated_cols = factors['rated'][user_indices].nonzero()
+    scores[rated_rows, rated_cols] = -np.inf
+
+    return scores
+
+
+def svd_recommend_block(factors, user_indices, top_n):
+    """
+    Picks the top N books of a block of users by estimated rating, skipping the books
+    each user already rated.
+
+    Args:
+        factors (dict): Factors exported by export_svd_factors.
+        user_indices (np.ndarray): Row indices of the users being scored.
+        top_n (int): Number of books to return per user.
+
+    Returns:
+        list: One (book indices, estimated ratings) tuple per user, ordered by
+        descending estimate.
+    """
+    scores = unrated_svd_scores(factors, user_indices)
+
+    books = top_k_rows(scores, top_n)
+
+    result = []
+    for row, row_books in enumerate(books):
+        row_books = row_books[row_books >= 0]
+        result.append((row_books, scores[row, row_books]))
+
+    return result
+
+
+def hybrid_recommend_block(factors, item_neighbours, user_indices, top_n):
+    """
+    SVD picks expanded with their nearest books: the best SVD book, then its most
+    similar book the user has not rated, then the next SVD book, and so on until top N
+    distinct books are chosen.
+
+    Args:
+        factors (dict): Factors exported by export_svd_factors.
+        item_neighbours (np.ndarray): (n_books, k) most similar books of every book, nearest
+            first, -1 for none.
+        user_indices (np.ndarray): Row indices of the users being scored.
+        top_n (int): Number of books to return per user.
+
+    Returns:
+        list: One (book indices, estimated ratings) tuple per user.
+    """
+    scores = unrated_svd_scores(factors, user_indices)
+
+    svd_books = top_k_rows(scores, top_n)
+
+    result = []
+    for row, row_books in enumerate(svd_books):
+        chosen = []
+        for book in row_books[row_books >= 0]:
+            if len(chosen) >= top_n:
+                break
+            if book not in chosen:
+                chosen.append(book)
+
+            # Nearest unrated neighbour of the SVD pick
+            for neighbour in item_neighbours[book]:
+                if neighbour >= 0 and scores[row, neighbour] > -np.inf and neighbour not in chosen:
+                    if len(chosen) < top_n:
+                        chosen.append(neighbour)
+                    break
+
+        chosen = np.asarray(chosen, dtype=np.int64)
+        result.append((chosen, scores[row, chosen]))
+
+    return result
@@ -6,13 +6,31 @@ import pickle
 
 from src.logger import logging
 from src.exception import CustomException
-from src.utils import save_object
+from src.utils import (save_object, save_arrays, load_object, read_manifest, create_array, artifact_exists,
+                       artifacts_fingerprint)
+from src.components.neighbours import make_index, recall_at_k
+from src.components.datacleaning import read_cleaned_data
+from src.components.ratings import (encode_ratings, filter_ratings, table_book_catalog,
+                                    table_user_item_bundle, table_book_pivot, table_rated_matrix, append_ratings)
+from src.components.factors import export_svd_factors
+from src.components.incremental import (id_positions, changed_rows, update_neighbours, update_similarity,
+                                        warm_start_factors, update_recommendation_table)
+from src.components.matrix import sparse_from_codes
+from src.components.similarity import top_k_cosine, blocked_cosine_similarity
+from src.components.stagecache import Stage
+from src.components.svdtuning import (fold_assignment, train_svd, rated_pattern, evaluate_factors, tune_svd,
+                                      ranking_metrics)
+from src.components import als
+from src.components.als import confidence_matrix, train_als, resolve_backend, als_scores, warm_start_item_factors
+from src.components.scoring import (recommend_block, score_neighbours, rank_books, top_k_rows,
+                                    precompute_recommendations, _score_block, PRECOMPUTED_METHODS, PRECOMPUTED_SOURCES)
+from src.components.factors import svd_recommend_block, unrated_svd_scores
+from src.components.coldstart import build_cold_start, age_bands, clean_countries
+from src.components import sparkbuilder
+from functools import partial
 from dataclasses import dataclass
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.neighbors import NearestNeighbors
 from scipy.sparse import csr_matrix
-from surprise import Dataset, Reader, SVD
-from surprise.model_selection import train_test_split
 
 
 @dataclass  # Decorator
@@ -21,125 +39,261 @@ class HelperConfig:
     HelperConfig is a special class using @dataclass, which automatically creates methods like __init__ and __repr__.
     It stores the paths for important dataset files:
     
-    1. `final_filtered_data_path`: Path to the final filtered dataset.
-    2. `users_books_pivot_table_path`: Path to the pivot table of users and books.
+    1. `final_filtered_data_path`: Path to the final filtered ratings table (integer-coded arrays).
+    2. `users_item_matrix_path`: Path to the sparse user x book rating matrix and its id mappings.
     3. `similarity_scores_path`: Path to the precomputed similarity scores.
+    4. `book_catalog_path`: Path to the deduplicated title -> author, image URL and ISBN catalog.
+    5. `user_neighbours_path`: Path to the top-k most similar users of every user.
+    6. `svd_factors_path`: Path to the SVD factors and biases, aligned with the user-item matrix.
+    7. `item_neighbours_path`: Path to the top-k most similar books of every book.
+    8. `ratings_table_path`: Path to every cleaned rating as integer codes, before filtering.
+    9. `user_recommendations_path`: Path to the precomputed top N books of every user.
+    10. `cold_start_path`: Path to the segment rankings and arrays served to users outside the matrix.
+    11. `als_factors_path`: Path to the implicit-feedback ALS factors, aligned with the user-item matrix.
+
+    The cleaned dataset is read from `cleaned_parquet_path`, or from the legacy `cleaned_data_path`
+    CSV, and only `data_columns` are loaded.
     """
     
-    final_filtered_data_path = os.path.join('artifacts', 'final_filtered_data.pkl')
-    users_item_matrix_path = os.path.join('artifacts', 'users_books_pt.pkl')
-    similarity_scores_path = os.path.join('artifacts', 'similarity_scores.pkl')
+    cleaned_parquet_path = os.path.join('artifacts', 'cleaned_data.parquet')
+    cleaned_data_path = os.path.join('artifacts', 'cleaned_data.csv')
+    data_columns = ['User-ID', 'ISBN', 'Book-Rating', 'Book-Title', 'Book-Author', 'Image-URL-M']
+    ratings_table_path = os.path.join('artifacts', 'ratings_table')
+    final_filtered_data_path = os.path.join('artifacts', 'final_filtered_data')
+    users_item_matrix_path = os.path.join('artifacts', 'user_item_matrix')
+    similarity_scores_path = os.path.join('artifacts', 'similarity_scores')
     knn_model_path = os.path.join('artifacts', 'knn_model.pkl')
     svd_model_path = os.path.join('artifacts', 'svd_model.pkl')
-    book_pivot_path = os.path.join('artifacts', 'book_pivot.pkl')
+    svd_factors_path = os.path.join('artifacts', 'svd_factors')
+    book_pivot_path = os.path.join('artifacts', 'book_pivot')
+    book_catalog_path = os.path.join('artifacts', 'book_catalog')
+    user_neighbours_path = os.path.join('artifacts', 'user_neighbours')
+    item_neighbours_path = os.path.join('artifacts', 'item_neighbours')
+    user_recommendations_path = os.path.join('artifacts', 'user_recommendations')
+    cold_start_path = os.path.join('artifacts', 'cold_start')
+    user_columns = ['User-ID', 'Country', 'Age']
+    als_factors_path = os.path.join('artifacts', 'als_factors')
+    svd_params = {'n_factors': 100, 'n_epochs': 10, 'lr_all': 0.005, 'reg_all': 0.2}
+    als_params = {'n_factors': 64, 'regularization': 50.0, 'alpha': 2.0, 'n_iterations': 15, 'implicit_rating': 5}
     
 # Create a helper class
 class Helper:
     
-    def __init__(self):
+    def __init__(self, load_data=True):
         """
         Initializes the Helper class by setting up configurations and loading the cleaned dataset.
+
+        Parameters:
+        load_data (bool): Load the cleaned dataset, not needed to update existing artifacts.
         """
         logging.info("Helper Configuration Starts")
         self.helper_config = HelperConfig()
         logging.info("Helper Configuration completed")
 
-        logging.info("Loading the cleaned data")
         try:
-            self.data = pd.read_csv('artifacts/cleaned_data.csv', encoding='ISO-8859-1')
-            logging.info("Cleaned data loaded successfully")
+            self.data = None
+            if load_data:
+                logging.info("Loading the cleaned data")
+                self.data = self.read_ratings(self.cleaned_data_path())
+                logging.info("Cleaned data loaded successfully")
+
+            # Integer-coded ratings table, encoded on first use by filter_data
+            self.ratings_table = None
         except Exception as e:
             logging.error("Error occurred while loading the cleaned data")
             raise CustomException(e, sys)
 
-    def filter_data(self):
+    def __getstate__(self):
+        """
+        The loaded data is not sent along when the helper is pickled to worker processes
+        running pipeline stages, stages read what they need from the artifacts.
+        """
+        state = self.__dict__.copy()
+        state.update(data=None, ratings_table=None)
+        return state
+
+    def read_ratings(self, file_path):
+        """
+        Reads the `data_columns` of a cleaned ratings file, parquet or CSV.
+        """
+        if file_path.endswith('.parquet'):
+            # Typed columnar file, only the needed columns are read
+            return read_cleaned_data(file_path, columns=self.helper_config.data_columns)
+
+        return pd.read_csv(file_path, encoding='ISO-8859-1', usecols=self.helper_config.data_columns)
+
+    def read_users(self, file_path):
+        """
+        Reads the `user_columns` of a cleaned ratings file, one row per user.
+        """
+        if file_path.endswith('.parquet'):
+            users = read_cleaned_data(file_path, columns=self.helper_config.user_columns)
+        else:
+            users = pd.read_csv(file_path, encoding='ISO-8859-1', usecols=self.helper_config.user_columns)
+
+        return users.drop_duplicates('User-ID', keep='last')
+
+    def cleaned_data_path(self):
+        """
+        Path of the cleaned dataset: the parquet file, or the legacy CSV when there is none.
+        """
+        if os.path.exists(self.helper_config.cleaned_parquet_path):
+            return self.helper_config.cleaned_parquet_path
+        return self.helper_config.cleaned_data_path
+
+    def filter_file(self, file_path, min_user_ratings=200, min_book_ratings=50):
+        """
+        Reads a cleaned ratings file and filters it (see filter_data), for the pipeline
+        stages that start from the file rather than from the data loaded at init.
+        """
+        logging.info(f"Reading the cleaned data from {file_path}")
+        self.data = self.read_ratings(file_path)
+        self.ratings_table = None
+
+        return self.filter_data(min_user_ratings=min_user_ratings, min_book_ratings=min_book_ratings)
+
+    def filter_data(self, min_user_ratings=200, min_book_ratings=50):
         """
         Filters the dataset by:
-        1. Selecting users who have rated at least 200 books.
-        2. Selecting books that have received at least 50 ratings.
-        
-        The filtered dataset is then saved as a pickle file.
+        1. Selecting users who have rated at least `min_user_ratings` books.
+        2. Selecting books that have received at least `min_book_ratings` ratings.
+
+        The cleaned data is encoded once as integer-coded arrays (see encode_ratings), so
+        filtering again with other thresholds only counts codes. The filtered ratings
+        table is then saved as an array store.
+
+        Returns:
+        dict: The filtered ratings table.
         """
         logging.info("Filtering the data")
         
         try:
-            # Users with 200+ ratings
-            logging.info("Extracting users with 200+ ratings")
-            users_with_200_ratings_data = self.data.loc[
-                self.data.groupby('User-ID')['Book-Rating'].transform('count') >= 200
-            ]
-
-            logging.info("Extracting books with 50+ ratings from the filtered user data")
-            # Books with 50+ ratings in this user dataset
-            final_filtered_data = users_with_200_ratings_data.loc[
-                users_with_200_ratings_data.groupby('Book-Title')['Book-Rating'].transform('count') >= 50
-            ]
-
-            logging.info(f"Final filtered data shape: {final_filtered_data.shape}")
+            if self.ratings_table is None:
+                logging.info("Encoding the ratings as integer codes")
+                self.ratings_table = encode_ratings(self.data)
+
+                # The full table is the starting point of incremental updates
+                logging.info("Saving the encoded ratings as an array store")
+                save_arrays(self.helper_config.ratings_table_path, self.ratings_table)
+
+            logging.info(f"Extracting users with {min_user_ratings}+ ratings and books with {min_book_ratings}+ ratings")
+            final_filtered_data = filter_ratings(self.ratings_table, min_user_ratings=min_user_ratings,
+                                                 min_book_ratings=min_book_ratings)
+
+            logging.info(f"Final filtered data: {len(final_filtered_data['ratings'])} ratings, "
+                         f"{len(final_filtered_data['user_ids'])} users, {len(final_filtered_data['book_titles'])} books")
             
-            # Saving filtered data as a pickle file
-            logging.info("Saving the filtered data as a pickle file")
-            save_object(file_path=self.helper_config.final_filtered_data_path, object=final_filtered_data)
+            # Saving filtered data as an array store
+            logging.info("Saving the filtered data as an array store")
+            save_arrays(self.helper_config.final_filtered_data_path, final_filtered_data,
+                        metadata={'min_user_ratings': min_user_ratings, 'min_book_ratings': min_book_ratings})
             logging.info("Filtered data saved successfully")
 
+            return final_filtered_data
+
         except Exception as e:
             logging.error("Error occurred while filtering the data")
             raise CustomException(e, sys)
 
-    def pivot_table_data(self, filtered_data):
+    def book_catalog(self, filtered_data):
         """
-        Creates a pivot table with:
-        - Index: 'Book-Title'
-        - Columns: 'User-ID'
-        - Values: 'Book-Rating'
-        
-        Missing values are filled with 0. The result is then saved as a pickle file.
+        Builds the deduplicated book catalog used to render recommendations, so the
+        serving process never has to scan the ratings table.
+
+        The catalog is then saved as a memory-mapped array store.
         """
-        logging.info("Creating a pivot table")
+        logging.info("Building the book catalog")
 
         try:
-            # Creating pivot table
-            user_item_matrix = filtered_data.pivot_table(index='Book-Title', columns='User-ID', values='Book-Rating')
+            book_catalog = table_book_catalog(filtered_data)
+
+            logging.info(f"Book catalog size: {len(book_catalog['titles'])}")
+
+            # Saving the book catalog
+            logging.info("Saving the book catalog as an array store")
+            save_arrays(self.helper_config.book_catalog_path, book_catalog)
+            logging.info("Book catalog saved successfully")
+
+            return book_catalog
+
+        except Exception as e:
+            logging.error("Error occurred while building the book catalog")
+            raise CustomException(e, sys)
+
+    def pivot_table_data(self, filtered_data):
+        """
+        Creates a sparse user x book rating matrix with:
+        - Rows: 'User-ID'
+        - Columns: 'Book-Title'
+        - Values: 'Book-Rating' (averaged over repeated ratings, like pivot_table)
+
+        The matrix is built directly from the integer codes of the filtered ratings table, so missing ratings are never
+        materialized. It is saved as an array store together with the row -> User-ID and
+        column -> Book-Title mappings.
+        """
+        logging.info("Creating a sparse user-item matrix")
 
-            logging.info(f"Pivot table shape before filling NaNs: {user_item_matrix.shape}")
+        try:
+            # Creating the sparse matrix from the integer codes
+            user_item_matrix = table_user_item_bundle(filtered_data)
 
-            # Filling missing values with 0
-            logging.info("Filling missing values with 0")
-            user_item_matrix.fillna(value=0, inplace=True)
+            matrix = user_item_matrix['matrix']
+            logging.info(f"User-item matrix shape: {matrix.shape}, stored ratings: {matrix.nnz}")
 
-            logging.info(f"Pivot table shape after filling NaNs: {user_item_matrix.shape}")
+            # Saving the user-item matrix
+            logging.info("Saving the user-item matrix as an array store")
+            save_arrays(self.helper_config.users_item_matrix_path, user_item_matrix)
+            logging.info("User-item matrix saved successfully")
 
-            # Saving the pivot table
-            logging.info("Saving the pivot table data as a pickle file")
-            save_object(file_path=self.helper_config.users_item_matrix_path, object=user_item_matrix)
-            logging.info("Pivot table saved successfully")
+            return user_item_matrix
 
         except Exception as e:
-            logging.error("Error occurred while creating the pivot table")
+            logging.error("Error occurred while creating the user-item matrix")
             raise CustomException(e, sys)
 
-    def similarity_score(self, pivot_table):
+    def similarity_score(self, pivot_table, dtype='float64', top_k=None, block_size=1024, n_jobs=-1):
         """
-        Computes cosine similarity between book rows in the pivot table.
+        Computes cosine similarity between the books of the user-item matrix.
+
+        The book vectors are L2-normalized once and the similarities are computed in tiles
+        of block_size books across a thread pool, each tile written straight into the
+        memory-mapped file of the array store (see blocked_cosine_similarity), so peak
+        memory is governed by the tile size rather than by books^2. With top_k only the
+        top-k most similar books of every book are kept instead of the square matrix.
         
         Parameters:
-        pivot_table (pd.DataFrame): The user-book interaction matrix.
+        pivot_table (dict): The sparse user-book matrix built by pivot_table_data.
+        dtype (str): Type of the stored similarities, 'float64', 'float32' or 'float16'.
+        top_k (int, optional): Keep only the top-k similarities of every book.
+        block_size (int): Number of books per tile.
+        n_jobs (int): Number of threads, -1 for every core.
         
         Returns:
-        np.ndarray: A square matrix containing cosine similarity scores.
+        np.ndarray: A square matrix containing cosine similarity scores (memory-mapped),
+        or a dict of 'indices' and 'scores' arrays of shape (n_books, top_k) with top_k.
         """
         logging.info("Calculating similarity scores")
 
         try:
-            # Computing cosine similarity
-            similarity_score = cosine_similarity(pivot_table)
+            book_matrix = pivot_table['matrix'].T.tocsr()
+            n_books = book_matrix.shape[0]
+            path = self.helper_config.similarity_scores_path
+            metadata = {'dtype': dtype, 'top_k': top_k}
 
-            logging.info(f"Similarity matrix shape: {similarity_score.shape}")
+            if top_k:
+                # Top-k similar books of every book, the book itself excluded
+                logging.info(f"Keeping the top {top_k} similarities of every book")
+                indices, scores = top_k_cosine(book_matrix, k=top_k, block_size=block_size, n_jobs=n_jobs)
+                similarity_score = {'indices': indices, 'scores': scores.astype(dtype)}
+                save_arrays(path, similarity_score, metadata=metadata)
+            else:
+                # Computing cosine similarity between the book columns, tile by tile into the store
+                logging.info(f"Writing the {n_books} x {n_books} {dtype} similarity matrix in tiles of {block_size} books")
+                similarity_score = blocked_cosine_similarity(book_matrix, out=create_array(path, 'similarity', (n_books, n_books), dtype),
+                                                             block_size=block_size, n_jobs=n_jobs)
+                save_arrays(path, {'similarity': similarity_score}, metadata=metadata)
 
-            # Saving similarity scores as a pickle file
-            logging.info("Saving the similarity scores as a pickle file")
-            save_object(file_path=self.helper_config.similarity_scores_path, object=similarity_score)
-            logging.info("Similarity scores saved successfully")
+            logging.info(f"Similarity scores saved successfully ({n_books} books)")
 
             return similarity_score
 
@@ -147,23 +301,114 @@ class Helper:
             logging.error("Error occurred while calculating similarity score")
             raise CustomException(e, sys)
 
+    def user_neighbours(self, pivot_table, n_neighbors=20, block_size=1024, backend='exact', index_params=None):
+        """
+        Computes the top-k most similar users of every user by cosine similarity.
+
+        Similarities are computed in blocks of rows and only the best k of each row are
+        kept, so the full users x users matrix is never materialized.
+
+        Parameters:
+        pivot_table (dict): The sparse user-book matrix built by pivot_table_data.
+        n_neighbors (int): Number of neighbours kept per user.
+        block_size (int): Number of users whose similarities are computed together.
+        backend (str): Neighbour index, 'exact' or 'ivf' (approximate, see neighbours.py).
+        index_params (dict, optional): Tuning parameters of the backend, e.g. n_probe.
+
+        Returns:
+        dict: 'indices' and 'scores' arrays of shape (n_users, n_neighbors).
+        """
+        logging.info(f"Calculating the top {n_neighbors} neighbours of every user with the {backend} index")
+
+        try:
+            user_neighbours, report = self._neighbour_table(pivot_table['matrix'], n_neighbors, backend,
+                                                            dict(block_size=block_size, **(index_params or {})))
+
+            logging.info(f"User neighbours shape: {user_neighbours['indices'].shape}")
+
+            # Saving the neighbour table as an array store
+            logging.info("Saving the user neighbours as an array store")
+            save_arrays(self.helper_config.user_neighbours_path, user_neighbours, metadata=report)
+            logging.info("User neighbours saved successfully")
+
+            return user_neighbours
+
+        except Exception as e:
+            logging.error("Error occurred while calculating the user neighbours")
+            raise CustomException(e, sys)
+
+    def item_neighbours(self, pivot_table, n_neighbors=20, block_size=1024, n_jobs=-1, backend='exact', index_params=None):
+        """
+        Computes the top-k most similar books of every book by cosine similarity over
+        their user ratings, the same neighbours the knn model returns.
+
+        Books are the columns of the user-item matrix, so the table lines up with the
+        catalog and the SVD factors. Blocks of books are scored in parallel threads and
+        the books x books matrix is never materialized.
+
+        Parameters:
+        pivot_table (dict): The sparse user-book matrix built by pivot_table_data.
+        n_neighbors (int): Number of neighbours kept per book.
+        block_size (int): Number of books whose similarities are computed together.
+        n_jobs (int): Number of threads, -1 for every core.
+        backend (str): Neighbour index, 'exact' or 'ivf' (approximate, see neighbours.py).
+        index_params (dict, optional): Tuning parameters of the backend, e.g. n_probe.
+
+        Returns:
+        dict: 'indices' and 'scores' arrays of shape (n_books, n_neighbors).
+        """
+        logging.info(f"Calculating the top {n_neighbors} neighbours of every book with the {backend} index")
+
+        try:
+            item_neighbours, report = self._neighbour_table(pivot_table['matrix'].T.tocsr(), n_neighbors, backend,
+                                                            dict(block_size=block_size, n_jobs=n_jobs, **(index_params or {})))
+
+            logging.info(f"Item neighbours shape: {item_neighbours['indices'].shape}")
+
+            # Saving the neighbour table as an array store
+            logging.info("Saving the item neighbours as an array store")
+            save_arrays(self.helper_config.item_neighbours_path, item_neighbours, metadata=report)
+            logging.info("Item neighbours saved successfully")
+
+            return item_neighbours
+
+        except Exception as e:
+            logging.error("Error occurred while calculating the item neighbours")
+            raise CustomException(e, sys)
+
+    def _neighbour_table(self, matrix, n_neighbors, backend, index_params):
+        """
+        Builds a neighbour index over the rows of a matrix and returns the top-k table of
+        every row, with the backend settings and, for approximate backends, the recall@k
+        measured against the exact index on a sample of rows.
+        """
+        index = make_index(backend, **index_params).fit(matrix)
+        indices, scores = index.query_all(n_neighbors)
+
+        report = {'backend': backend, 'index_params': index_params}
+        if backend != 'exact':
+            report.update(recall_at_k(index, n_neighbors))
+            logging.info(f"{backend} index recall@{n_neighbors}: {report['recall']:.3f}")
+
+        return {'indices': indices, 'scores': scores}, report
+
     def knn_model(self,final_filtered_data):
         logging.info("Training and saving the knn model")
         
         try:
-            logging.info("Creating a book_pivot")
-            book_pivot = final_filtered_data.pivot_table(index='ISBN', columns='User-ID', values='Book-Rating').fillna(0)
+            logging.info("Creating a sparse book_pivot")
+            book_pivot = table_book_pivot(final_filtered_data)
             
-            #Saving the book_pivot a pickel file
+            #Saving the book_pivot as an array store
             logging.info("Saving the book pivot file")
-            save_object(file_path= self.helper_config.book_pivot_path, object= book_pivot)
-            logging.info("Saved the book_pivot as pickle file")
+            save_arrays(self.helper_config.book_pivot_path, book_pivot)
+            logging.info("Saved the book_pivot as an array store")
             
             logging.info("Initializing the knn model")
             knn_model = NearestNeighbors(metric="cosine", algorithm="brute", n_neighbors=5, n_jobs=-1)
             
             logging.info("Training the knn model")
-            knn_model.fit(book_pivot.values)
+            knn_model.fit(book_pivot['matrix'])
             
             #Saving the knn model as pickle file
             logging.info("Saving the knn model")
@@ -174,36 +419,492 @@ class Helper:
             logging.info("Error occured while training and saving the knn model")
             raise CustomException(e,sys)
         
-    def svd_model(self,final_filtered_data):
+    def svd_model(self,final_filtered_data,params=None,seed=42,k=10):
+        """
+        Trains the svd model on 80% of the filtered ratings, evaluates it on the other 20%
+        and exports its factors. The split and the training are seeded, so the same data
+        and parameters give the same model.
+
+        Parameters:
+        final_filtered_data (dict): The filtered ratings table.
+        params (dict, optional): SVD hyperparameters, `svd_params` of the config by default.
+        seed (int): Seed of the split and of the training.
+        k (int): Cut-off of the ranking metrics (see evaluate_factors).
+
+        Returns:
+        surprise.SVD: The trained model, its test metrics are stored with the factors.
+        """
         logging.info("Training and saving the svd model")
         
         try:
-            #Convert data to Surprise format
-            logging.info("Converting the data into the format what svd accepts")
-            reader = Reader(rating_scale=(0, 10))
-            data = Dataset.load_from_df(final_filtered_data[["User-ID", "Book-Title", "Book-Rating"]], reader)
-            
-            # Train-test split
+            # Train-test split, one fold out of five is held out
             logging.info("Train test split of the data")
-            trainset, testset = train_test_split(data, test_size=0.2)
+            folds = fold_assignment(len(final_filtered_data['ratings']), n_folds=5, seed=seed)
+            train_rows, test_rows = np.flatnonzero(folds != 0), np.flatnonzero(folds == 0)
             
             #Best parameters
             logging.info("Definging the best parameters")
-            best_params = {'n_factors': 100, 
-               'n_epochs': 10, 
-               'lr_all': 0.005, 
-               'reg_all': 0.2}
+            best_params = dict(params or self.helper_config.svd_params)
             
             #Training the model
             logging.info("Trainig the best svd model")
-            best_model = SVD(**best_params)
-            best_model.fit(trainset)
+            best_model, trainset = train_svd(final_filtered_data, train_rows, best_params, seed=seed)
             
-            #Saving the knn model as pickle file
+            #Saving the svd model as pickle file
             logging.info("Saving the svd model")
             save_object(file_path= self.helper_config.svd_model_path,object= best_model)
             logging.info("svd model saved successfully")
+
+            #Evaluating the model on the held out ratings
+            user_ids, book_titles = np.asarray(final_filtered_data['user_ids']), np.asarray(final_filtered_data['book_titles'])
+            test_factors = export_svd_factors(best_model, trainset, user_ids, book_titles,
+                                              rated_pattern(final_filtered_data, train_rows))
+            metrics = evaluate_factors(test_factors, final_filtered_data, test_rows, k=k)
+            logging.info(f"svd test metrics: {metrics}")
+
+            #Exporting the factors for batched serving
+            logging.info("Exporting the svd factors aligned with the user-item matrix")
+            svd_factors = dict(test_factors, rated=table_rated_matrix(final_filtered_data))
+            save_arrays(self.helper_config.svd_factors_path, svd_factors, metadata=dict(best_params, seed=seed, **metrics))
+            logging.info("svd factors saved successfully")
+
+            return best_model
             
         except Exception as e:
             logging.info("Error occured while training and saving the svd model")
-            raise CustomException(e,sys)
\ No newline at end of file
+            raise CustomException(e,sys)
+
+    def als_model(self, final_filtered_data, params=None, seed=42, k=10, n_threads=-1, backend='auto'):
+        """
+        Trains the implicit-feedback ALS model on 80% of the filtered interactions, the
+        implicit 0 ratings the user-item matrix drops included (see confidence_matrix),
+        evaluates its ranking on the other 20% and exports its factors. The folds are
+        those of svd_model, so the ranking metrics of both models compare.
+
+        Parameters:
+        final_filtered_data (dict): The filtered ratings table.
+        params (dict, optional): ALS hyperparameters, `als_params` of the config by default.
+        seed (int): Seed of the split and of the initial factors.
+        k (int): Cut-off of the ranking metrics (see ranking_metrics).
+        n_threads (int): Number of training threads, -1 for every core.
+        backend (str): 'numpy', 'implicit' or 'auto' (implicit when it is installed).
+
+        Returns:
+        dict: The exported factors, their test metrics are stored with them.
+        """
+        logging.info("Training and saving the als model")
+
+        try:
+            # Train-test split, the same fold as the svd model is held out
+            folds = fold_assignment(len(final_filtered_data['ratings']), n_folds=5, seed=seed)
+            train_rows, test_rows = np.flatnonzero(folds != 0), np.flatnonzero(folds == 0)
+            params = dict(params or self.helper_config.als_params)
+            backend = resolve_backend(backend)
+
+            #Training the model on the confidence weights of the training interactions
+            logging.info(f"Training the als model with the {backend} backend")
+            weights = confidence_matrix(final_filtered_data, train_rows, alpha=params['alpha'],
+                                        implicit_rating=params['implicit_rating'])
+            user_factors, item_factors = train_als(weights, n_factors=params['n_factors'],
+                                                   regularization=params['regularization'],
+                                                   n_iterations=params['n_iterations'], seed=seed,
+                                                   n_threads=n_threads, backend=backend)
+            factors = {'user_factors': user_factors, 'item_factors': item_factors}
+
+            #Evaluating the model on the held out ratings
+            metrics = ranking_metrics(partial(als_scores, factors), rated_pattern(final_filtered_data, train_rows),
+                                      final_filtered_data, test_rows, k=k)
+            logging.info(f"als test metrics: {metrics}")
+
+            #Exporting the factors for batched serving
+            als_factors = dict(factors, rated=table_rated_matrix(final_filtered_data))
+            save_arrays(self.helper_config.als_factors_path, als_factors,
+                        metadata=dict(params, seed=seed, backend=backend, **metrics))
+            logging.info("als factors saved successfully")
+
+            return als_factors
+
+        except Exception as e:
+            logging.info("Error occured while training and saving the als model")
+            raise CustomException(e,sys)
+
+    def tune_svd(self, param_grid=None, n_folds=3, eta=3, n_rungs=3, n_workers=-1, seed=42, k=10, use_cache=True):
+        """
+        Searches the svd hyperparameters on the saved filtered ratings with seeded k-fold
+        cross-validation and successive halving, trials running in a process pool (see
+        svdtuning.py). The metrics of every trial are written to the results file and the
+        best parameters to `best_params_path` of SVDTuningConfig.
+
+        Returns:
+        dict: The best parameters and their mean metrics over the folds.
+        """
+        logging.info("Tuning the svd model")
+
+        results, best = tune_svd(self.helper_config.final_filtered_data_path, param_grid=param_grid, n_folds=n_folds,
+                                 eta=eta, n_rungs=n_rungs, n_workers=n_workers, seed=seed, k=k, use_cache=use_cache)
+        logging.info(f"Tuned the svd model over {len(results)} trials")
+
+        return best
+
+    def recommendation_table(self, pivot_table, top_n=20, n_neighbors=5, block_size=256, n_jobs=-1, **upstream):
+        """
+        Precomputes the top N books of every user with the cosine method, and with the svd
+        and als methods when their factors exist, for the serving mode of BookRecommendationSystem.
+        Blocks of users are scored in worker processes that memory-map the saved
+        user-item matrix, neighbours and factors.
+
+        Parameters:
+        pivot_table (dict): The sparse user-book matrix built by pivot_table_data.
+        top_n (int): Number of books kept per user, the recommender answers any top_n up to it.
+        n_neighbors (int): Number of similar users aggregated by the cosine method.
+        block_size (int): Number of users scored together.
+        n_jobs (int): Number of worker processes, -1 for every core.
+        **upstream: Results of the neighbour, svd and als stages, which must be saved first.
+
+        Returns:
+        dict: '<method>_books' and '<method>_scores' (n_users, top_n) arrays per method,
+        the 'user_ids' of the rows and their 'stale' mask.
+        """
+        logging.info(f"Precomputing the top {top_n} recommendations of every user")
+
+        try:
+            config = self.helper_config
+            n_jobs = (os.cpu_count() or 1) if n_jobs == -1 else n_jobs
+            factor_paths = {'svd': config.svd_factors_path, 'als': config.als_factors_path}
+            methods = [method for method in PRECOMPUTED_METHODS
+                       if method not in factor_paths or artifact_exists(factor_paths[method])]
+            worker_artifacts = (config.users_item_matrix_path, config.user_neighbours_path,
+                                config.svd_factors_path if 'svd' in methods else None, None,
+                                config.als_factors_path if 'als' in methods else None)
+
+            table = precompute_recommendations(worker_artifacts, len(pivot_table['user_ids']), top_n=top_n,
+                                               n_neighbors=n_neighbors, methods=methods, block_size=block_size,
+                                               n_jobs=n_jobs)
+            table['user_ids'] = np.asarray(pivot_table['user_ids'])
+            table['stale'] = np.zeros(len(table['user_ids']), dtype=bool)
+
+            # Fingerprints of the artifacts every method was scored from, checked when serving
+            sources = {method: artifacts_fingerprint(PRECOMPUTED_SOURCES[method]) for method in methods}
+
+            #Saving the table as an array store, memory-mapped when serving
+            logging.info(f"Saving the precomputed recommendations for methods {methods}")
+            save_arrays(config.user_recommendations_path, table,
+                        metadata={'top_n': top_n, 'n_neighbors': n_neighbors, 'methods': methods, 'sources': sources})
+            logging.info("Precomputed recommendations saved successfully")
+
+            return table
+
+        except Exception as e:
+            logging.info("Error occured while precomputing the recommendations")
+            raise CustomException(e,sys)
+
+    def cold_start_model(self, pivot_table, file_path=None, top_n=50, prior_weight=10, max_countries=50, users=None,
+                         **upstream):
+        """
+        Builds the cold-start arrays served to the users outside the filtered matrix (see
+        build_cold_start): the books of the matrix ranked by Bayesian average per country
+        and age band, from the ratings of every cleaned user, and the arrays of the
+        neighbour search for users with a few ratings.
+
+        Parameters:
+        pivot_table (dict): The sparse user-book matrix built by pivot_table_data.
+        file_path (str, optional): Cleaned ratings file the countries and ages are read from.
+        top_n (int): Number of books ranked per segment.
+        prior_weight (float): Weight of the Bayesian prior, in ratings.
+        max_countries (int): Number of countries with their own segments.
+        users (pandas DataFrame, optional): User-ID, Country and Age, instead of file_path.
+        **upstream: Result of the filter stage, which saves the encoded ratings first.
+
+        Returns:
+        dict: The cold-start arrays.
+        """
+        logging.info("Building the cold-start rankings")
+
+        try:
+            config = self.helper_config
+            if users is None:
+                users = self.read_users(file_path or self.cleaned_data_path())
+            ratings_table = load_object(config.ratings_table_path)
+
+            cold_start = build_cold_start(ratings_table, pivot_table, users, top_n=top_n, prior_weight=prior_weight,
+                                          max_countries=max_countries)
+            logging.info(f"Cold-start rankings for {len(cold_start['countries'])} countries, "
+                         f"{len(cold_start['user_ids'])} users")
+
+            #Saving the cold-start arrays as an array store
+            save_arrays(config.cold_start_path, cold_start,
+                        metadata={'top_n': top_n, 'prior_weight': prior_weight, 'max_countries': max_countries})
+            logging.info("Cold-start arrays saved successfully")
+
+            return cold_start
+
+        except Exception as e:
+            logging.info("Error occured while building the cold-start rankings")
+            raise CustomException(e,sys)
+
+    def _update_recommendation_table(self, bundle, old_user_neighbours, user_map, item_map, changed_users):
+        """
+        Carries the precomputed recommendations over to updated artifacts. A cosine list
+        still holds when the user's ratings, its nearest neighbours and their ratings are
+        unchanged; the other users are marked stale. The svd and als lists are dropped,
+        every factor was retrained.
+
+        Returns:
+        int: Number of stale users.
+        """
+        config = self.helper_config
+        metadata = read_manifest(config.user_recommendations_path)['metadata']
+        methods = [method for method in metadata['methods'] if method == 'cosine']
+        n_neighbors = metadata['n_neighbors']
+
+        # Nearest neighbours before and after the update, in the new user positions
+        new_lists = np.asarray(load_object(config.user_neighbours_path)['indices'])[:, :n_neighbors].astype(np.int64)
+        old_lists = np.asarray(old_user_neighbours['indices'])[:, :n_neighbors].astype(np.int64)
+        old_lists = np.where(old_lists >= 0, user_map[np.maximum(old_lists, 0)], -1)
+
+        stale = changed_users | ((new_lists >= 0) & changed_users[np.maximum(new_lists, 0)]).any(axis=1)
+        kept = np.flatnonzero(user_map >= 0)
+        stale[user_map[kept]] |= (old_lists[kept] != new_lists[user_map[kept]]).any(axis=1)
+
+        table = update_recommendation_table(load_object(config.user_recommendations_path), user_map, item_map,
+                                            stale, methods)
+        table['user_ids'] = np.asarray(bundle['user_ids'])
+        sources = {method: artifacts_fingerprint(PRECOMPUTED_SOURCES[method]) for method in methods}
+        save_arrays(config.user_recommendations_path, table, metadata=dict(metadata, methods=methods, sources=sources))
+        logging.info(f"Precomputed recommendations carried over, {table['stale'].sum()} users marked stale")
+
+        return int(table['stale'].sum())
+
+    def artifact_stages(self, min_user_ratings=200, min_book_ratings=50, n_neighbors=20, svd_params=None,
+                        similarity_params=None, recommendation_params=None, cold_start_params=None, als_params=None,
+                        builder='pandas', spark_cores=-1):
+        """
+        Describes the artifacts pipeline as a DAG of stages for StagePipeline (see
+        stagecache.py): filter -> catalog, pivot, knn, svd, als, pivot -> similarity,
+        user_neighbours, item_neighbours, filter, pivot -> cold_start and pivot,
+        user_neighbours, svd, als -> recommendations. Every stage writes its artifacts, and the
+        cache keys depend on the cleaned file content, the parameters of each stage and
+        the code it runs, so changing e.g. only svd_params retrains only the svd model.
+
+        With builder='spark' the filter, pivot, similarity, neighbours and als stages run
+        on a local Spark session instead (see sparkbuilder.py) and write the same
+        artifacts. The stages then share the session, so they must run in this process
+        (StagePipeline with n_workers=1).
+
+        Parameters:
+        builder (str): 'pandas' or 'spark'.
+        spark_cores (int): Cores of the Spark session, -1 for every core.
+
+        Returns:
+        list: The stages of the pipeline.
+        """
+        config = self.helper_config
+        cleaned_data_path = self.cleaned_data_path()
+        neighbour_code = (make_index, recall_at_k, self._neighbour_table, top_k_cosine)
+
+        if builder not in ('pandas', 'spark'):
+            raise ValueError(f"Unknown artifacts builder {builder!r}, expected 'pandas' or 'spark'")
+        stage_owner, builder_code = self, ()
+        if builder == 'spark':
+            stage_owner = sparkbuilder.SparkArtifactsBuilder(self, n_cores=spark_cores)
+            builder_code = (sparkbuilder.SparkArtifactsBuilder, sparkbuilder.spark_session, sparkbuilder.spark_encode_ratings,
+                            sparkbuilder.spark_filter_ratings, sparkbuilder.spark_user_item_bundle,
+                            sparkbuilder.spark_top_k_cosine, sparkbuilder._score_rows, sparkbuilder.spark_train_als)
+
+        return [
+            Stage('filter', stage_owner.filter_file, params={'file_path': cleaned_data_path,
+                                                      'min_user_ratings': min_user_ratings,
+                                                      'min_book_ratings': min_book_ratings},
+                  files=(cleaned_data_path,), outputs=(config.ratings_table_path, config.final_filtered_data_path),
+                  load=partial(load_object, config.final_filtered_data_path),
+                  code=(self.read_ratings, self.filter_data, encode_ratings, filter_ratings) + builder_code),
+            Stage('catalog', self.book_catalog, inputs={'filtered_data': 'filter'},
+                  outputs=(config.book_catalog_path,), code=(table_book_catalog,)),
+            Stage('pivot', stage_owner.pivot_table_data, inputs={'filtered_data': 'filter'},
+                  outputs=(config.users_item_matrix_path,), load=partial(load_object, config.users_item_matrix_path),
+                  code=(table_user_item_bundle, sparse_from_codes) + builder_code),
+            Stage('similarity', stage_owner.similarity_score, inputs={'pivot_table': 'pivot'},
+                  params=dict(similarity_params or {}), outputs=(config.similarity_scores_path,),
+                  code=(blocked_cosine_similarity, top_k_cosine) + builder_code),
+            Stage('user_neighbours', stage_owner.user_neighbours, inputs={'pivot_table': 'pivot'},
+                  params={'n_neighbors': n_neighbors}, outputs=(config.user_neighbours_path,),
+                  code=neighbour_code + builder_code),
+            Stage('item_neighbours', stage_owner.item_neighbours, inputs={'pivot_table': 'pivot'},
+                  params={'n_neighbors': n_neighbors}, outputs=(config.item_neighbours_path,),
+                  code=neighbour_code + builder_code),
+            Stage('knn', self.knn_model, inputs={'final_filtered_data': 'filter'},
+                  outputs=(config.book_pivot_path, config.knn_model_path), code=(table_book_pivot, sparse_from_codes)),
+            Stage('svd', self.svd_model, inputs={'final_filtered_data': 'filter'},
+                  params={'params': dict(svd_params or config.svd_params)},
+                  outputs=(config.svd_model_path, config.svd_factors_path),
+                  code=(fold_assignment, train_svd, rated_pattern, evaluate_factors, table_rated_matrix,
+                        export_svd_factors)),
+            Stage('als', stage_owner.als_model, inputs={'final_filtered_data': 'filter'},
+                  params={'params': dict(als_params or config.als_params)}, outputs=(config.als_factors_path,),
+                  code=(confidence_matrix, train_als, als._least_squares, als._solve_rows, als._train_implicit,
+                        resolve_backend, als_scores, fold_assignment, rated_pattern, ranking_metrics,
+                        table_rated_matrix) + builder_code),
+            Stage('cold_start', self.cold_start_model, inputs={'filtered_data': 'filter', 'pivot_table': 'pivot'},
+                  params=dict({'file_path': cleaned_data_path}, **(cold_start_params or {})),
+                  files=(cleaned_data_path,), outputs=(config.cold_start_path,),
+                  code=(self.read_users, build_cold_start, age_bands, clean_countries)),
+            Stage('recommendations', self.recommendation_table,
+                  inputs={'pivot_table': 'pivot', 'user_neighbours': 'user_neighbours', 'svd_model': 'svd',
+                          'als_model': 'als'},
+                  params=dict(recommendation_params or {}), outputs=(config.user_recommendations_path,),
+                  code=(precompute_recommendations, _score_block, recommend_block, score_neighbours, rank_books,
+                        svd_recommend_block, unrated_svd_scores, top_k_rows, als.als_recommend_block)),
+        ]
+
+    def update_artifacts(self, delta_data_path, svd_epochs=3, als_iterations=3, als_backend=None):
+        """
+        Folds a file of new ratings into the existing artifacts instead of rebuilding them.
+
+        The new ratings are appended to the encoded ratings table and filtered again with
+        the thresholds of the previous build. The catalog, user-item matrix and knn model
+        are rebuilt from the integer codes, which is linear in the number of ratings.
+        Similarities and top-k neighbours are only recomputed for the users and books whose
+        rating vectors changed (see update_neighbours), and the SVD factors are trained for
+        a few epochs starting from the previous ones, the ALS factors for a few iterations
+        from the previous book factors. The pickled surprise model is left as it is, the
+        recommender serves the factors.
+
+        Parameters:
+        delta_data_path (str): Cleaned ratings file (parquet or CSV) with the new ratings.
+        svd_epochs (int): Number of epochs the SVD factors are trained for.
+        als_iterations (int): Number of iterations the ALS factors are trained for.
+        als_backend (str, optional): 'numpy', 'implicit' or 'auto' for the ALS training, the
+            backend stored with the previous factors by default. Factors built by the Spark
+            builder need one.
+
+        Returns:
+        dict: Number of changed and recomputed users and books.
+        """
+        logging.info(f"Updating the artifacts with the ratings in {delta_data_path}")
+
+        try:
+            config = self.helper_config
+
+            # Previous artifacts, memory-mapped, saving new versions leaves them readable
+            logging.info("Loading the previous artifacts")
+            ratings_table = load_object(config.ratings_table_path)
+            thresholds = read_manifest(config.final_filtered_data_path)['metadata']
+            old_bundle = load_object(config.users_item_matrix_path)
+            old_user_neighbours = load_object(config.user_neighbours_path)
+            old_item_neighbours = load_object(config.item_neighbours_path)
+            old_similarity = load_object(config.similarity_scores_path)
+            similarity_metadata = read_manifest(config.similarity_scores_path)['metadata']
+            old_factors = load_object(config.svd_factors_path)
+            old_als_factors = load_object(config.als_factors_path) if artifact_exists(config.als_factors_path) else None
+            if old_als_factors is not None:
+                # Checked before any artifact is rewritten, an unsupported backend raises
+                als_params = read_manifest(config.als_factors_path)['metadata']
+                als_backend = resolve_backend(als_backend or als_params['backend'])
+            user_backend = read_manifest(config.user_neighbours_path)['metadata'].get('backend', 'exact')
+            item_backend = read_manifest(config.item_neighbours_path)['metadata'].get('backend', 'exact')
+
+            # Appending and filtering the ratings
+            delta = self.read_ratings(delta_data_path)
+            logging.info(f"Appending {len(delta)} ratings to the encoded ratings table")
+            self.ratings_table = append_ratings(ratings_table, delta)
+            save_arrays(config.ratings_table_path, self.ratings_table)
+
+            filtered = self.filter_data(min_user_ratings=thresholds.get('min_user_ratings', 200),
+                                        min_book_ratings=thresholds.get('min_book_ratings', 50))
+            self.book_catalog(filtered_data=filtered)
+            bundle = self.pivot_table_data(filtered_data=filtered)
+
+            # Rows and columns of the new matrix that differ from the previous build
+            user_map = id_positions(old_bundle['user_ids'], bundle['user_ids'])
+            item_map = id_positions(np.asarray(old_bundle['book_titles']).astype(str), np.asarray(bundle['book_titles']).astype(str))
+            item_matrix = bundle['matrix'].T.tocsr()
+            changed_users = changed_rows(old_bundle['matrix'], bundle['matrix'], user_map, item_map)
+            changed_items = changed_rows(old_bundle['matrix'].T.tocsr(), item_matrix, item_map, user_map)
+            logging.info(f"Changed rows: {changed_users.sum()} users, {changed_items.sum()} books")
+
+            # Neighbour tables, only the exact backend is maintained incrementally
+            summary = {'changed_users': int(changed_users.sum()), 'changed_books': int(changed_items.sum())}
+            for name, matrix, old_neighbours, row_map, changed, backend, path in (
+                    ('users', bundle['matrix'], old_user_neighbours, user_map, changed_users, user_backend,
+                     config.user_neighbours_path),
+                    ('books', item_matrix, old_item_neighbours, item_map, changed_items, item_backend,
+                     config.item_neighbours_path)):
+                n_neighbors = old_neighbours['indices'].shape[1]
+                if backend != 'exact':
+                    logging.info(f"{name} neighbours use the {backend} index, rebuilding them")
+                    table = self.user_neighbours if name == 'users' else self.item_neighbours
+                    table(bundle, n_neighbors=n_neighbors, backend=backend)
+                    summary[f'recomputed_{name}'] = int(matrix.shape[0])
+                    continue
+
+                indices, scores, stale = update_neighbours(matrix, old_neighbours['indices'], old_neighbours['scores'],
+                                                           row_map, changed, n_neighbors)
+                logging.info(f"Recomputed the neighbours of {stale.sum()} {name}, merged the rest")
+                save_arrays(path, {'indices': indices, 'scores': scores}, metadata={'backend': 'exact', 'incremental': True})
+                summary[f'recomputed_{name}'] = int(stale.sum())
+
+            # Book similarities, rows and columns of the changed books only
+            logging.info("Updating the similarity scores")
+            if 'indices' in old_similarity:
+                # Top-k similarities are a neighbour table
+                indices, scores, _ = update_neighbours(item_matrix, old_similarity['indices'], old_similarity['scores'],
+                                                       item_map, changed_items, old_similarity['indices'].shape[1])
+                similarity = {'indices': indices, 'scores': scores.astype(old_similarity['scores'].dtype)}
+            else:
+                n_books = item_matrix.shape[0]
+                out = create_array(config.similarity_scores_path, 'similarity', (n_books, n_books),
+                                   old_similarity['similarity'].dtype)
+                similarity = {'similarity': update_similarity(old_similarity['similarity'], item_matrix, item_map,
+                                                              changed_items, out=out)}
+            save_arrays(config.similarity_scores_path, similarity, metadata=similarity_metadata)
+
+            # The brute-force knn model only stores its data, refitting is cheap
+            self.knn_model(final_filtered_data=filtered)
+
+            # SVD factors, warm-started from the previous ones
+            logging.info(f"Training the svd factors for {svd_epochs} epochs from the previous factors")
+            svd_params = read_manifest(config.svd_factors_path)['metadata']
+            factors = warm_start_factors(old_factors, user_map, item_map, filtered, n_epochs=svd_epochs,
+                                         lr=svd_params.get('lr_all', 0.005), reg=svd_params.get('reg_all', 0.2))
+            save_arrays(config.svd_factors_path, factors, metadata=dict(svd_params, warm_start_epochs=svd_epochs))
+
+            # ALS factors, from the previous book factors on every filtered interaction
+            if old_als_factors is not None:
+                logging.info(f"Training the als factors for {als_iterations} iterations from the previous factors "
+                             f"with the {als_backend} backend")
+                item_factors = warm_start_item_factors(old_als_factors['item_factors'], item_map,
+                                                       len(bundle['book_titles']), seed=als_params.get('seed', 42))
+                weights = confidence_matrix(filtered, alpha=als_params['alpha'],
+                                            implicit_rating=als_params['implicit_rating'])
+                user_factors, item_factors = train_als(weights, n_factors=item_factors.shape[1],
+                                                       regularization=als_params['regularization'],
+                                                       n_iterations=als_iterations, backend=als_backend,
+                                                       item_factors=item_factors)
+                save_arrays(config.als_factors_path,
+                            {'user_factors': user_factors, 'item_factors': item_factors,
+                             'rated': table_rated_matrix(filtered)},
+                            metadata=dict(als_params, backend=als_backend, warm_start_iterations=als_iterations))
+
+            # Cold-start rankings, rebuilt from every rating with the countries and ages of
+            # the previous users updated by the delta
+            if artifact_exists(config.cold_start_path):
+                logging.info("Rebuilding the cold-start rankings")
+                previous = load_object(config.cold_start_path)
+                users = pd.concat([
+                    pd.DataFrame({'User-ID': np.asarray(previous['user_ids']),
+                                  'Country': np.append(np.asarray(previous['country_names']), '')[previous['user_countries']],
+                                  'Age': np.asarray(previous['user_ages'])}),
+                    self.read_users(delta_data_path)])
+                self.cold_start_model(bundle, users=users, **read_manifest(config.cold_start_path)['metadata'])
+
+            # Precomputed recommendations, the users they no longer hold for are scored live
+            if artifact_exists(config.user_recommendations_path):
+                summary['stale_recommendations'] = self._update_recommendation_table(
+                    bundle, old_user_neighbours, user_map, item_map, changed_users)
+
+            logging.info(f"Artifacts updated: {summary}")
+            return summary
+
+        except Exception as e:
+            logging.error("Error occurred while updating the artifacts")
+            raise CustomException(e, sys)
@@ -0,0 +1,310 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.preprocessing import normalize
+
+from src.components.neighbours import ExactIndex
+from src.components.ratings import table_rated_matrix
+
+
+def id_positions(old_ids, new_ids):
+    """
+    Position of every old id in a sorted array of new ids, -1 for ids that are gone.
+    """
+    old_ids, new_ids = np.asarray(old_ids), np.asarray(new_ids)
+    if len(new_ids) == 0:
+        return np.full(len(old_ids), -1, dtype=np.int64)
+
+    positions = np.minimum(np.searchsorted(new_ids, old_ids), len(new_ids) - 1)
+    return np.where(new_ids[positions] == old_ids, positions, -1)
+
+
+def reindex_matrix(matrix, row_map, column_map, shape):
+    """
+    Moves the entries of a sparse matrix to new row and column positions, dropping the
+    entries whose row or column is mapped to -1.
+    """
+    coo = matrix.tocoo()
+    keep = (row_map[coo.row] >= 0) & (column_map[coo.col] >= 0)
+
+    return csr_matrix((coo.data[keep], (row_map[coo.row[keep]], column_map[coo.col[keep]])), shape=shape)
+
+
+def changed_rows(old_matrix, new_matrix, row_map, column_map):
+    """
+    Finds the rows of the new matrix whose vector differs from the old one.
+
+    A row changed when one of its values differs, when it lost entries in columns that
+    no longer exist, or when it is new.
+
+    Args:
+        old_matrix (scipy.sparse.csr_matrix): Previous matrix.
+        new_matrix (scipy.sparse.csr_matrix): Updated matrix.
+        row_map (np.ndarray): New position of every old row, -1 when gone.
+        column_map (np.ndarray): New position of every old column, -1 when gone.
+
+    Returns:
+        np.ndarray: Boolean mask over the rows of the new matrix.
+    """
+    aligned = reindex_matrix(old_matrix, row_map, column_map, new_matrix.shape)
+    diff = (new_matrix - aligned).tocsr()
+    diff.eliminate_zeros()
+
+    changed = np.diff(diff.indptr) > 0
+
+    # Rows that lost entries in dropped columns
+    present = np.flatnonzero(row_map >= 0)
+    lost = np.diff(old_matrix.tocsr().indptr)[present] != np.diff(aligned.indptr)[row_map[present]]
+    changed[row_map[present[lost]]] = True
+
+    # Rows without an old counterpart
+    is_new = np.ones(new_matrix.shape[0], dtype=bool)
+    is_new[row_map[present]] = False
+
+    return changed | is_new
+
+
+def _merge_sorted(indices, scores, k):
+    """
+    Keeps the k best candidates of every row: highest score first, ties broken by the
+    lower index, like the exact index.
+    """
+    order = np.lexsort((np.where(indices >= 0, indices, np.iinfo(np.int64).max), -scores), axis=-1)[:, :k]
+    indices = np.take_along_axis(indices, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    valid = (indices >= 0) & (scores > -np.inf)
+
+    return np.where(valid, indices, -1), np.where(valid, scores, -np.inf)
+
+
+def update_neighbours(new_matrix, old_indices, old_scores, row_map, changed, k, block_size=1024):
+    """
+    Updates a top-k cosine neighbour table after some rows of the matrix changed.
+
+    Rows that changed, and rows whose old list holds a changed or removed row, are
+    recomputed from scratch. Every other row keeps its old list, which only holds
+    unchanged rows with unchanged similarities, and merges in its similarities to the
+    changed rows. Any row outside the old list scored at most the old k-th score, so
+    the merged list is the exact top k.
+
+    Args:
+        new_matrix (scipy.sparse.csr_matrix): Updated matrix, one row per user or book.
+        old_indices (np.ndarray): Previous (n_old_rows, k) neighbour rows, -1 for none.
+        old_scores (np.ndarray): Previous (n_old_rows, k) similarities.
+        row_map (np.ndarray): New position of every old row, -1 when gone.
+        changed (np.ndarray): Boolean mask of the changed rows of the new matrix.
+        k (int): Number of neighbours per row.
+        block_size (int): Number of rows scored together.
+
+    Returns:
+        tuple: (indices, scores) arrays of shape (n_new_rows, k) and the boolean mask of
+        the rows that were recomputed from scratch.
+    """
+    n_rows = new_matrix.shape[0]
+    old_indices = np.asarray(old_indices, dtype=np.int64)
+    k = min(k, max(n_rows - 1, 0))
+
+    # Old lists in new row positions, -2 marks a neighbour that no longer exists
+    new_to_old = np.full(n_rows, -1, dtype=np.int64)
+    new_to_old[row_map[row_map >= 0]] = np.flatnonzero(row_map >= 0)
+    lists = np.full((n_rows, old_indices.shape[1]), -1, dtype=np.int64)
+    lists_scores = np.full((n_rows, old_indices.shape[1]), -np.inf)
+    kept = new_to_old >= 0
+    old_rows = old_indices[new_to_old[kept]]
+    mapped = np.where(old_rows >= 0, row_map[np.maximum(old_rows, 0)], -1)
+    lists[kept] = np.where((old_rows >= 0) & (mapped < 0), -2, mapped)
+    lists_scores[kept] = np.where(old_rows >= 0, old_scores[new_to_old[kept]], -np.inf)
+
+    touched = (lists == -2) | ((lists >= 0) & changed[np.maximum(lists, 0)])
+    stale = changed | ~kept | touched.any(axis=1) | (old_indices.shape[1] < k)
+
+    indices = np.full((n_rows, k), -1, dtype=np.int64)
+    scores = np.full((n_rows, k), -np.inf)
+
+    index = ExactIndex(block_size=block_size).fit(new_matrix)
+    stale_rows = np.flatnonzero(stale)
+    if len(stale_rows):
+        found, found_scores = index.search(new_matrix[stale_rows], k, exclude=stale_rows)
+        indices[stale_rows] = found
+        scores[stale_rows] = np.where(found >= 0, found_scores, -np.inf)
+
+    # Unchanged rows: old list merged with the similarities to the changed rows
+    changed_ids = np.flatnonzero(changed)
+    changed_t = index.normalized[changed_ids].T.tocsr()
+    fresh_rows = np.flatnonzero(~stale)
+    for start in range(0, len(fresh_rows), block_size):
+        rows = fresh_rows[start:start + block_size]
+        block = (index.normalized[rows] @ changed_t).toarray()
+        candidates = np.hstack((lists[rows][:, :k], np.broadcast_to(changed_ids, block.shape)))
+        candidate_scores = np.hstack((lists_scores[rows][:, :k], block))
+        indices[rows], scores[rows] = _merge_sorted(candidates, candidate_scores, k)
+
+    valid = indices >= 0
+    return indices.astype(np.int32), np.where(valid, scores, 0).astype(np.float32), stale
+
+
+def update_similarity(old_similarity, new_matrix, row_map, changed, out=None, block_size=1024):
+    """
+    Updates a dense cosine similarity matrix between rows after some rows changed:
+    unchanged pairs are copied, the rows and columns of changed rows are recomputed.
+    Both are done in blocks of rows, so with a memory-mapped old matrix and out (see
+    create_array) peak memory stays block_size x n_rows.
+
+    Args:
+        old_similarity (np.ndarray): Previous (n_old_rows, n_old_rows) similarities.
+        new_matrix (scipy.sparse.csr_matrix): Updated matrix, one row per user or book.
+        row_map (np.ndarray): New position of every old row, -1 when gone.
+        changed (np.ndarray): Boolean mask of the changed rows of the new matrix.
+        out (np.ndarray, optional): Zero-filled (n_rows, n_rows) array to fill, allocated
+            with the dtype of old_similarity when None.
+        block_size (int): Number of rows copied or recomputed together.
+
+    Returns:
+        np.ndarray: out, the updated similarity matrix.
+    """
+    n_rows = new_matrix.shape[0]
+    similarity = np.zeros((n_rows, n_rows), dtype=old_similarity.dtype) if out is None else out
+
+    present = np.flatnonzero(row_map >= 0)
+    for start in range(0, len(present), block_size):
+        rows = present[start:start + block_size]
+        similarity[row_map[rows][:, None], row_map[present][None, :]] = np.asarray(old_similarity[rows])[:, present]
+
+    changed_ids = np.flatnonzero(changed)
+    normalized = normalize(new_matrix.tocsr(), norm='l2', axis=1)
+    normalized_t = normalized.T.tocsr()
+    for start in range(0, len(changed_ids), block_size):
+        rows = changed_ids[start:start + block_size]
+        fresh = (normalized[rows] @ normalized_t).toarray()
+        similarity[rows, :] = fresh
+        similarity[:, rows] = fresh.T
+
+    return similarity
+
+
+def _scatter_add(target, index, values):
+    """
+    target[index] += values with repeated indices summed, like np.add.at but through
+    a sparse matrix product, which is much faster for rows of factors.
+    """
+    unique, inverse = np.unique(index, return_inverse=True)
+    summing = csr_matrix((np.ones(len(index), dtype=values.dtype), (inverse, np.arange(len(index)))),
+                         shape=(len(unique), len(index)))
+    target[unique] += summing @ values
+
+
+def warm_start_factors(old_factors, user_map, item_map, table, n_epochs=3, lr=0.005, reg=0.2,
+                       batch_size=16384, init_std=0.1, seed=42):
+    """
+    Continues training SVD factors on an updated ratings table for a few epochs, starting
+    from the previous factors instead of a random initialization.
+
+    Users and books that are new get random factors and zero biases, like surprise
+    initializes them. Training is mini-batch SGD on the same biased matrix
+    factorization objective as surprise.SVD (learning rate lr, regularization reg).
+
+    Args:
+        old_factors (dict): Factors exported by export_svd_factors (or a previous warm start).
+        user_map (np.ndarray): New row of every old user, -1 when gone.
+        item_map (np.ndarray): New column of every old book, -1 when gone.
+        table (dict): Updated filtered ratings table.
+        n_epochs (int): Number of passes over the ratings.
+        lr (float): Learning rate.
+        reg (float): Regularization of factors and biases.
+        batch_size (int): Number of ratings per SGD step.
+        init_std (float): Standard deviation of the factors of new users and books.
+        seed (int): Seed of the initialization and the shuffling.
+
+    Returns:
+        dict: Factors in the layout of export_svd_factors, aligned with the updated table.
+        Inner ids are the matrix positions, as every user and book is now trained.
+    """
+    rng = np.random.default_rng(seed)
+    n_users, n_items = len(table['user_ids']), len(table['book_titles'])
+
+    def carried(values, mapping, size, random):
+        # Old rows moved to their new positions, new rows initialized
+        shape = (size,) + np.shape(values)[1:]
+        result = rng.normal(0, init_std, shape).astype(np.float32) if random else np.zeros(shape, dtype=np.float32)
+        kept = mapping >= 0
+        result[mapping[kept]] = np.asarray(values)[kept]
+        return result
+
+    pu = carried(old_factors['user_factors'], user_map, n_users, True)
+    qi = carried(old_factors['item_factors'], item_map, n_items, True)
+    bu = carried(old_factors['user_biases'], user_map, n_users, False)
+    bi = carried(old_factors['item_biases'], item_map, n_items, False)
+
+    users = np.asarray(table['user_codes'], dtype=np.int64)
+    items = np.asarray(table['book_codes'], dtype=np.int64)
+    ratings = np.asarray(table['ratings'], dtype=np.float32)
+    global_mean = np.float32(ratings.mean())
+
+    for _ in range(n_epochs):
+        order = rng.permutation(len(ratings))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            u, i = users[batch], items[batch]
+            pu_u, qi_i = pu[u], qi[i]
+            err = ratings[batch] - (global_mean + bu[u] + bi[i] + np.einsum('ij,ij->i', pu_u, qi_i))
+
+            _scatter_add(bu, u, lr * (err - reg * bu[u]))
+            _scatter_add(bi, i, lr * (err - reg * bi[i]))
+            _scatter_add(pu, u, lr * (err[:, None] * qi_i - reg * pu_u))
+            _scatter_add(qi, i, lr * (err[:, None] * pu_u - reg * qi_i))
+
+    factors = dict(old_factors)
+    factors.update({
+        'user_factors': pu,
+        'item_factors': qi,
+        'user_biases': bu,
+        'item_biases': bi,
+        'global_mean': global_mean,
+        'user_inner_ids': np.arange(n_users, dtype=np.int32),
+        'item_inner_ids': np.arange(n_items, dtype=np.int32),
+        'rated': table_rated_matrix(table),
+    })
+    return factors
+
+
+def update_recommendation_table(table, user_map, item_map, stale, methods):
+    """
+    Carries a precomputed recommendation table over to an updated user-item matrix.
+
+    Rows move to the new user positions and book indices to the new columns. New
+    users, users flagged in stale and users whose list holds a book that no longer
+    exists are marked stale, so the recommender scores them live.
+
+    Args:
+        table (dict): Previous table built by Helper.recommendation_table.
+        user_map (np.ndarray): New position of every old user, -1 when gone.
+        item_map (np.ndarray): New column of every old book, -1 when gone.
+        stale (np.ndarray): Boolean mask of the new users whose lists are out of date.
+        methods (list): Methods of the table to carry over.
+
+    Returns:
+        dict: The table in the new user and book positions, without 'user_ids'.
+    """
+    n_users = len(stale)
+    kept = np.flatnonzero(user_map >= 0)
+    new_rows = user_map[kept]
+
+    stale = np.array(stale, dtype=bool)
+    is_new = np.ones(n_users, dtype=bool)
+    is_new[new_rows] = False
+    stale |= is_new
+    stale[new_rows] |= np.asarray(table['stale'])[kept]
+
+    result = {}
+    for method in methods:
+        old_books = np.asarray(table[f'{method}_books'])[kept]
+        mapped = np.where(old_books >= 0, item_map[np.maximum(old_books, 0)], -1)
+        stale[new_rows] |= ((old_books >= 0) & (mapped < 0)).any(axis=1)
+
+        books = np.full((n_users, old_books.shape[1]), -1, dtype=np.int32)
+        scores = np.zeros((n_users, old_books.shape[1]), dtype=np.float32)
+        books[new_rows] = mapped
+        scores[new_rows] = np.asarray(table[f'{method}_scores'])[kept]
+        result[f'{method}_books'], result[f'{method}_scores'] = books, scores
+
+    result['stale'] = stale
+    return result
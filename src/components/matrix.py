@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix, csr_matrix
+
+
+def sparse_from_codes(row_codes, column_codes, values, shape):
+    """
+    Builds a CSR matrix from integer row and column codes. Repeated (row, column) pairs
+    are averaged like pivot_table's default aggregation.
+
+    Args:
+        row_codes (array-like): Row of every value.
+        column_codes (array-like): Column of every value.
+        values (array-like): Cell values.
+        shape (tuple): Shape of the matrix.
+
+    Returns:
+        scipy.sparse.csr_matrix: The matrix, without explicit zeros.
+    """
+    cell_values = np.asarray(values, dtype=np.float64)
+    sums = coo_matrix((cell_values, (row_codes, column_codes)), shape=shape).tocsr()
+    counts = coo_matrix((np.ones(len(cell_values)), (row_codes, column_codes)), shape=shape).tocsr()
+
+    # Both matrices share the same sparsity pattern, so the mean is elementwise on data
+    sums.sum_duplicates()
+    counts.sum_duplicates()
+    matrix = csr_matrix((sums.data / counts.data, sums.indices, sums.indptr), shape=shape)
+    matrix.eliminate_zeros()
+
+    return matrix
+
+
+def build_sparse_matrix(data, index, columns, values):
+    """
+    Builds a sparse pivot table straight from integer-coded ids.
+
+    Row and column ids are coded with pd.factorize (sorted, like pivot_table), repeated
+    (row, column) pairs are averaged like pivot_table's default aggregation, and missing
+    cells stay implicit instead of being filled with 0.
+
+    Args:
+        data (pandas DataFrame): Long-format table.
+        index (str): Column whose values become the rows.
+        columns (str): Column whose values become the columns.
+        values (str): Column holding the cell values.
+
+    Returns:
+        dict: 'matrix' (scipy.sparse.csr_matrix), 'row_ids' and 'column_ids' arrays
+        mapping every row and column index back to its original id.
+    """
+    row_codes, row_ids = pd.factorize(data[index], sort=True)
+    column_codes, column_ids = pd.factorize(data[columns], sort=True)
+    matrix = sparse_from_codes(row_codes, column_codes, data[values], (len(row_ids), len(column_ids)))
+
+    return {
+        'matrix': matrix,
+        'row_ids': np.asarray(row_ids),
+        'column_ids': np.asarray(column_ids),
+    }
+
+
+def user_item_bundle(data):
+    """
+    Builds the user x book rating matrix served by the recommender.
+
+    Returns:
+        dict: 'matrix', 'user_ids' (row index -> User-ID) and 'book_titles'
+        (column index -> Book-Title).
+    """
+    pivot = build_sparse_matrix(data, index='User-ID', columns='Book-Title', values='Book-Rating')
+
+    return {
+        'matrix': pivot['matrix'],
+        'user_ids': pivot['row_ids'],
+        'book_titles': pivot['column_ids'],
+    }
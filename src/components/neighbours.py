@@ -0,0 +1,303 @@
+import os
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from scipy.sparse import csr_matrix
+from sklearn.preprocessing import normalize
+
+from src.logger import logging
+from src.components.scoring import top_k_rows
+from src.components.similarity import top_k_cosine
+
+
+def _finalize(indices, scores):
+    """
+    Converts running top-k lists to the layout of top_k_cosine: int32 indices and
+    float32 scores, -1 and 0 where a row has fewer than k neighbours.
+    """
+    valid = indices >= 0
+    return indices.astype(np.int32), np.where(valid, scores, 0).astype(np.float32)
+
+
+class ExactIndex:
+    """
+    Brute-force cosine neighbour index, the reference every approximate backend is
+    measured against. Similarities are computed in blocks of queries with sparse
+    matrix products, so memory stays bounded by block_size x n_rows.
+
+    Args:
+        block_size (int): Number of queries scored together.
+        n_jobs (int): Number of threads used by query_all, -1 for every core.
+    """
+
+    name = 'exact'
+
+    def __init__(self, block_size=1024, n_jobs=1):
+        self.block_size = block_size
+        self.n_jobs = n_jobs
+
+    def fit(self, matrix):
+        """
+        Indexes the rows of a sparse matrix (one row per user or book).
+        """
+        self.matrix = matrix.tocsr()
+        self.normalized = normalize(self.matrix, norm='l2', axis=1)
+        self.normalized_t = self.normalized.T.tocsr()
+        return self
+
+    def search(self, queries, k, exclude=None):
+        """
+        Finds the k indexed rows most similar to every query row.
+
+        Args:
+            queries (scipy.sparse.csr_matrix): Query vectors in the same feature space.
+            k (int): Number of neighbours per query.
+            exclude (np.ndarray, optional): One indexed row per query that must never be
+                returned, -1 for none (typically the query itself).
+
+        Returns:
+            tuple: (indices, scores) arrays of shape (n_queries, k), nearest first.
+        """
+        queries = normalize(queries.tocsr(), norm='l2', axis=1)
+        k = min(k, self.normalized.shape[0])
+        indices = np.full((queries.shape[0], k), -1, dtype=np.int32)
+        scores = np.zeros((queries.shape[0], k), dtype=np.float32)
+
+        for start in range(0, queries.shape[0], self.block_size):
+            rows = np.arange(start, min(start + self.block_size, queries.shape[0]))
+            block = (queries[rows] @ self.normalized_t).toarray()
+            if exclude is not None:
+                block_exclude = np.asarray(exclude)[rows]
+                has_exclude = block_exclude >= 0
+                block[np.flatnonzero(has_exclude), block_exclude[has_exclude]] = -np.inf
+
+            block_indices = top_k_rows(block, k)
+            valid = block_indices >= 0
+            indices[rows] = block_indices
+            scores[rows] = np.where(valid, np.take_along_axis(block, np.maximum(block_indices, 0), axis=1), 0)
+
+        return indices, scores
+
+    def query_all(self, k):
+        """
+        Top-k neighbours of every indexed row, the row itself excluded.
+        """
+        return top_k_cosine(self.matrix, k=k, block_size=self.block_size, n_jobs=self.n_jobs)
+
+
+class IVFIndex:
+    """
+    Approximate cosine neighbour index built on an inverted file: rows are clustered
+    with spherical k-means and a query is only compared with the rows of its n_probe
+    closest clusters. Pure NumPy/SciPy, nothing to install.
+
+    Recall and speed are traded with n_lists and n_probe: a query scores roughly
+    n_probe / n_lists of the rows, and n_probe = n_lists is exact.
+
+    Args:
+        n_lists (int, optional): Number of clusters, sqrt(n_rows) by default.
+        n_probe (int): Number of clusters searched per query.
+        n_iter (int): Number of k-means iterations.
+        train_size (int): Number of rows the clusters are trained on.
+        block_size (int): Number of queries scored together against a cluster.
+        n_jobs (int): Number of threads scoring lists in parallel, -1 for every core.
+        seed (int): Seed of the cluster initialization and training sample.
+    """
+
+    name = 'ivf'
+
+    def __init__(self, n_lists=None, n_probe=8, n_iter=10, train_size=20000, block_size=1024, n_jobs=1, seed=42):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.train_size = train_size
+        self.block_size = block_size
+        self.n_jobs = n_jobs
+        self.seed = seed
+
+    def fit(self, matrix):
+        """
+        Clusters the rows of a sparse matrix and builds the inverted lists.
+        """
+        rng = np.random.default_rng(self.seed)
+        self.matrix = matrix.tocsr()
+        self.normalized = normalize(self.matrix, norm='l2', axis=1)
+        n_rows = self.normalized.shape[0]
+        n_lists = min(self.n_lists or max(int(np.sqrt(n_rows)), 1), n_rows)
+
+        # Spherical k-means on a sample: assign by cosine, centroids are normalized means
+        sample = self.normalized[np.sort(rng.choice(n_rows, min(self.train_size, n_rows), replace=False))]
+        centroids = sample[rng.choice(sample.shape[0], n_lists, replace=False)].toarray()
+        for _ in range(self.n_iter):
+            assignment = self._assign(sample, centroids)
+            sums = self._cluster_sums(sample, assignment, n_lists)
+            empty = ~sums.any(axis=1)
+            if empty.any():
+                # Empty clusters restart from random rows
+                sums[empty] = sample[rng.choice(sample.shape[0], empty.sum(), replace=False)].toarray()
+            centroids = normalize(sums, norm='l2', axis=1)
+
+        self.centroids = centroids.astype(np.float32)
+        assignment = self._assign(self.normalized, self.centroids)
+
+        # Inverted lists: row ids grouped by cluster, plus the matching normalized rows
+        self.list_rows = np.argsort(assignment, kind='stable')
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=n_lists))))
+        self.list_vectors = self.normalized[self.list_rows]
+
+        logging.info(f"IVF index built: {n_rows} rows in {n_lists} lists, "
+                     f"largest list {np.diff(self.list_offsets).max()} rows")
+        return self
+
+    def _assign(self, vectors, centroids):
+        """
+        Closest centroid of every row, computed in blocks.
+        """
+        assignment = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], self.block_size * 8):
+            stop = min(start + self.block_size * 8, vectors.shape[0])
+            assignment[start:stop] = np.asarray(vectors[start:stop] @ centroids.T).argmax(axis=1)
+        return assignment
+
+    @staticmethod
+    def _cluster_sums(vectors, assignment, n_lists):
+        """
+        Sum of the rows of every cluster, as a dense (n_lists, n_features) array.
+        """
+        members = csr_matrix((np.ones(len(assignment)), (assignment, np.arange(len(assignment)))),
+                             shape=(n_lists, len(assignment)))
+        return (members @ vectors).toarray()
+
+    def search(self, queries, k, exclude=None):
+        """
+        Finds approximately the k indexed rows most similar to every query row.
+
+        Every inverted list is visited once: the queries probing it are scored against
+        its rows with one sparse product and the best k are kept in the slot of that
+        probe. Lists write to disjoint slots, so they can be scored in parallel threads.
+
+        Args:
+            queries (scipy.sparse.csr_matrix): Query vectors in the same feature space.
+            k (int): Number of neighbours per query.
+            exclude (np.ndarray, optional): One indexed row per query that must never be
+                returned, -1 for none (typically the query itself).
+
+        Returns:
+            tuple: (indices, scores) arrays of shape (n_queries, k), nearest first.
+        """
+        queries = normalize(queries.tocsr(), norm='l2', axis=1)
+        n_queries = queries.shape[0]
+        n_lists = len(self.list_offsets) - 1
+        k = min(k, self.normalized.shape[0])
+        exclude = np.full(n_queries, -1) if exclude is None else np.asarray(exclude)
+
+        probes = top_k_rows(np.asarray(queries @ self.centroids.T), min(self.n_probe, n_lists))
+        probing_queries, probe_rank = np.nonzero(probes >= 0)
+        probed_lists = probes[probing_queries, probe_rank]
+        order = np.argsort(probed_lists, kind='stable')
+        probing_queries, probe_rank, probed_lists = probing_queries[order], probe_rank[order], probed_lists[order]
+        bounds = np.searchsorted(probed_lists, np.arange(n_lists + 1))
+
+        # Best k of every probed list, one slot of k columns per probe
+        n_probe = probes.shape[1]
+        indices = np.full((n_queries, n_probe * k), -1, dtype=np.int64)
+        scores = np.full((n_queries, n_probe * k), -np.inf)
+
+        def score_list(list_id):
+            list_queries = probing_queries[bounds[list_id]:bounds[list_id + 1]]
+            list_ranks = probe_rank[bounds[list_id]:bounds[list_id + 1]]
+            start, stop = self.list_offsets[list_id], self.list_offsets[list_id + 1]
+            if len(list_queries) == 0 or start == stop:
+                return
+
+            members = self.list_rows[start:stop]
+            members_t = self.list_vectors[start:stop].T.tocsr()
+            for block_start in range(0, len(list_queries), self.block_size):
+                rows = list_queries[block_start:block_start + self.block_size]
+                ranks = list_ranks[block_start:block_start + self.block_size]
+                block = (queries[rows] @ members_t).toarray()
+                block[exclude[rows][:, None] == members[None, :]] = -np.inf
+
+                selected = top_k_rows(block, k)
+                valid = selected >= 0
+                selected = np.maximum(selected, 0)
+                slots = ranks[:, None] * k + np.arange(selected.shape[1])[None, :]
+                indices[rows[:, None], slots] = np.where(valid, members[selected], -1)
+                scores[rows[:, None], slots] = np.where(valid, np.take_along_axis(block, selected, axis=1), -np.inf)
+
+        n_jobs = (os.cpu_count() or 1) if self.n_jobs == -1 else self.n_jobs
+        if n_jobs <= 1:
+            for list_id in range(n_lists):
+                score_list(list_id)
+        else:
+            with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+                list(executor.map(score_list, range(n_lists)))
+
+        # Best k over all probed lists
+        selected = top_k_rows(scores, k)
+        valid = selected >= 0
+        selected = np.maximum(selected, 0)
+        indices = np.where(valid, np.take_along_axis(indices, selected, axis=1), -1)
+        scores = np.where(valid, np.take_along_axis(scores, selected, axis=1), -np.inf)
+
+        return _finalize(indices, scores)
+
+    def query_all(self, k):
+        """
+        Approximate top-k neighbours of every indexed row, the row itself excluded.
+        """
+        return self.search(self.matrix, k, exclude=np.arange(self.matrix.shape[0]))
+
+
+# Neighbour index backends by name
+NEIGHBOUR_INDEXES = {
+    ExactIndex.name: ExactIndex,
+    IVFIndex.name: IVFIndex,
+}
+
+
+def make_index(backend='exact', **params):
+    """
+    Creates a neighbour index by backend name, with the backend's tuning parameters.
+    """
+    if backend not in NEIGHBOUR_INDEXES:
+        raise ValueError(f"Unknown neighbour index {backend!r}, expected one of {sorted(NEIGHBOUR_INDEXES)}")
+
+    return NEIGHBOUR_INDEXES[backend](**params)
+
+
+def recall_at_k(index, k, sample_size=1000, seed=42):
+    """
+    Measures the recall@k of a fitted index against the exact backend on a sample of
+    its own rows: the share of the exact top-k neighbours the index also returns.
+
+    Args:
+        index: Fitted neighbour index.
+        k (int): Number of neighbours compared per row.
+        sample_size (int): Number of rows queried.
+        seed (int): Seed of the row sample.
+
+    Returns:
+        dict: 'recall', and the 'index_seconds' and 'exact_seconds' spent on the sample.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = index.matrix.shape[0]
+    rows = np.sort(rng.choice(n_rows, min(sample_size, n_rows), replace=False))
+    queries = index.matrix[rows]
+
+    start = time.perf_counter()
+    found, _ = index.search(queries, k, exclude=rows)
+    index_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected, _ = ExactIndex(block_size=getattr(index, 'block_size', 1024)).fit(index.matrix).search(queries, k, exclude=rows)
+    exact_seconds = time.perf_counter() - start
+
+    valid = expected >= 0
+    hits = ((expected[:, :, None] == found[:, None, :]) & valid[:, :, None]).any(axis=2).sum()
+
+    return {
+        'recall': float(hits / max(valid.sum(), 1)),
+        'index_seconds': index_seconds,
+        'exact_seconds': exact_seconds,
+    }
@@ -0,0 +1,224 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+
+from src.components.matrix import sparse_from_codes
+
+
+def encode_ratings(data):
+    """
+    Encodes a ratings table as integer-coded arrays.
+
+    Users, titles and ISBNs are coded with pd.factorize (sorted, like groupby and
+    pivot_table) and ratings are stored as uint8. The text columns are kept once per
+    ISBN in a small book metadata table instead of once per rating. Rows without a
+    user, title or rating are dropped, as groupby drops them when counting.
+
+    Args:
+        data (pandas DataFrame): Ratings table with User-ID, ISBN, Book-Rating, Book-Title,
+            Book-Author and Image-URL-M.
+
+    Returns:
+        dict: Per-rating 'user_codes', 'book_codes', 'isbn_codes' and 'ratings' arrays,
+        the 'user_ids' and 'book_titles' lookup tables, and the per-ISBN 'isbns',
+        'authors' and 'image_urls' metadata table.
+    """
+    user_codes, user_ids = pd.factorize(data['User-ID'], sort=True)
+    book_codes, book_titles = pd.factorize(data['Book-Title'], sort=True)
+    isbn_codes, isbns = pd.factorize(data['ISBN'], sort=True)
+    ratings = data['Book-Rating']
+
+    valid = (user_codes >= 0) & (book_codes >= 0) & ratings.notna().to_numpy()
+
+    # Metadata of every ISBN is taken from its first row, rows without an ISBN (code -1) skipped
+    coded_rows = np.flatnonzero(isbn_codes >= 0)
+    _, first_rows = np.unique(isbn_codes[coded_rows], return_index=True)
+    first_rows = coded_rows[first_rows]
+
+    table = {
+        'user_codes': user_codes[valid].astype(np.int32),
+        'book_codes': book_codes[valid].astype(np.int32),
+        'isbn_codes': isbn_codes[valid].astype(np.int32),
+        'ratings': ratings.to_numpy()[valid].astype(np.uint8),
+        'user_ids': np.asarray(user_ids),
+        'book_titles': np.asarray(book_titles, dtype=object),
+        'isbns': np.asarray(isbns, dtype=object),
+        'authors': data['Book-Author'].to_numpy(dtype=object)[first_rows],
+        'image_urls': data['Image-URL-M'].to_numpy(dtype=object)[first_rows],
+    }
+
+    return table
+
+
+def _compact(codes, ids):
+    """
+    Drops the ids no code refers to and recodes the codes, keeping the sorted order.
+    Missing values (code -1) stay -1.
+    """
+    used = np.bincount(codes[codes >= 0], minlength=len(ids)) > 0
+    new_codes = np.cumsum(used, dtype=np.int32) - 1
+    return np.where(codes >= 0, new_codes[codes], np.int32(-1)), np.asarray(ids)[used]
+
+
+def filter_ratings(table, min_user_ratings=200, min_book_ratings=50):
+    """
+    Keeps the ratings of users with at least min_user_ratings ratings, then of the
+    books with at least min_book_ratings ratings among those users.
+
+    Counts are taken with np.bincount over the integer codes, so sweeping thresholds
+    never touches the text columns. Unused users, titles and ISBNs are dropped from
+    the lookup tables.
+
+    Args:
+        table (dict): Ratings table built by encode_ratings.
+        min_user_ratings (int): Minimum number of ratings of a user.
+        min_book_ratings (int): Minimum number of ratings of a book among the kept users.
+
+    Returns:
+        dict: Filtered ratings table with the same layout.
+    """
+    user_codes = np.asarray(table['user_codes'])
+    book_codes = np.asarray(table['book_codes'])
+
+    user_counts = np.bincount(user_codes, minlength=len(table['user_ids']))
+    keep = user_counts[user_codes] >= min_user_ratings
+
+    book_counts = np.bincount(book_codes[keep], minlength=len(table['book_titles']))
+    keep &= book_counts[book_codes] >= min_book_ratings
+
+    filtered_user_codes, user_ids = _compact(user_codes[keep], table['user_ids'])
+    filtered_book_codes, book_titles = _compact(book_codes[keep], table['book_titles'])
+    filtered_isbn_codes, used_isbns = _compact(np.asarray(table['isbn_codes'])[keep], np.arange(len(table['isbns'])))
+
+    return {
+        'user_codes': filtered_user_codes,
+        'book_codes': filtered_book_codes,
+        'isbn_codes': filtered_isbn_codes,
+        'ratings': np.asarray(table['ratings'])[keep],
+        'user_ids': user_ids,
+        'book_titles': book_titles,
+        'isbns': np.asarray(table['isbns'])[used_isbns],
+        'authors': np.asarray(table['authors'])[used_isbns],
+        'image_urls': np.asarray(table['image_urls'])[used_isbns],
+    }
+
+
+def ratings_frame(table, columns=None):
+    """
+    Materializes a ratings table as a DataFrame, for the consumers that need one.
+    Text columns are categoricals over the lookup tables, so no string is copied per row.
+
+    Args:
+        table (dict): Ratings table built by encode_ratings or filter_ratings.
+        columns (list): Columns to build, all of them by default.
+
+    Returns:
+        pandas DataFrame: One row per rating.
+    """
+    isbn_codes = np.asarray(table['isbn_codes'])
+    builders = {
+        'User-ID': lambda: np.asarray(table['user_ids'])[table['user_codes']],
+        'ISBN': lambda: pd.Categorical.from_codes(isbn_codes, categories=table['isbns']),
+        'Book-Rating': lambda: np.asarray(table['ratings']),
+        'Book-Title': lambda: pd.Categorical.from_codes(table['book_codes'], categories=table['book_titles']),
+        'Book-Author': lambda: np.asarray(table['authors'])[isbn_codes],
+        'Image-URL-M': lambda: np.asarray(table['image_urls'])[isbn_codes],
+    }
+
+    return pd.DataFrame({column: builders[column]() for column in (columns or builders)})
+
+
+def table_book_catalog(table):
+    """
+    Builds the book catalog (see build_book_catalog) from a ratings table. Each title
+    takes the metadata of the ISBN of its first rating.
+    """
+    _, first_rows = np.unique(table['book_codes'], return_index=True)
+    isbn_codes = np.asarray(table['isbn_codes'])[first_rows]
+
+    return {
+        'titles': np.asarray(table['book_titles']),
+        'authors': np.asarray(table['authors'])[isbn_codes],
+        'image_urls': np.asarray(table['image_urls'])[isbn_codes],
+        'isbns': np.asarray(table['isbns'])[isbn_codes],
+    }
+
+
+def table_user_item_bundle(table):
+    """
+    Builds the user x book rating matrix (see user_item_bundle) from a ratings table.
+    """
+    shape = (len(table['user_ids']), len(table['book_titles']))
+
+    return {
+        'matrix': sparse_from_codes(table['user_codes'], table['book_codes'], table['ratings'], shape),
+        'user_ids': np.asarray(table['user_ids']),
+        'book_titles': np.asarray(table['book_titles']),
+    }
+
+
+def table_book_pivot(table):
+    """
+    Builds the ISBN x user rating matrix used by the knn model from a ratings table.
+    """
+    shape = (len(table['isbns']), len(table['user_ids']))
+
+    return {
+        'matrix': sparse_from_codes(table['isbn_codes'], table['user_codes'], table['ratings'], shape),
+        'row_ids': np.asarray(table['isbns']),
+        'column_ids': np.asarray(table['user_ids']),
+    }
+
+
+def table_rated_matrix(table):
+    """
+    Builds the users x books pattern of every rating in a ratings table, implicit 0
+    ratings included, in the row and column order of table_user_item_bundle.
+    """
+    shape = (len(table['user_ids']), len(table['book_titles']))
+    rated = coo_matrix((np.ones(len(table['ratings']), dtype=np.bool_), (table['user_codes'], table['book_codes'])),
+                       shape=shape).tocsr()
+    rated.sum_duplicates()
+
+    return rated
+
+
+def append_ratings(table, data):
+    """
+    Appends new ratings to an encoded ratings table.
+
+    The lookup tables are merged and kept sorted, so the result is the table
+    encode_ratings would build from the old rows followed by the new ones. ISBNs that
+    already exist keep their metadata.
+
+    Args:
+        table (dict): Ratings table built by encode_ratings.
+        data (pandas DataFrame): New ratings, same columns as for encode_ratings.
+
+    Returns:
+        dict: The merged ratings table.
+    """
+    delta = encode_ratings(data)
+    merged = {'ratings': np.concatenate((np.asarray(table['ratings']), delta['ratings']))}
+
+    for codes, ids, as_text in (('user_codes', 'user_ids', False), ('book_codes', 'book_titles', True),
+                                ('isbn_codes', 'isbns', True)):
+        old_ids, new_ids = np.asarray(table[ids]), np.asarray(delta[ids])
+        if as_text:
+            old_ids, new_ids = old_ids.astype(str), new_ids.astype(str)
+        all_ids = np.union1d(old_ids, new_ids)
+
+        merged[ids] = all_ids
+        merged[codes] = np.concatenate((np.searchsorted(all_ids, old_ids)[np.asarray(table[codes])],
+                                        np.searchsorted(all_ids, new_ids)[delta[codes]])).astype(np.int32)
+
+    # Existing ISBNs keep the metadata of their first row
+    old_positions = np.searchsorted(merged['isbns'], np.asarray(table['isbns']).astype(str))
+    new_positions = np.searchsorted(merged['isbns'], np.asarray(delta['isbns']).astype(str))
+    for column in ('authors', 'image_urls'):
+        values = np.empty(len(merged['isbns']), dtype=object)
+        values[new_positions] = delta[column]
+        values[old_positions] = np.asarray(table[column])
+        merged[column] = values
+
+    return merged
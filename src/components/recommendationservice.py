@@ -0,0 +1,416 @@
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import asyncio
+import multiprocessing
+import numpy as np
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+from src.logger import logging
+from src.exception import CustomException
+from src.components.recommender import BookRecommendationSystem
+
+# Reason phrases of the status codes the service answers with
+STATUS_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+# Largest request head accepted, the service only answers GET requests
+MAX_HEAD_BYTES = 16384
+
+
+class RecommendationService:
+    """
+    Asynchronous HTTP front end of a BookRecommendationSystem.
+
+    Requests are handled on an asyncio event loop and scoring runs in a thread pool,
+    so slow scoring never blocks the connections. Concurrent requests with the same
+    parameters share one pending result (coalescing), and the requests that arrive
+    while the scorer threads are busy, or within batch_wait of each other, are scored
+    together through get_top_recommendations_many (micro-batching).
+
+    Endpoints:
+        GET /recommendations?user_id=...&top_n=5&n_neighbors=5&method=cosine
+        GET /health
+    """
+
+    def __init__(self, recommender=None, score_threads=2, max_batch=64, batch_wait=0.002, cache_size=1024,
+                 method='cosine'):
+        """
+        Args:
+            recommender (BookRecommendationSystem, optional): Recommender to serve, loaded
+                from the artifacts when None.
+            score_threads (int): Number of batches scored concurrently.
+            max_batch (int): Largest number of distinct requests scored together, 1
+                disables micro-batching.
+            batch_wait (float): Seconds a batch waits for more requests after its first one.
+            cache_size (int): LRU cache size of the recommender loaded when None is given.
+            method (str): Default method of the recommender loaded when None is given, used
+                by the requests without a method.
+        """
+        self.recommender = (recommender if recommender is not None
+                            else BookRecommendationSystem(cache_size=cache_size, method=method))
+        self.score_threads = score_threads
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+
+        self.executor = ThreadPoolExecutor(max_workers=score_threads, thread_name_prefix='scorer')
+        self.stats = {'requests': 0, 'coalesced': 0, 'batches': 0, 'scored': 0, 'errors': 0}
+        self._pending = {}
+        self._queue = None
+        self._slots = None
+        self._batcher = None
+
+    async def start(self):
+        """
+        Starts the batching task on the running event loop.
+        """
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.score_threads)
+        self._batcher = asyncio.create_task(self._batch_loop())
+
+    async def close(self):
+        """
+        Stops the batching task and the scorer threads.
+        """
+        if self._batcher is not None:
+            self._batcher.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def recommend(self, user_id, top_n=5, n_neighbors=5, method=None):
+        """
+        Top N recommendations of one user, coalesced and micro-batched with the other
+        requests in flight.
+
+        Raises:
+            KeyError: The user is not part of the matrix and there are no cold-start artifacts.
+            ValueError: The method is unknown or its artifacts are missing.
+        """
+        self.stats['requests'] += 1
+        method = self.recommender._check_method(method)
+        if user_id not in self.recommender.user_index and self.recommender.cold_start is None:
+            raise KeyError(f"User {user_id} not found in the dataset")
+
+        key = (user_id, top_n, n_neighbors, method)
+        future = self._pending.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = future
+            self._queue.put_nowait(key)
+
+        # Shielded, so a client that disconnects does not cancel the other waiters
+        return [dict(book) for book in await asyncio.shield(future)]
+
+    async def _batch_loop(self):
+        """
+        Gathers the queued requests into batches, at most score_threads of them being
+        scored at any time.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+
+            # Requests queued while the scorers were busy join right away, then the batch
+            # waits batch_wait for a burst to complete
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.max_batch:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self._queue.get_nowait())
+
+            task = asyncio.create_task(self._score_batch(batch))
+            task.add_done_callback(lambda _: self._slots.release())
+
+    async def _score_batch(self, keys):
+        """
+        Scores a batch in the thread pool, one get_top_recommendations_many call per set
+        of parameters, and resolves the pending futures.
+        """
+        loop = asyncio.get_running_loop()
+        groups = {}
+        for key in keys:
+            groups.setdefault(key[1:], []).append(key[0])
+
+        self.stats['batches'] += 1
+        self.stats['scored'] += len(keys)
+        for (top_n, n_neighbors, method), user_ids in groups.items():
+            try:
+                results = await loop.run_in_executor(self.executor, self.recommender.get_top_recommendations_many,
+                                                      user_ids, top_n, n_neighbors, method)
+                error = None
+            except Exception as e:
+                results, error = {}, e
+
+            for user_id in user_ids:
+                future = self._pending.pop((user_id, top_n, n_neighbors, method))
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(results[user_id])
+
+    def health(self):
+        """
+        Status of this worker process: artifacts fingerprint and request counters.
+        """
+        batches = max(self.stats['batches'], 1)
+        return dict(self.stats, status='ok', pid=os.getpid(), fingerprint=self.recommender.fingerprint,
+                    mean_batch=self.stats['scored'] / batches)
+
+    async def route(self, method, target):
+        """
+        Answers one request.
+
+        Returns:
+            tuple: (status code, JSON-serializable body)
+        """
+        if method != 'GET':
+            return 405, {'error': f"Method {method} not allowed"}
+
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if url.path == '/health':
+            return 200, self.health()
+        if url.path != '/recommendations':
+            return 404, {'error': f"Unknown path {url.path}"}
+
+        try:
+            user_id = int(query['user_id'])
+            top_n = int(query.get('top_n', 5))
+            n_neighbors = int(query.get('n_neighbors', 5))
+        except (KeyError, ValueError):
+            return 400, {'error': "user_id, top_n and n_neighbors must be integers, user_id is required"}
+
+        try:
+            books = await self.recommend(user_id, top_n, n_neighbors, query.get('method'))
+            return 200, {'user_id': user_id, 'recommendations': books}
+        except KeyError as e:
+            return 404, {'error': e.args[0]}
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            self.stats['errors'] += 1
+            logging.error(f"Error occurred while serving recommendations for {user_id}: {e}")
+            return 500, {'error': "Internal error while generating recommendations"}
+
+    async def handle(self, reader, writer):
+        """
+        Serves the requests of one HTTP/1.1 connection, kept alive until the client
+        closes it or asks to.
+        """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                if len(head) > MAX_HEAD_BYTES:
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ')
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                # Request bodies are not used, but must be consumed to keep the connection in sync
+                length = int(headers.get('content-length', 0) or 0)
+                if length:
+                    await reader.readexactly(length)
+
+                status, body = await self.route(method, target)
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and (version == 'HTTP/1.1' or headers.get('connection', '').lower() == 'keep-alive'))
+
+                payload = json.dumps(body).encode()
+                writer.write((f"HTTP/1.1 {status} {STATUS_REASONS[status]}\r\n"
+                              f"Content-Type: application/json\r\n"
+                              f"Content-Length: {len(payload)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def _serve_forever(sock, service_kwargs):
+    """
+    Runs one service on an already listening socket until the process is stopped.
+    """
+    service = RecommendationService(**service_kwargs)
+    await service.start()
+    server = await asyncio.start_server(service.handle, sock=sock, limit=MAX_HEAD_BYTES)
+    logging.info(f"Recommendation service worker {os.getpid()} serving artifacts {service.recommender.fingerprint[:12]}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def _worker_main(sock, service_kwargs):
+    """
+    Entry point of a service worker process.
+    """
+    try:
+        asyncio.run(_serve_forever(sock, service_kwargs))
+    except KeyboardInterrupt:
+        pass
+
+
+def serve(host='127.0.0.1', port=8000, n_workers=1, **service_kwargs):
+    """
+    Serves recommendations over HTTP until interrupted.
+
+    Every one of the n_workers processes runs its own event loop. Where the platform
+    supports SO_REUSEPORT each worker listens on its own socket bound to the same
+    port and the kernel spreads the connections over them; elsewhere they all accept
+    from one shared socket. Each worker loads its own BookRecommendationSystem; the
+    array store artifacts are memory-mapped read-only, so the workers share their
+    pages instead of holding one copy each.
+
+    Args:
+        host (str): Interface to listen on.
+        port (int): Port to listen on, 0 picks a free one.
+        n_workers (int): Number of worker processes, -1 for every core.
+        **service_kwargs: Arguments of RecommendationService.
+    """
+    try:
+        n_workers = (os.cpu_count() or 1) if n_workers == -1 else max(n_workers, 1)
+        reuse_port = n_workers > 1 and hasattr(socket, 'SO_REUSEPORT')
+        sockets = [socket.create_server((host, port), backlog=1024, reuse_port=reuse_port)]
+        host, port = sockets[0].getsockname()[:2]
+        if reuse_port:
+            sockets += [socket.create_server((host, port), backlog=1024, reuse_port=True) for _ in range(n_workers - 1)]
+        logging.info(f"Recommendation service listening on {host}:{port} with {n_workers} worker(s)")
+        print(f"Serving recommendations on http://{host}:{port} with {n_workers} worker(s)", flush=True)
+
+        # Stopping the service with SIGTERM goes through the same path as Ctrl+C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+        if n_workers == 1:
+            _worker_main(sockets[0], service_kwargs)
+            return
+
+        workers = [multiprocessing.Process(target=_worker_main, args=(sockets[worker % len(sockets)], service_kwargs),
+                                           daemon=True)
+                   for worker in range(n_workers)]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+                worker.join()
+        finally:
+            for sock in sockets:
+                sock.close()
+
+    except Exception as e:
+        logging.error("Error occurred while running the recommendation service")
+        raise CustomException(e, sys)
+
+
+async def _load_client(host, port, targets, latencies, errors):
+    """
+    One keep-alive connection sending the targets it takes from the shared iterator.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for target in targets:
+            start = time.perf_counter()
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+            await writer.drain()
+            head = await reader.readuntil(b'\r\n\r\n')
+            status = int(head.split(b' ', 2)[1])
+            length = int(head.lower().split(b'content-length:')[1].split(b'\r\n')[0])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if status >= 500:
+                errors.append(target)
+    finally:
+        writer.close()
+
+
+async def _run_load_test(host, port, targets, concurrency):
+    """
+    Runs concurrency clients until every target was requested.
+    """
+    latencies, errors = [], []
+    iterator = iter(targets)
+    start = time.perf_counter()
+    await asyncio.gather(*(_load_client(host, port, iterator, latencies, errors) for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, len(errors)
+
+
+def request_json(host, port, target):
+    """
+    Sends one GET request to the service and decodes its JSON body.
+
+    Returns:
+        tuple: (status code, body)
+    """
+    async def fetch():
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b'\r\n\r\n')
+        return int(head.split(b' ', 2)[1]), json.loads(body)
+
+    return asyncio.run(fetch())
+
+
+def load_test(host, port, user_ids, n_requests=2000, concurrency=32, top_n=5, method=None, skew=1.1, seed=42):
+    """
+    Sends n_requests recommendation requests over concurrency keep-alive connections
+    and measures the throughput and latency percentiles.
+
+    Users are drawn from user_ids with a Zipf-like popularity of exponent skew, so
+    popular users are requested concurrently like on a real site (0 draws uniformly).
+
+    Returns:
+        dict: requests, errors (5xx responses), seconds, qps and the p50, p95, p99 and
+        max latencies in milliseconds.
+    """
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(user_ids) + 1) ** skew
+    ranks = rng.choice(len(user_ids), n_requests, p=weights / weights.sum())
+    users = np.asarray(user_ids)[rng.permutation(len(user_ids))[ranks]]
+
+    suffix = f"&top_n={top_n}" + (f"&method={method}" if method else '')
+    targets = [f"/recommendations?user_id={user_id}{suffix}" for user_id in users]
+    seconds, latencies, errors = asyncio.run(_run_load_test(host, port, targets, concurrency))
+
+    latencies_ms = 1000 * np.asarray(latencies)
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': seconds,
+        'qps': len(latencies) / seconds,
+        'p50': p50,
+        'p95': p95,
+        'p99': p99,
+        'max': latencies_ms.max(),
+    }
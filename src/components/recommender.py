@@ -1,8 +1,44 @@
 import sys
+import time
+import threading
 import numpy as np
+from collections import OrderedDict
+from scipy.sparse import csr_matrix
 from src.logger import logging
 from src.exception import CustomException
-from src.utils import load_object
+from src.utils import load_object, artifact_exists, is_array_store, artifacts_fingerprint, read_manifest
+from concurrent.futures import ProcessPoolExecutor
+from src.components.scoring import (top_k_rows, PRECOMPUTED_SOURCES, _init_worker, _score_block,
+                                    _score_block_in_worker)
+from src.components.catalog import build_book_catalog, catalog_rows
+from src.components.ratings import table_book_catalog
+from src.components.incremental import id_positions
+from src.components.coldstart import cold_start_books, clean_countries, gather_rows
+
+# Artifacts the recommender serves from, used to detect changes on disk
+ARTIFACT_PATHS = (
+    'artifacts/book_catalog',
+    'artifacts/final_filtered_data',
+    'artifacts/user_item_matrix',
+    'artifacts/user_neighbours',
+    'artifacts/user_similarity_matrix.pkl',
+    'artifacts/svd_factors',
+    'artifacts/item_neighbours',
+    'artifacts/user_recommendations',
+    'artifacts/cold_start',
+    'artifacts/als_factors',
+)
+
+# Scoring methods served by the recommender
+METHODS = ('cosine', 'svd', 'hybrid', 'als')
+
+# Neighbours kept per user when they are selected from a legacy dense similarity matrix
+LEGACY_NEIGHBOURS = 50
+
+# Batches with fewer users are scored in the calling process even when n_jobs is given:
+# starting the worker pool and loading the artifacts in its workers takes about 40-80 ms,
+# as long as scoring 1,000-2,000 users in process (~0.1 ms per user, batch benchmark)
+PARALLEL_MIN_USERS = 4096
 
 class BookRecommendationSystem:
     """
@@ -10,89 +46,494 @@ class BookRecommendationSystem:
     computes similarity scores, and provides top book recommendations.
     """
     
-    def __init__(self):
+    def __init__(self, cache_size=1024, method='cosine', precomputed=True):
         """
         Initializes the recommendation system by loading necessary data and computing similarity scores.
+
+        Args:
+            cache_size (int): Number of per-user results kept in the LRU cache, 0 disables it.
+            method (str): Default scoring method, 'cosine' (similar users), 'svd' (matrix
+                factorization, needs the svd_factors artifact), 'hybrid' (SVD picks
+                expanded with their most similar books, also needs item_neighbours) or
+                'als' (implicit-feedback factorization, needs the als_factors artifact).
+            precomputed (bool): Answer known users from the precomputed recommendation
+                table (artifacts/user_recommendations) when it is up to date, scoring
+                only the missing and stale users live.
         """
         logging.info("Book Recommendation System Initialization Started")
         
         try:
-            self.final_filtered_data = load_object('artifacts/final_filtered_data.pkl')
-            #self.book_pivot = load_object('artifacts/book_pivot.pkl')
-            #self.knn_model = load_object('artifacts/knn_model.pkl')
-            #self.svd_model = load_object('artifacts/svd_model.pkl')
-            self.user_item_matrix = load_object('artifacts/user_item_matrix.pkl')
-            self.user_similarity_matrix = load_object('artifacts/user_similarity_matrix.pkl')
-
-            '''
-            # Precompute nearest neighbors
-            self.knn_neighbors = {}
-            for idx in range(len(self.book_pivot)):
-                distances, indices = self.knn_model.kneighbors([self.book_pivot.iloc[idx].values], n_neighbors=6)
-                self.knn_neighbors[self.book_pivot.index[idx]] = self.book_pivot.iloc[indices.flatten()[1:]].index.tolist()
-            '''
-            logging.info("Book Recommendation System Initialized Successfully")
+            start = time.perf_counter()
+            self.fingerprint = artifacts_fingerprint(ARTIFACT_PATHS)
+
+            # Bounded LRU of recent results, shared by every caller of this instance
+            self.cache_size = cache_size
+            self._result_cache = OrderedDict()
+            self._cache_lock = threading.Lock()
+
+            if artifact_exists('artifacts/book_catalog'):
+                self.book_catalog = load_object('artifacts/book_catalog')
+            else:
+                # Older artifact sets have no catalog, build it once from the filtered ratings
+                logging.info("Book catalog not found, building it from the filtered data")
+                final_filtered_data = load_object('artifacts/final_filtered_data')
+                if isinstance(final_filtered_data, dict):
+                    self.book_catalog = table_book_catalog(final_filtered_data)
+                else:
+                    # Legacy pickled DataFrame
+                    self.book_catalog = build_book_catalog(final_filtered_data)
+            # Factors of the trained SVD model, aligned with the user-item matrix
+            self.svd_factors = load_object('artifacts/svd_factors') if artifact_exists('artifacts/svd_factors') else None
+
+            # Factors of the implicit-feedback ALS model, aligned with the user-item matrix
+            self.als_factors = load_object('artifacts/als_factors') if artifact_exists('artifacts/als_factors') else None
+
+            # Top-k most similar books of every book, replaces the knn model and book pivot
+            self.item_neighbours = (load_object('artifacts/item_neighbours')['indices']
+                                    if artifact_exists('artifacts/item_neighbours') else None)
+            self.method = method
+            self._check_method(method)
+            user_item_matrix = load_object('artifacts/user_item_matrix')
+
+            # Integer-indexed views of the artifacts used by the scoring engine
+            logging.info("Building the integer-indexed rating and similarity arrays")
+            if isinstance(user_item_matrix, dict):
+                self.user_ids = user_item_matrix['user_ids']
+                self.book_titles = user_item_matrix['book_titles']
+                self.rating_matrix = user_item_matrix['matrix'].tocsr()
+            else:
+                # Legacy dense pivot table from the notebook
+                self.user_ids = user_item_matrix.index.to_numpy()
+                self.book_titles = user_item_matrix.columns.to_numpy()
+                self.rating_matrix = csr_matrix(user_item_matrix.to_numpy())
+            self.user_index = {user_id: idx for idx, user_id in enumerate(self.user_ids)}
+
+            # Top-k most similar users of every user, nearest first
+            if artifact_exists('artifacts/user_neighbours'):
+                user_neighbours = load_object('artifacts/user_neighbours')
+                self.neighbour_indices = user_neighbours['indices']
+                self.neighbour_scores = user_neighbours['scores']
+            else:
+                # Older artifact sets only have the dense similarity matrix from the notebook
+                logging.info("User neighbours not found, selecting them from the user similarity matrix")
+                user_similarity = load_object('artifacts/user_similarity_matrix.pkl')
+                user_similarity = user_similarity.reindex(index=self.user_ids, columns=self.user_ids).to_numpy()
+                self.neighbour_indices = top_k_rows(user_similarity, LEGACY_NEIGHBOURS, exclude=np.arange(len(self.user_ids)))
+                self.neighbour_scores = np.take_along_axis(user_similarity, np.maximum(self.neighbour_indices, 0), axis=1)
+            self.book_rows = catalog_rows(self.book_catalog, self.book_titles)
+
+            # Segment rankings and neighbour search for the users outside the matrix
+            self.cold_start = load_object('artifacts/cold_start') if artifact_exists('artifacts/cold_start') else None
+            if self.cold_start is not None:
+                self.cold_countries = {country: idx for idx, country in enumerate(self.cold_start['countries'])}
+
+            # Precomputed top N of every user, memory-mapped
+            self.precomputed = None
+            if precomputed and artifact_exists('artifacts/user_recommendations'):
+                self.precomputed = self._load_precomputed('artifacts/user_recommendations')
+
+            # Worker processes reopen memory-mapped artifacts instead of receiving copies
+            self.worker_artifacts = (
+                'artifacts/user_item_matrix' if is_array_store('artifacts/user_item_matrix') else self.rating_matrix,
+                'artifacts/user_neighbours' if is_array_store('artifacts/user_neighbours') else self.neighbour_indices,
+                'artifacts/svd_factors' if is_array_store('artifacts/svd_factors') else self.svd_factors,
+                'artifacts/item_neighbours' if is_array_store('artifacts/item_neighbours') else self.item_neighbours,
+                'artifacts/als_factors' if is_array_store('artifacts/als_factors') else self.als_factors,
+            )
+
+            logging.info(f"Book Recommendation System Initialized Successfully in {1000 * (time.perf_counter() - start):.1f} ms")
 
         except Exception as e:
             logging.error("Error occurred during initialization")
             raise CustomException(e, sys)
     
-    def get_top_recommendations(self, user_id, top_n=5):
+    def get_top_recommendations(self, user_id, top_n=5, n_neighbors=5, method=None):
         """
-        Retrieves the top N book recommendations based on SVD and KNN similarity.
+        Retrieves the top N book recommendations based on the ratings of the most similar
+        users, or on the ratings estimated by the SVD model. Users outside the filtered
+        matrix get the cold-start recommendations when the cold_start artifact exists
+        (see cold_start_recommendations), whatever the method.
+
+        Args:
+            user_id (int): The user to recommend books for.
+            top_n (int): Number of books to return.
+            n_neighbors (int): Number of similar users whose ratings are aggregated, capped
+                at the number of neighbours stored per user.
+            method (str, optional): 'cosine', 'svd', 'hybrid' or 'als', the instance default when None.
+
+        Returns:
+            list: One dictionary with Title, Author and Image URL per recommended book.
         """
         try:
             logging.info(f"Fetching top {top_n} recommendations for: {user_id}")
+
+            method = self._check_method(method)
+            cache_key = (user_id, top_n, n_neighbors, method)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return cached
             
-            # ----------------
-            # Hybrid Method
-            # ----------------
-            '''
-            # Step 1: Get SVD-based Recommendations
-            all_books = set(self.final_filtered_data['ISBN'].unique())
-            user_rated_books = set(self.final_filtered_data[self.final_filtered_data['User-ID'] == user_id]['ISBN'].values)
-            books_to_predict = list(all_books - user_rated_books)
-
-            # Batch prediction for efficiency
-            predictions = self.svd_model.test([(user_id, book, 0) for book in books_to_predict])
-            predictions = sorted(predictions, key=lambda x: x.est, reverse=True)[:top_n]
-            svd_books = [pred.iid for pred in predictions]
-
-            # Step 2: Get KNN-based Recommendations (precomputed)
-            final_recommendations = set(svd_books)
-            for book in svd_books:
-                final_recommendations.update(self.knn_neighbors.get(book, []))
-
-            top_recommendations = list(final_recommendations)[:top_n]
-            '''
-            
-            # -------------------------
-            # Cosine Similarity Method
-            # -------------------------
-            
-            similar_users_cs  = self.user_similarity_matrix[user_id].sort_values(ascending=False)[1:6].index
-            books_rated_by_user = set(self.user_item_matrix.columns[self.user_item_matrix.loc[user_id] > 0])
-            
-            recommended_books = {}
-
-            for sim_user in similar_users_cs:
-                sim_user_books = self.user_item_matrix.loc[sim_user]
-                for book, rating in sim_user_books.items():
-                    if book not in books_rated_by_user and rating > 0:
-                        recommended_books[book] = recommended_books.get(book, 0) + rating
-            recommended_books = sorted(recommended_books.items(), key=lambda x: x[1], reverse=True)[:5]
-            
-            result = []
-            for book_data in recommended_books:
-                book_info = self.final_filtered_data[self.final_filtered_data['Book-Title'] == book_data[0]].iloc[0]
-                result.append({
-                    "Title": book_info["Book-Title"],
-                    "Author": book_info["Book-Author"],
-                    "Image URL": book_info["Image-URL-M"]
-                })
+            # Users outside the filtered matrix get the cold-start recommendations
+            if user_id not in self.user_index and self.cold_start is not None:
+                result = self.book_details(self._cold_start_books(user_id, top_n, n_neighbors))
+                self._cache_put(cache_key, result)
+                return [dict(book) for book in result]
+
+            # ---------------------------------------
+            # Cosine Similarity, SVD or Hybrid Method
+            # ---------------------------------------
             
-            return result
+            user_idx = self.user_index[user_id]
+
+            # Cosine: nearest users (excluding the user itself), then a sparse sum of their
+            # ratings. SVD: estimated ratings from one product of the factor matrices.
+            # Hybrid: SVD picks interleaved with their precomputed nearest books.
+            # Either way the user's own books are masked out.
+            # Known users with an up-to-date precomputed list are answered with a slice of it.
+            [(recommended_books, _)] = self._score_users([user_idx], top_n, n_neighbors, method)
+
+            result = self.book_details(recommended_books)
+            self._cache_put(cache_key, result)
+
+            return [dict(book) for book in result]
         
         except Exception as e:
             logging.error("Error occurred while generating recommendations")
             raise CustomException(e, sys)
+
+    def book_details(self, book_indices):
+        """
+        Looks up the display details of books in the catalog.
+
+        Args:
+            book_indices (array-like): Column indices of the books in the rating matrix.
+
+        Returns:
+            list: One dictionary with Title, Author and Image URL per book.
+        """
+        result = []
+        for row in self.book_rows[book_indices]:
+            result.append({
+                "Title": self.book_catalog['titles'][row],
+                "Author": self.book_catalog['authors'][row],
+                "Image URL": self.book_catalog['image_urls'][row]
+            })
+
+        return result
+
+    def get_top_recommendations_batch(self, user_ids, top_n=5, n_neighbors=5, block_size=256, n_jobs=None, method=None,
+                                      parallel_min_users=PARALLEL_MIN_USERS):
+        """
+        Retrieves the top N book recommendations for many users at once.
+
+        Users are scored in blocks: the neighbour sets of a whole block are gathered
+        together and all of their candidate scores come from one sparse matrix product
+        over the rating matrix. Results are yielded block by block, so memory stays
+        bounded by block_size no matter how many users are requested. The results are
+        identical to calling get_top_recommendations for each user.
+
+        Args:
+            user_ids (iterable): Users to recommend books for.
+            top_n (int): Number of books to return per user.
+            n_neighbors (int): Number of similar users aggregated per user.
+            block_size (int): Number of users scored together.
+            n_jobs (int, optional): Number of worker processes, blocks are scored in
+                the calling process when None or 1.
+            method (str, optional): 'cosine', 'svd', 'hybrid' or 'als', the instance default when None.
+            parallel_min_users (int): Smallest batch sent to the worker processes,
+                smaller ones do not pay for starting them (see PARALLEL_MIN_USERS).
+
+        Yields:
+            dict: user_id -> list of recommended books, one dictionary per block.
+        """
+        try:
+            method = self._check_method(method)
+            user_ids = list(user_ids)
+            logging.info(f"Fetching top {top_n} recommendations for {len(user_ids)} users in blocks of {block_size}")
+
+            # Users outside the filtered matrix come first, from the cold-start arrays
+            if self.cold_start is not None:
+                cold = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in self.user_index]
+                if cold:
+                    yield {user_id: self.book_details(self._cold_start_books(user_id, top_n, n_neighbors))
+                           for user_id in cold}
+                    user_ids = [user_id for user_id in user_ids if user_id in self.user_index]
+
+            user_indices = np.array([self.user_index[user_id] for user_id in user_ids], dtype=np.int64)
+            blocks = [(user_ids[start:start + block_size], user_indices[start:start + block_size])
+                      for start in range(0, len(user_ids), block_size)]
+
+            if n_jobs is None or n_jobs <= 1 or len(user_ids) < parallel_min_users:
+                for block_user_ids, block_indices in blocks:
+                    scored = self._score_users(block_indices, top_n, n_neighbors, method)
+                    yield self._block_details(block_user_ids, scored)
+                return
+
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                     initargs=self.worker_artifacts) as executor:
+                # Only the users missing from the precomputed table are sent to the workers.
+                # Keep at most two blocks per worker in flight so results stay bounded
+                pending = []
+                for block_user_ids, block_indices in blocks:
+                    scored = self._lookup_precomputed(block_indices, top_n, n_neighbors, method)
+                    live = [position for position, result in enumerate(scored) if result is None]
+                    future = (executor.submit(_score_block_in_worker, block_indices[live], top_n, n_neighbors, method)
+                              if live else None)
+                    pending.append((block_user_ids, scored, live, future))
+                    if len(pending) >= 2 * n_jobs:
+                        yield self._merged_details(*pending.pop(0))
+
+                for block in pending:
+                    yield self._merged_details(*block)
+
+        except Exception as e:
+            logging.error("Error occurred while generating batch recommendations")
+            raise CustomException(e, sys)
+
+    def get_top_recommendations_many(self, user_ids, top_n=5, n_neighbors=5, method=None):
+        """
+        Retrieves the top N book recommendations for a burst of users, as gathered by the
+        recommendation service. Users in the LRU cache are answered from it, the others
+        are scored together in one block and cached.
+
+        Args:
+            user_ids (iterable): Users to recommend books for, duplicates are scored once.
+            top_n (int): Number of books to return per user.
+            n_neighbors (int): Number of similar users aggregated per user.
+            method (str, optional): 'cosine', 'svd', 'hybrid' or 'als', the instance default when None.
+
+        Returns:
+            dict: user_id -> list of recommended books.
+        """
+        try:
+            method = self._check_method(method)
+            results, missing = {}, []
+            for user_id in dict.fromkeys(user_ids):
+                cached = self._cache_get((user_id, top_n, n_neighbors, method))
+                if cached is None:
+                    missing.append(user_id)
+                else:
+                    results[user_id] = cached
+
+            if missing:
+                for chunk in self.get_top_recommendations_batch(missing, top_n, n_neighbors, block_size=len(missing),
+                                                                method=method):
+                    for user_id, books in chunk.items():
+                        self._cache_put((user_id, top_n, n_neighbors, method), books)
+                        results[user_id] = [dict(book) for book in books]
+
+            return results
+
+        except Exception as e:
+            logging.error("Error occurred while generating recommendations for a burst of users")
+            raise CustomException(e, sys)
+
+    def cold_start_recommendations(self, user_id=None, top_n=5, n_neighbors=5, country=None, age=None, ratings=None):
+        """
+        Retrieves the top N book recommendations of a user outside the filtered matrix.
+
+        Users with explicit ratings of matrix books are matched with their most similar
+        matrix users, whose ratings are aggregated like for the cosine method. The
+        remaining places go to the best rated books of the user's country and age band,
+        or of every reader when they are unknown.
+
+        Args:
+            user_id (int, optional): A user of the cleaned data, whose country, age and
+                ratings are looked up.
+            top_n (int): Number of books to return.
+            n_neighbors (int): Number of similar users aggregated, 0 only ranks by segment.
+            country (str, optional): Country of the user, overrides the stored one.
+            age (float, optional): Age of the user, overrides the stored one.
+            ratings (dict, optional): Book title -> rating, overrides the stored ratings.
+
+        Returns:
+            list: One dictionary with Title, Author and Image URL per recommended book.
+        """
+        try:
+            if self.cold_start is None:
+                raise ValueError("Cold-start recommendations need the artifacts/cold_start artifact, run the artifacts pipeline")
+
+            books = self._cold_start_books(user_id, top_n, n_neighbors, country, age, ratings)
+            return self.book_details(books)
+
+        except Exception as e:
+            logging.error("Error occurred while generating cold-start recommendations")
+            raise CustomException(e, sys)
+
+    def _cold_start_books(self, user_id, top_n, n_neighbors, country=None, age=None, ratings=None):
+        """
+        Book indices of the cold-start recommendations, see cold_start_recommendations.
+        """
+        cold_start = self.cold_start
+        row = None
+        if user_id is not None:
+            position = np.searchsorted(cold_start['user_ids'], user_id)
+            if position < len(cold_start['user_ids']) and cold_start['user_ids'][position] == user_id:
+                row = position
+
+        # Ratings on matrix books, given by title or stored for the user
+        book_indices, values = np.empty(0, dtype=np.int64), np.empty(0)
+        if ratings is not None:
+            titles = np.asarray(list(ratings), dtype=object).astype(str)
+            columns = id_positions(titles, np.asarray(self.book_titles).astype(str)) if len(titles) else np.empty(0, dtype=np.int64)
+            book_indices = columns[columns >= 0]
+            values = np.asarray(list(ratings.values()), dtype=np.float64)[columns >= 0]
+        elif row is not None:
+            _, book_indices, values = gather_rows(cold_start['user_ratings'], [row])
+
+        # Country segment and age, given or stored for the user
+        if country is not None:
+            segment = self.cold_countries.get(clean_countries([country])[0], len(self.cold_countries))
+        elif row is not None:
+            segment = cold_start['country_segments'][cold_start['user_countries'][row]]
+        else:
+            segment = None
+        if age is None and row is not None and not np.isnan(cold_start['user_ages'][row]):
+            age = float(cold_start['user_ages'][row])
+
+        return cold_start_books(cold_start, self.rating_matrix, top_n=top_n, n_neighbors=n_neighbors, country=segment,
+                                age=age, book_indices=book_indices, ratings=values)
+
+    def _block_details(self, user_ids, scored):
+        """
+        Converts the scored book indices of a block into display details per user.
+        """
+        return {user_id: self.book_details(books) for user_id, (books, _) in zip(user_ids, scored)}
+
+    def _merged_details(self, user_ids, scored, live, future):
+        """
+        Block details once the live part of a block scored in a worker is back.
+        """
+        if future is not None:
+            for position, result in zip(live, future.result()):
+                scored[position] = result
+
+        return self._block_details(user_ids, scored)
+
+    def _load_precomputed(self, path):
+        """
+        Opens the precomputed recommendation table and maps the users of this instance
+        to its rows. Methods whose source artifacts changed since the table was built
+        are not served from it; users it does not know or marks as stale get row -1.
+        """
+        metadata = read_manifest(path)['metadata']
+        table = load_object(path)
+
+        methods = [method for method in metadata['methods']
+                   if metadata['sources'].get(method) == artifacts_fingerprint(PRECOMPUTED_SOURCES[method])]
+        for method in sorted(set(metadata['methods']) - set(methods)):
+            logging.info(f"Precomputed {method} recommendations are older than their artifacts, scoring them live")
+
+        rows = id_positions(self.user_ids, table['user_ids'])
+        rows[(rows >= 0) & np.asarray(table['stale'])[np.maximum(rows, 0)]] = -1
+        logging.info(f"Precomputed top {metadata['top_n']} recommendations for methods {methods}, "
+                     f"{(rows >= 0).sum()} of {len(rows)} users served from the table")
+
+        return {'table': table, 'rows': rows, 'methods': methods, 'top_n': metadata['top_n'],
+                'n_neighbors': metadata['n_neighbors']}
+
+    def _lookup_precomputed(self, user_indices, top_n, n_neighbors, method):
+        """
+        Answers a block of users from the precomputed recommendation table.
+
+        Returns:
+            list: One (book indices, scores) tuple per user, None for the users that
+            must be scored live.
+        """
+        scored = [None] * len(user_indices)
+        precomputed = self.precomputed
+        if (precomputed is None or method not in precomputed['methods'] or top_n > precomputed['top_n']
+                or (method == 'cosine' and n_neighbors != precomputed['n_neighbors'])):
+            return scored
+
+        books, scores = precomputed['table'][f'{method}_books'], precomputed['table'][f'{method}_scores']
+        for position, row in enumerate(precomputed['rows'][np.asarray(user_indices)]):
+            if row >= 0:
+                row_books = books[row, :top_n]
+                row_books = row_books[row_books >= 0]
+                scored[position] = (row_books, scores[row, :len(row_books)])
+
+        return scored
+
+    def _score_users(self, user_indices, top_n, n_neighbors, method):
+        """
+        Top N books of a block of users, from the precomputed table where possible and
+        scored live for the others.
+
+        Returns:
+            list: One (book indices, scores) tuple per user.
+        """
+        scored = self._lookup_precomputed(user_indices, top_n, n_neighbors, method)
+        live = [position for position, result in enumerate(scored) if result is None]
+        if live:
+            live_scored = _score_block(self._artifacts(), np.asarray(user_indices)[live], top_n, n_neighbors, method)
+            for position, result in zip(live, live_scored):
+                scored[position] = result
+
+        return scored
+
+    def _artifacts(self):
+        """
+        Scoring artifacts of this instance, in the layout used by the worker processes.
+        """
+        return {
+            'rating_matrix': self.rating_matrix,
+            'neighbour_indices': self.neighbour_indices,
+            'svd_factors': self.svd_factors,
+            'item_neighbours': self.item_neighbours,
+            'als_factors': self.als_factors,
+        }
+
+    def _check_method(self, method):
+        """
+        Resolves the scoring method of a call and checks that its artifacts are loaded.
+        """
+        method = method or self.method
+        if method not in METHODS:
+            raise ValueError(f"Unknown recommendation method {method!r}, expected one of {METHODS}")
+        if method in ('svd', 'hybrid') and self.svd_factors is None:
+            raise ValueError(f"The {method} method needs the artifacts/svd_factors artifact, run the artifacts pipeline")
+        if method == 'hybrid' and self.item_neighbours is None:
+            raise ValueError("The hybrid method needs the artifacts/item_neighbours artifact, run the artifacts pipeline")
+        if method == 'als' and self.als_factors is None:
+            raise ValueError("The als method needs the artifacts/als_factors artifact, run the artifacts pipeline")
+
+        return method
+
+    def artifacts_changed(self):
+        """
+        Checks whether the artifacts on disk differ from the ones this instance loaded.
+        """
+        return artifacts_fingerprint(ARTIFACT_PATHS) != self.fingerprint
+
+    def clear_cache(self):
+        """
+        Drops every cached result.
+        """
+        with self._cache_lock:
+            self._result_cache.clear()
+
+    def _cache_get(self, key):
+        """
+        Returns a copy of a cached result and marks it as most recently used.
+        """
+        with self._cache_lock:
+            result = self._result_cache.get(key)
+            if result is None:
+                return None
+            self._result_cache.move_to_end(key)
+
+        return [dict(book) for book in result]
+
+    def _cache_put(self, key, result):
+        """
+        Stores a result, evicting the least recently used entries beyond cache_size.
+        """
+        if self.cache_size <= 0:
+            return
+
+        with self._cache_lock:
+            self._result_cache[key] = result
+            self._result_cache.move_to_end(key)
+            while len(self._result_cache) > self.cache_size:
+                self._result_cache.popitem(last=False)
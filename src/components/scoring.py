@@ -0,0 +1,293 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from concurrent.futures import ProcessPoolExecutor
+from src.utils import load_object
+
+# Methods the precomputed recommendation table can answer: their top N lists are
+# prefixes of longer ones, the hybrid interleaving is not
+PRECOMPUTED_METHODS = ('cosine', 'svd', 'als')
+
+# Artifacts every precomputed method is scored from, the table is stale once they change
+PRECOMPUTED_SOURCES = {
+    'cosine': ('artifacts/user_item_matrix', 'artifacts/user_neighbours'),
+    'svd': ('artifacts/user_item_matrix', 'artifacts/svd_factors'),
+    'als': ('artifacts/user_item_matrix', 'artifacts/als_factors'),
+}
+
+
+def top_k_indices(values, k, exclude=None):
+    """
+    Returns the indices of the k largest entries of a 1-D array, highest first.
+
+    Selection uses np.argpartition, so only the short list of candidates that can
+    reach the top k is ever sorted. Ties are broken by the lower index, which keeps
+    the ordering deterministic.
+
+    Args:
+        values (np.ndarray): 1-D array of scores.
+        k (int): Number of indices to return.
+        exclude (int or array-like, optional): Indices that must never be returned.
+
+    Returns:
+        np.ndarray: Up to k indices ordered by descending value.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if exclude is not None:
+        values = values.copy()
+        values[exclude] = -np.inf
+
+    k = min(k, np.count_nonzero(values > -np.inf))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Everything tied with the k-th largest value is a candidate, so the
+    # tie-breaking below is exact and does not depend on argpartition's choice
+    kth_value = values[np.argpartition(-values, k - 1)[k - 1]]
+    candidates = np.flatnonzero(values >= kth_value)
+    order = np.lexsort((candidates, -values[candidates]))
+
+    return candidates[order][:k]
+
+
+def rank_books(scores, first_seen, top_n):
+    """
+    Picks the top N books from an aggregated score vector.
+
+    Only books with a positive score are eligible. Books with equal scores keep the
+    order in which they were first contributed by a neighbour (nearest neighbour
+    first, then column order), which is the order the original dictionary-based
+    loop produced.
+
+    Args:
+        scores (np.ndarray): Aggregated rating per book, 0 for books to skip.
+        first_seen (np.ndarray): Rank of the first neighbour that rated each book.
+        top_n (int): Number of books to return.
+
+    Returns:
+        np.ndarray: Up to top_n book indices ordered by descending score.
+    """
+    candidates = np.flatnonzero(scores > 0)
+
+    if len(candidates) > top_n > 0:
+        kth_value = scores[candidates[np.argpartition(-scores[candidates], top_n - 1)[top_n - 1]]]
+        candidates = candidates[scores[candidates] >= kth_value]
+
+    order = np.lexsort((candidates, first_seen[candidates], -scores[candidates]))
+
+    return candidates[order][:top_n]
+
+
+def top_k_rows(values, k, exclude=None):
+    """
+    Row-wise version of top_k_indices for a 2-D block of scores.
+
+    Args:
+        values (np.ndarray): 2-D array of scores, one row per query.
+        k (int): Number of indices to return per row.
+        exclude (np.ndarray, optional): One column per row that must never be returned.
+
+    Returns:
+        np.ndarray: (n_rows, k) array of column indices ordered by descending value,
+        padded with -1 where a row has fewer than k eligible columns.
+    """
+    values = np.array(values, dtype=np.float64)
+    n_rows = values.shape[0]
+    if exclude is not None:
+        values[np.arange(n_rows), exclude] = -np.inf
+
+    k = min(k, values.shape[1])
+    result = np.full((n_rows, k), -1, dtype=np.int64)
+    if k <= 0 or n_rows == 0:
+        return result
+
+    kth_values = -np.partition(-values, k - 1, axis=1)[:, k - 1]
+    rows, cols = np.nonzero((values >= kth_values[:, None]) & (values > -np.inf))
+
+    # Sort candidates by row, then by descending value, then by column
+    order = np.lexsort((cols, -values[rows, cols], rows))
+    rows, cols = rows[order], cols[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = rank < k
+    result[rows[keep], rank[keep]] = cols[keep]
+
+    return result
+
+
+def score_neighbours(rating_matrix, user_indices, neighbours, top_n):
+    """
+    Scores the books rated by the neighbours of a block of users and returns the top N
+    per user.
+
+    The ratings of every user's neighbours are summed with one sparse matrix product
+    over the rating matrix, books already rated by the user are masked out, and the
+    best remaining books are selected with np.argpartition.
+
+    Args:
+        rating_matrix (scipy.sparse.csr_matrix): User x book rating matrix.
+        user_indices (np.ndarray): Row indices of the users being scored.
+        neighbours (np.ndarray): (n_users, k) neighbour rows, nearest first, -1 for none.
+        top_n (int): Number of books to return per user.
+
+    Returns:
+        list: One (book indices, scores) tuple per user, ordered by descending score.
+    """
+    n_users, n_neighbours = neighbours.shape
+    n_books = rating_matrix.shape[1]
+    valid = neighbours >= 0
+
+    # Neighbour selector, one row per user with a 1 for each of its neighbours
+    selector = csr_matrix(
+        (np.ones(valid.sum()), neighbours[valid], np.concatenate(([0], np.cumsum(valid.sum(axis=1))))),
+        shape=(n_users, rating_matrix.shape[0])
+    )
+    scores = (selector @ rating_matrix).toarray()
+
+    rated = rating_matrix[user_indices]
+    rated_rows, rated_cols = rated.nonzero()
+    scores[rated_rows, rated_cols] = 0
+
+    # Rank of the nearest neighbour that rated each book, used to break ties
+    first_seen = np.full((n_users, n_books), n_neighbours, dtype=np.int32)
+    owner, rank = np.nonzero(valid)
+    rows, cols = rating_matrix[neighbours[valid]].nonzero()
+    np.minimum.at(first_seen, (owner[rows], cols), rank[rows].astype(np.int32))
+
+    result = []
+    for row in range(n_users):
+        books = rank_books(scores[row], first_seen[row], top_n)
+        result.append((books, scores[row, books]))
+
+    return result
+
+
+def recommend_block(rating_matrix, neighbour_indices, user_indices, top_n, n_neighbors):
+    """
+    Runs scoring for a block of users from the precomputed neighbour table.
+
+    Args:
+        rating_matrix (scipy.sparse.csr_matrix): User x book rating matrix.
+        neighbour_indices (np.ndarray): (n_users, k) nearest users of every user, nearest first.
+        user_indices (np.ndarray): Row indices of the users being scored.
+        top_n (int): Number of books to return per user.
+        n_neighbors (int): Number of similar users aggregated per user, at most k.
+
+    Returns:
+        list: One (book indices, scores) tuple per user.
+    """
+    user_indices = np.asarray(user_indices, dtype=np.int64)
+    neighbours = neighbour_indices[user_indices, :n_neighbors].astype(np.int64)
+
+    return score_neighbours(rating_matrix, user_indices, neighbours, top_n)
+
+
+# Artifacts shared with the worker processes of precompute_recommendations and
+# BookRecommendationSystem.get_top_recommendations_batch
+_worker_state = {}
+
+
+def _open_artifacts(rating_matrix, neighbour_indices, svd_factors=None, item_neighbours=None, als_factors=None):
+    """
+    Scoring artifacts in the layout of _score_block. Artifacts passed as array store
+    paths are memory-mapped, so all processes share the same pages.
+    """
+    if isinstance(rating_matrix, str):
+        rating_matrix = load_object(rating_matrix)['matrix']
+    if isinstance(neighbour_indices, str):
+        neighbour_indices = load_object(neighbour_indices)['indices']
+    if isinstance(svd_factors, str):
+        svd_factors = load_object(svd_factors)
+    if isinstance(item_neighbours, str):
+        item_neighbours = load_object(item_neighbours)['indices']
+    if isinstance(als_factors, str):
+        als_factors = load_object(als_factors)
+
+    return {
+        'rating_matrix': rating_matrix,
+        'neighbour_indices': neighbour_indices,
+        'svd_factors': svd_factors,
+        'item_neighbours': item_neighbours,
+        'als_factors': als_factors,
+    }
+
+
+def _init_worker(*worker_artifacts):
+    """
+    Stores the scoring artifacts once per worker process.
+    """
+    _worker_state.update(_open_artifacts(*worker_artifacts))
+
+
+def _score_block(state, user_indices, top_n, n_neighbors, method):
+    """
+    Scores one block of users with the given method from a set of artifacts.
+    """
+    # The factor models build on the selection helpers of this module, so they are
+    # imported on first use rather than at import time
+    from src.components.factors import svd_recommend_block, hybrid_recommend_block
+    from src.components.als import als_recommend_block
+
+    if method == 'svd':
+        return svd_recommend_block(state['svd_factors'], user_indices, top_n)
+    if method == 'hybrid':
+        return hybrid_recommend_block(state['svd_factors'], state['item_neighbours'], user_indices, top_n)
+    if method == 'als':
+        return als_recommend_block(state['als_factors'], user_indices, top_n)
+
+    return recommend_block(state['rating_matrix'], state['neighbour_indices'], user_indices, top_n, n_neighbors)
+
+
+def _score_block_in_worker(user_indices, top_n, n_neighbors, method='cosine'):
+    """
+    Scores one block of users inside a worker process.
+    """
+    return _score_block(_worker_state, user_indices, top_n, n_neighbors, method)
+
+
+def precompute_recommendations(worker_artifacts, n_users, top_n=20, n_neighbors=5, methods=PRECOMPUTED_METHODS,
+                               block_size=256, n_jobs=1):
+    """
+    Scores the top N books of every user with each method, for the precomputed
+    recommendation table served by BookRecommendationSystem.
+
+    Args:
+        worker_artifacts (tuple): Rating matrix, user neighbours, svd factors, item
+            neighbours and als factors, as objects or array store paths (see _open_artifacts).
+        n_users (int): Number of rows of the rating matrix.
+        top_n (int): Number of books kept per user, answers any top_n up to it.
+        n_neighbors (int): Number of similar users aggregated by the cosine method.
+        methods (tuple): Methods to score, among PRECOMPUTED_METHODS.
+        block_size (int): Number of users scored together.
+        n_jobs (int): Number of worker processes, blocks are scored in the calling
+            process when 1.
+
+    Returns:
+        dict: '<method>_books' (n_users, top_n) int32 book indices padded with -1 and
+        '<method>_scores' (n_users, top_n) float32 scores padded with 0, per method.
+    """
+    table = {}
+    blocks = [np.arange(start, min(start + block_size, n_users)) for start in range(0, n_users, block_size)]
+
+    def fill(method, user_indices, scored):
+        for user_idx, (books, scores) in zip(user_indices, scored):
+            table[f'{method}_books'][user_idx, :len(books)] = books
+            table[f'{method}_scores'][user_idx, :len(books)] = scores
+
+    for method in methods:
+        table[f'{method}_books'] = np.full((n_users, top_n), -1, dtype=np.int32)
+        table[f'{method}_scores'] = np.zeros((n_users, top_n), dtype=np.float32)
+
+    if n_jobs <= 1:
+        state = _open_artifacts(*worker_artifacts)
+        for method in methods:
+            for user_indices in blocks:
+                fill(method, user_indices, _score_block(state, user_indices, top_n, n_neighbors, method))
+        return table
+
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=worker_artifacts) as executor:
+        for method in methods:
+            scored_blocks = executor.map(_score_block_in_worker, blocks, [top_n] * len(blocks),
+                                         [n_neighbors] * len(blocks), [method] * len(blocks))
+            for user_indices, scored in zip(blocks, scored_blocks):
+                fill(method, user_indices, scored)
+
+    return table
@@ -0,0 +1,103 @@
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.preprocessing import normalize
+from sklearn.utils.extmath import safe_sparse_dot
+
+from src.components.scoring import top_k_rows
+
+
+def top_k_cosine(matrix, k, block_size=1024, n_jobs=1):
+    """
+    Computes the k most similar rows of every row of a sparse matrix by cosine similarity.
+
+    Rows are L2-normalized once and the similarity is computed one block of rows at a
+    time, keeping only the top k of each block before moving on. Peak memory is
+    block_size x n_rows per worker instead of n_rows x n_rows.
+
+    Args:
+        matrix (scipy.sparse.csr_matrix): One row per entity (user or book).
+        k (int): Number of neighbours to keep per row, the row itself is excluded.
+        block_size (int): Number of rows whose similarities are computed together.
+        n_jobs (int): Number of blocks computed in parallel threads, -1 for every core.
+            The sparse products and partitions release the GIL.
+
+    Returns:
+        tuple: (indices, scores) arrays of shape (n_rows, k), nearest first. Indices are
+        -1 and scores 0 where a row has fewer than k other rows.
+    """
+    normalized = normalize(matrix.tocsr(), norm='l2', axis=1)
+    normalized_t = normalized.T.tocsr()
+    n_rows = normalized.shape[0]
+    k = min(k, max(n_rows - 1, 0))
+
+    indices = np.full((n_rows, k), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, k), dtype=np.float32)
+
+    def score_block(start):
+        rows = np.arange(start, min(start + block_size, n_rows))
+        block = safe_sparse_dot(normalized[rows], normalized_t, dense_output=True)
+
+        block_indices = top_k_rows(block, k, exclude=rows)
+        valid = block_indices >= 0
+        indices[rows] = block_indices
+        scores[rows] = np.where(valid, np.take_along_axis(block, np.maximum(block_indices, 0), axis=1), 0)
+
+    starts = range(0, n_rows, block_size)
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+
+    if n_jobs <= 1:
+        for start in starts:
+            score_block(start)
+    else:
+        # Every block writes its own rows of the output arrays
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            list(executor.map(score_block, starts))
+
+    return indices, scores
+
+
+def blocked_cosine_similarity(matrix, out=None, dtype=np.float32, block_size=1024, n_jobs=1):
+    """
+    Computes the full cosine similarity matrix between the rows of a sparse matrix, one
+    tile of rows at a time.
+
+    Rows are L2-normalized once, every tile is a sparse product of block_size rows with
+    all the rows computed straight to a dense block (safe_sparse_dot), cast to dtype and
+    written into out. With a memory-mapped out
+    (see create_array) peak memory is block_size x n_rows per worker, never n_rows^2.
+
+    Args:
+        matrix (scipy.sparse.csr_matrix): One row per entity (user or book).
+        out (np.ndarray, optional): (n_rows, n_rows) array to fill, allocated when None.
+        dtype (np.dtype): Type of the similarities when out is None, float64, float32 or float16.
+        block_size (int): Number of rows per tile.
+        n_jobs (int): Number of tiles computed in parallel threads, -1 for every core.
+
+    Returns:
+        np.ndarray: out, the (n_rows, n_rows) similarity matrix.
+    """
+    normalized = normalize(matrix.tocsr(), norm='l2', axis=1)
+    normalized_t = normalized.T.tocsr()
+    n_rows = normalized.shape[0]
+    if out is None:
+        out = np.empty((n_rows, n_rows), dtype=dtype)
+
+    def score_tile(start):
+        stop = min(start + block_size, n_rows)
+        out[start:stop] = safe_sparse_dot(normalized[start:stop], normalized_t, dense_output=True)
+
+    starts = range(0, n_rows, block_size)
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+
+    if n_jobs <= 1:
+        for start in starts:
+            score_tile(start)
+    else:
+        # Every tile writes its own rows of the output
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            list(executor.map(score_tile, starts))
+
+    return out
@@ -0,0 +1,514 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from functools import partial
+from scipy.sparse import csr_matrix
+from sklearn.preprocessing import normalize
+from sklearn.utils.extmath import safe_sparse_dot
+
+from src.logger import logging
+from src.exception import CustomException
+from src.utils import save_arrays
+from src.components.scoring import top_k_rows
+from src.components.ratings import table_rated_matrix
+from src.components.svdtuning import fold_assignment, rated_pattern, ranking_metrics
+from src.components.als import als_scores
+
+
+@dataclass  # Decorator
+class SparkBuilderConfig:
+    """
+    Settings of the Spark (local mode) artifacts builder:
+
+    1. `app_name`: Name of the Spark application.
+    2. `driver_memory`: Memory of the local JVM, which runs the driver and the executors.
+    3. `local_dir`: Scratch directory shuffles and cached partitions spill to.
+    4. `partitions_per_core`: Shuffle partitions per core.
+    """
+
+    app_name = 'book-recommender-artifacts'
+    driver_memory = '4g'
+    local_dir = os.path.join('artifacts', 'spark_tmp')
+    partitions_per_core = 4
+
+
+def spark_session(n_cores=-1, config=None):
+    """
+    Starts (or returns the running) Spark session in local mode over n_cores cores,
+    -1 for every core. pyspark is imported here, only this backend needs it.
+    """
+    from pyspark.sql import SparkSession
+
+    config = config or SparkBuilderConfig()
+    n_cores = (os.cpu_count() or 1) if n_cores == -1 else n_cores
+    os.makedirs(config.local_dir, exist_ok=True)
+    partitions = str(n_cores * config.partitions_per_core)
+
+    spark = (SparkSession.builder.master(f"local[{n_cores}]").appName(config.app_name)
+             .config('spark.driver.memory', config.driver_memory)
+             .config('spark.local.dir', os.path.abspath(config.local_dir))
+             .config('spark.sql.shuffle.partitions', partitions)
+             .config('spark.default.parallelism', partitions)
+             .config('spark.sql.execution.arrow.pyspark.enabled', 'true')
+             .getOrCreate())
+    # ALS checkpoints its factors, so long lineages do not overflow the stack
+    spark.sparkContext.setCheckpointDir(os.path.abspath(os.path.join(config.local_dir, 'checkpoints')))
+
+    return spark
+
+
+def _lookup(spark, frame, column, code_column):
+    """
+    Sorted distinct non-null values of a column, collected like the lookup tables of
+    pd.factorize(sort=True), and the small (value, code) DataFrame joined to code it.
+    """
+    from pyspark.sql import functions as F
+
+    values = frame.select(column).where(F.col(column).isNotNull()).distinct().toPandas()[column].to_numpy()
+    values = np.sort(values.astype(object) if values.dtype == object else values)
+    codes = spark.createDataFrame(pd.DataFrame({column: values, code_column: np.arange(len(values), dtype=np.int32)}))
+
+    return values, codes
+
+
+def _as_missing(values):
+    """
+    Object array with the nulls Spark returns as None turned into NaN, like pandas.
+    """
+    values = np.asarray(values, dtype=object)
+    values[pd.isna(values)] = np.nan
+    return values
+
+
+def spark_encode_ratings(spark, ratings):
+    """
+    encode_ratings (see ratings.py) on a Spark DataFrame of the cleaned ratings.
+
+    The lookup tables are the sorted distinct values, the per-rating codes come from
+    broadcast joins and the rows keep the order of the file (through
+    monotonically_increasing_id), so the arrays are the ones the pandas path encodes.
+    Only the integer columns and the lookup tables are collected to the driver.
+
+    Args:
+        spark (pyspark.sql.SparkSession): Session the ratings belong to.
+        ratings (pyspark.sql.DataFrame): Ratings with a 'row' column in file order.
+
+    Returns:
+        dict: The encoded ratings table.
+    """
+    from pyspark.sql import functions as F
+
+    user_ids, user_lookup = _lookup(spark, ratings, 'User-ID', 'user_code')
+    book_titles, book_lookup = _lookup(spark, ratings, 'Book-Title', 'book_code')
+    isbns, isbn_lookup = _lookup(spark, ratings, 'ISBN', 'isbn_code')
+
+    # Codes of the valid rows, in file order
+    coded = (ratings.where(F.col('User-ID').isNotNull() & F.col('Book-Title').isNotNull()
+                           & F.col('Book-Rating').isNotNull())
+             .join(F.broadcast(user_lookup), 'User-ID').join(F.broadcast(book_lookup), 'Book-Title')
+             .join(F.broadcast(isbn_lookup), 'ISBN', 'left')
+             .select('row', 'user_code', 'book_code', F.coalesce('isbn_code', F.lit(-1)).alias('isbn_code'),
+                     F.col('Book-Rating').alias('rating'))
+             .orderBy('row').toPandas())
+
+    # Metadata of every ISBN is taken from its first row
+    first = (ratings.where(F.col('ISBN').isNotNull())
+             .groupBy('ISBN').agg(F.min(F.struct('row', 'Book-Author', 'Image-URL-M')).alias('first'))
+             .select('ISBN', F.col('first')['Book-Author'].alias('author'), F.col('first')['Image-URL-M'].alias('url'))
+             .toPandas())
+    positions = np.searchsorted(isbns, first['ISBN'].to_numpy(dtype=object))
+    authors, image_urls = np.empty(len(isbns), dtype=object), np.empty(len(isbns), dtype=object)
+    authors[positions], image_urls[positions] = _as_missing(first['author']), _as_missing(first['url'])
+
+    return {
+        'user_codes': coded['user_code'].to_numpy(dtype=np.int32),
+        'book_codes': coded['book_code'].to_numpy(dtype=np.int32),
+        'isbn_codes': coded['isbn_code'].to_numpy(dtype=np.int32),
+        'ratings': coded['rating'].to_numpy().astype(np.uint8),
+        'user_ids': np.asarray(user_ids),
+        'book_titles': np.asarray(book_titles, dtype=object),
+        'isbns': np.asarray(isbns, dtype=object),
+        'authors': authors,
+        'image_urls': image_urls,
+    }
+
+
+def _codes_frame(spark, table, rows=None):
+    """
+    Spark DataFrame of the integer columns of a ratings table, one row per rating.
+    """
+    rows = np.arange(len(table['ratings'])) if rows is None else np.asarray(rows)
+
+    return spark.createDataFrame(pd.DataFrame({
+        'row': rows.astype(np.int64),
+        'user_code': np.asarray(table['user_codes'])[rows],
+        'book_code': np.asarray(table['book_codes'])[rows],
+        'isbn_code': np.asarray(table['isbn_codes'])[rows],
+        'rating': np.asarray(table['ratings'])[rows].astype(np.int32),
+    }))
+
+
+def spark_filter_ratings(spark, table, min_user_ratings=200, min_book_ratings=50):
+    """
+    filter_ratings (see ratings.py) with the count thresholds applied in Spark: users
+    with min_user_ratings ratings, then books with min_book_ratings ratings among them.
+    The kept rows are collected in table order and their codes compacted.
+
+    Returns:
+        dict: Filtered ratings table with the same layout.
+    """
+    from pyspark.sql import functions as F
+
+    coded = _codes_frame(spark, table)
+    users = coded.groupBy('user_code').count().where(F.col('count') >= min_user_ratings).select('user_code')
+    kept = coded.join(users, 'user_code')
+    books = kept.groupBy('book_code').count().where(F.col('count') >= min_book_ratings).select('book_code')
+    kept = kept.join(books, 'book_code').orderBy('row').select('user_code', 'book_code', 'isbn_code', 'row').toPandas()
+
+    # Unused users, titles and ISBNs are dropped, codes keep the sorted order
+    filtered = {}
+    for codes, ids in (('user_codes', 'user_ids'), ('book_codes', 'book_titles'), ('isbn_codes', 'isbns')):
+        values = kept[codes[:-1]].to_numpy()
+        used = np.unique(values)
+        filtered[codes] = np.searchsorted(used, values).astype(np.int32)
+        filtered[ids] = np.asarray(table[ids])[used]
+        if ids == 'isbns':
+            filtered['authors'] = np.asarray(table['authors'])[used]
+            filtered['image_urls'] = np.asarray(table['image_urls'])[used]
+    filtered['ratings'] = np.asarray(table['ratings'])[kept['row'].to_numpy()]
+
+    return {name: filtered[name] for name in ('user_codes', 'book_codes', 'isbn_codes', 'ratings', 'user_ids',
+                                              'book_titles', 'isbns', 'authors', 'image_urls')}
+
+
+def spark_user_item_bundle(spark, table):
+    """
+    table_user_item_bundle (see ratings.py) with the repeated (user, book) ratings
+    averaged in Spark. The cells are collected sorted by row then column, which is the
+    CSR layout, so the matrix is assembled without another sort.
+    """
+    from pyspark.sql import functions as F
+
+    shape = (len(table['user_ids']), len(table['book_titles']))
+    cells = (_codes_frame(spark, table).groupBy('user_code', 'book_code').agg(F.avg('rating').alias('rating'))
+             .where(F.col('rating') != 0).orderBy('user_code', 'book_code').toPandas())
+
+    indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(cells['user_code'].to_numpy(), minlength=shape[0]))
+    matrix = csr_matrix((cells['rating'].to_numpy(dtype=np.float64), cells['book_code'].to_numpy(dtype=np.int32),
+                         indptr), shape=shape)
+
+    return {
+        'matrix': matrix,
+        'user_ids': np.asarray(table['user_ids']),
+        'book_titles': np.asarray(table['book_titles']),
+    }
+
+
+def _score_rows(shared, n_rows, k, block_size, start):
+    """
+    Top-k cosine neighbours of one block of rows, run by a Spark task.
+    """
+    normalized, normalized_t = shared.value
+    rows = np.arange(start, min(start + block_size, n_rows))
+    block = safe_sparse_dot(normalized[rows], normalized_t, dense_output=True)
+
+    block_indices = top_k_rows(block, k, exclude=rows)
+    valid = block_indices >= 0
+    scores = np.where(valid, np.take_along_axis(block, np.maximum(block_indices, 0), axis=1), 0)
+
+    return start, block_indices.astype(np.int32), scores.astype(np.float32)
+
+
+def spark_top_k_cosine(spark, matrix, k, block_size=1024):
+    """
+    top_k_cosine (see similarity.py) with every block of rows scored by a Spark task.
+    The normalized matrix is broadcast once to the workers and only the top-k of each
+    block come back, so the result is the one of the threaded version.
+
+    Returns:
+        tuple: (indices, scores) arrays of shape (n_rows, k), nearest first.
+    """
+    normalized = normalize(matrix.tocsr(), norm='l2', axis=1)
+    n_rows = normalized.shape[0]
+    k = min(k, max(n_rows - 1, 0))
+    shared = spark.sparkContext.broadcast((normalized, normalized.T.tocsr()))
+
+    indices = np.full((n_rows, k), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, k), dtype=np.float32)
+    try:
+        starts = list(range(0, n_rows, block_size))
+        blocks = spark.sparkContext.parallelize(starts, max(len(starts), 1))
+        for start, block_indices, block_scores in blocks.map(partial(_score_rows, shared, n_rows, k, block_size)).toLocalIterator():
+            indices[start:start + len(block_indices)] = block_indices
+            scores[start:start + len(block_scores)] = block_scores
+    finally:
+        shared.unpersist()
+
+    return indices, scores
+
+
+def spark_train_als(spark, table, rows, params, seed=42):
+    """
+    Trains the implicit-feedback ALS model of als.py with Spark MLlib on some rows of a
+    ratings table. The strengths are those of confidence_matrix, summed per (user,
+    book), and Spark's confidence 1 + alpha * strength matches it. Spark scales the
+    regularization of every user and book by its number of interactions, so
+    regularization is divided by the mean number of interactions per user.
+
+    Returns:
+        tuple: float32 (user_factors, item_factors) arrays in matrix order, zeros for
+        the users and books without training interactions.
+    """
+    from pyspark.ml.recommendation import ALS
+    from pyspark.sql import functions as F
+
+    ratings = np.asarray(table['ratings'])[rows].astype(np.float32)
+    strength = np.where(ratings > 0, ratings, params['implicit_rating']) / 10
+    interactions = (spark.createDataFrame(pd.DataFrame({'user': np.asarray(table['user_codes'])[rows],
+                                                        'item': np.asarray(table['book_codes'])[rows],
+                                                        'strength': strength.astype(np.float64)}))
+                    .groupBy('user', 'item').agg(F.sum('strength').alias('strength')).cache())
+    n_users, n_books = len(table['user_ids']), len(table['book_titles'])
+    mean_interactions = interactions.count() / max(len(np.unique(np.asarray(table['user_codes'])[rows])), 1)
+
+    als = ALS(rank=params['n_factors'], maxIter=params['n_iterations'],
+              regParam=params['regularization'] / max(mean_interactions, 1), implicitPrefs=True,
+              alpha=params['alpha'], userCol='user', itemCol='item', ratingCol='strength', seed=seed)
+    model = als.fit(interactions)
+    interactions.unpersist()
+
+    factors = []
+    for frame, size in ((model.userFactors, n_users), (model.itemFactors, n_books)):
+        frame = frame.toPandas()
+        values = np.zeros((size, params['n_factors']), dtype=np.float32)
+        if len(frame):
+            values[frame['id'].to_numpy()] = np.stack(frame['features'].to_numpy()).astype(np.float32)
+        factors.append(values)
+
+    return tuple(factors)
+
+
+class SparkArtifactsBuilder:
+    """
+    Spark (local mode) backend of the artifacts pipeline. It runs the filter and its
+    count thresholds, the sparse matrix assembly, the exact top-k similarities and
+    the ALS training across the cores of one machine, spilling to
+    `local_dir` instead of materializing the cleaned dataset in pandas, and writes
+    the same array stores as the Helper stages it replaces. The other stages, and the
+    options Spark does not cover (square similarity matrix, approximate neighbour
+    indexes), run on the pandas path of the Helper.
+
+    Args:
+        helper (Helper): Helper whose config and remaining stages are used.
+        n_cores (int): Cores of the local Spark session, -1 for every core.
+        config (SparkBuilderConfig, optional): Spark settings.
+    """
+
+    def __init__(self, helper, n_cores=-1, config=None):
+        self.helper = helper
+        self.helper_config = helper.helper_config
+        self.n_cores = n_cores
+        self.config = config or SparkBuilderConfig()
+        self._spark = None
+
+    def __getstate__(self):
+        """
+        The Spark session stays in the process that started it.
+        """
+        state = self.__dict__.copy()
+        state['_spark'] = None
+        return state
+
+    @property
+    def spark(self):
+        """
+        Spark session, started on first use.
+        """
+        if self._spark is None:
+            self._spark = spark_session(self.n_cores, self.config)
+        return self._spark
+
+    def stop(self):
+        """
+        Stops the Spark session, the next stage starts a new one.
+        """
+        if self._spark is not None:
+            self._spark.stop()
+            self._spark = None
+
+    def read_ratings(self, file_path):
+        """
+        Reads the `data_columns` of a cleaned ratings file, parquet or CSV, as a Spark
+        DataFrame with a 'row' column in file order.
+        """
+        from pyspark.sql import functions as F
+
+        columns = self.helper_config.data_columns
+        if file_path.endswith('.parquet'):
+            ratings = self.spark.read.parquet(file_path)
+        else:
+            ratings = (self.spark.read.option('header', True).option('encoding', 'ISO-8859-1')
+                       .option('escape', '"').option('inferSchema', True).csv(file_path))
+        ratings = ratings.select(*[F.col(f"`{column}`") for column in columns])
+
+        return (ratings.withColumn('User-ID', F.col('`User-ID`').cast('long'))
+                .withColumn('Book-Rating', F.col('`Book-Rating`').cast('int'))
+                .withColumn('row', F.monotonically_increasing_id()))
+
+    def filter_file(self, file_path, min_user_ratings=200, min_book_ratings=50):
+        """
+        Encodes and filters a cleaned ratings file in Spark and saves the ratings table
+        and the filtered ratings, see Helper.filter_data.
+
+        Returns:
+        dict: The filtered ratings table.
+        """
+        logging.info(f"Encoding and filtering {file_path} with Spark")
+
+        try:
+            config = self.helper_config
+            ratings_table = spark_encode_ratings(self.spark, self.read_ratings(file_path))
+            save_arrays(config.ratings_table_path, ratings_table)
+
+            logging.info(f"Extracting users with {min_user_ratings}+ ratings and books with {min_book_ratings}+ ratings")
+            final_filtered_data = spark_filter_ratings(self.spark, ratings_table, min_user_ratings=min_user_ratings,
+                                                       min_book_ratings=min_book_ratings)
+            logging.info(f"Final filtered data: {len(final_filtered_data['ratings'])} ratings, "
+                         f"{len(final_filtered_data['user_ids'])} users, {len(final_filtered_data['book_titles'])} books")
+
+            save_arrays(config.final_filtered_data_path, final_filtered_data,
+                        metadata={'min_user_ratings': min_user_ratings, 'min_book_ratings': min_book_ratings})
+            logging.info("Filtered data saved successfully")
+
+            return final_filtered_data
+
+        except Exception as e:
+            logging.error("Error occurred while filtering the data with Spark")
+            raise CustomException(e, sys)
+
+    def pivot_table_data(self, filtered_data):
+        """
+        Assembles the sparse user x book rating matrix in Spark, see Helper.pivot_table_data.
+        """
+        logging.info("Creating the sparse user-item matrix with Spark")
+
+        try:
+            user_item_matrix = spark_user_item_bundle(self.spark, filtered_data)
+            logging.info(f"User-item matrix shape: {user_item_matrix['matrix'].shape}, "
+                         f"stored ratings: {user_item_matrix['matrix'].nnz}")
+
+            save_arrays(self.helper_config.users_item_matrix_path, user_item_matrix)
+            logging.info("User-item matrix saved successfully")
+
+            return user_item_matrix
+
+        except Exception as e:
+            logging.error("Error occurred while creating the user-item matrix with Spark")
+            raise CustomException(e, sys)
+
+    def similarity_score(self, pivot_table, dtype='float64', top_k=None, block_size=1024, n_jobs=-1):
+        """
+        Top-k book similarities scored in Spark, see Helper.similarity_score. The square
+        matrix is written tile by tile into a memory-mapped file by the Helper instead.
+        """
+        if not top_k:
+            return self.helper.similarity_score(pivot_table, dtype=dtype, top_k=top_k, block_size=block_size,
+                                                n_jobs=n_jobs)
+
+        logging.info(f"Keeping the top {top_k} similarities of every book with Spark")
+
+        try:
+            indices, scores = spark_top_k_cosine(self.spark, pivot_table['matrix'].T.tocsr(), k=top_k,
+                                                 block_size=block_size)
+            similarity_score = {'indices': indices, 'scores': scores.astype(dtype)}
+            save_arrays(self.helper_config.similarity_scores_path, similarity_score,
+                        metadata={'dtype': dtype, 'top_k': top_k})
+            logging.info(f"Similarity scores saved successfully ({len(indices)} books)")
+
+            return similarity_score
+
+        except Exception as e:
+            logging.error("Error occurred while calculating similarity score with Spark")
+            raise CustomException(e, sys)
+
+    def _neighbour_table(self, matrix, n_neighbors, path, index_params, name):
+        """
+        Exact top-k neighbours of the rows of a matrix scored in Spark, saved with the
+        report of the exact index of the Helper.
+        """
+        logging.info(f"Calculating the top {n_neighbors} neighbours of every {name} with Spark")
+
+        try:
+            indices, scores = spark_top_k_cosine(self.spark, matrix, k=n_neighbors,
+                                                 block_size=index_params['block_size'])
+            neighbours = {'indices': indices, 'scores': scores}
+            save_arrays(path, neighbours, metadata={'backend': 'exact', 'index_params': index_params})
+            logging.info(f"{name.capitalize()} neighbours saved successfully")
+
+            return neighbours
+
+        except Exception as e:
+            logging.error(f"Error occurred while calculating the {name} neighbours with Spark")
+            raise CustomException(e, sys)
+
+    def user_neighbours(self, pivot_table, n_neighbors=20, block_size=1024, backend='exact', index_params=None):
+        """
+        Exact user neighbours scored in Spark, see Helper.user_neighbours. Approximate
+        indexes are built by the Helper.
+        """
+        if backend != 'exact':
+            return self.helper.user_neighbours(pivot_table, n_neighbors=n_neighbors, block_size=block_size,
+                                               backend=backend, index_params=index_params)
+
+        return self._neighbour_table(pivot_table['matrix'], n_neighbors, self.helper_config.user_neighbours_path,
+                                     dict(block_size=block_size, **(index_params or {})), 'user')
+
+    def item_neighbours(self, pivot_table, n_neighbors=20, block_size=1024, n_jobs=-1, backend='exact',
+                        index_params=None):
+        """
+        Exact book neighbours scored in Spark, see Helper.item_neighbours. Approximate
+        indexes are built by the Helper.
+        """
+        if backend != 'exact':
+            return self.helper.item_neighbours(pivot_table, n_neighbors=n_neighbors, block_size=block_size,
+                                               n_jobs=n_jobs, backend=backend, index_params=index_params)
+
+        return self._neighbour_table(pivot_table['matrix'].T.tocsr(), n_neighbors,
+                                     self.helper_config.item_neighbours_path,
+                                     dict(block_size=block_size, n_jobs=n_jobs, **(index_params or {})), 'book')
+
+    def als_model(self, final_filtered_data, params=None, seed=42, k=10):
+        """
+        Trains the ALS model with Spark MLlib on the training folds of Helper.als_model,
+        evaluates it on the same held-out fold and saves its factors in the same layout.
+
+        Returns:
+        dict: The exported factors, their test metrics are stored with them.
+        """
+        logging.info("Training the als model with Spark")
+
+        try:
+            folds = fold_assignment(len(final_filtered_data['ratings']), n_folds=5, seed=seed)
+            train_rows, test_rows = np.flatnonzero(folds != 0), np.flatnonzero(folds == 0)
+            params = dict(params or self.helper_config.als_params)
+
+            user_factors, item_factors = spark_train_als(self.spark, final_filtered_data, train_rows, params, seed=seed)
+            factors = {'user_factors': user_factors, 'item_factors': item_factors}
+
+            metrics = ranking_metrics(partial(als_scores, factors), rated_pattern(final_filtered_data, train_rows),
+                                      final_filtered_data, test_rows, k=k)
+            logging.info(f"als test metrics: {metrics}")
+
+            als_factors = dict(factors, rated=table_rated_matrix(final_filtered_data))
+            save_arrays(self.helper_config.als_factors_path, als_factors,
+                        metadata=dict(params, seed=seed, backend='spark', **metrics))
+            logging.info("als factors saved successfully")
+
+            return als_factors
+
+        except Exception as e:
+            logging.error("Error occurred while training the als model with Spark")
+            raise CustomException(e, sys)
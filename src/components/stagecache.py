@@ -0,0 +1,483 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import inspect
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
+from typing import Callable
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from src.logger import logging
+from src.exception import CustomException
+from src.utils import save_object, load_object, file_checksum, artifacts_fingerprint, is_array_store, copy_array_store
+
+# Bumped when the layout of the cache entries or the key derivation changes
+STAGE_CACHE_VERSION = 1
+ENTRY_FILE = 'entry.json'
+
+
+@dataclass  # Decorator
+class StageCacheConfig:
+    """
+    Stores the location and the size budget of the stage cache:
+
+    1. `cache_dir`: One directory per stage and key, holding the stage outputs.
+    2. `checksums_path`: Content checksums of the input files, keyed by path, size and mtime.
+    3. `max_size_bytes`: Entries least recently used are evicted beyond this size.
+    """
+
+    cache_dir = os.path.join('artifacts', 'stage_cache')
+    checksums_path = os.path.join('artifacts', 'stage_cache', 'checksums.json')
+    max_size_bytes = 5 * 1024 ** 3
+
+
+@dataclass
+class Stage:
+    """
+    One step of a pipeline.
+
+    func is called with the values of the upstream stages named in inputs (keyword ->
+    stage name) and with params as keyword arguments. A stage either returns its value,
+    which is pickled into the cache, or writes artifacts to the paths in outputs, which
+    are copied into the cache; load then rebuilds the value from those artifacts.
+
+    Args:
+        name (str): Unique name of the stage.
+        func (callable): Does the work, a function or a bound method.
+        inputs (dict): Keyword argument -> name of the upstream stage providing it.
+        params (dict): Keyword arguments, part of the cache key (must be JSON serializable).
+        files (tuple): Input files read by func, part of the cache key by content.
+        outputs (tuple): Artifact paths (files or array stores) written by func.
+        load (callable, optional): Rebuilds the value of a stage with outputs.
+        code (tuple): Functions or modules func depends on, their source is part of the key.
+    """
+
+    name: str
+    func: Callable
+    inputs: dict = field(default_factory=dict)
+    params: dict = field(default_factory=dict)
+    files: tuple = ()
+    outputs: tuple = ()
+    load: Callable = None
+    code: tuple = ()
+
+
+def code_version(objects):
+    """
+    SHA-256 of the source code of functions, methods or modules.
+    """
+    digest = hashlib.sha256()
+    for obj in objects:
+        digest.update(inspect.getsource(getattr(obj, '__func__', obj)).encode())
+    return digest.hexdigest()
+
+
+def path_size(path):
+    """
+    Size of a file, or of every file under a directory, in bytes.
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def _store_entry(stage, entry, value):
+    """
+    Copies the outputs (or pickles the value) of a stage that just ran into its cache
+    entry. The entry is written under a temporary name and renamed once complete.
+    """
+    tmp_entry = entry + '.tmp'
+    shutil.rmtree(tmp_entry, ignore_errors=True)
+    os.makedirs(tmp_entry)
+
+    outputs = []
+    for position, output in enumerate(stage.outputs):
+        _copy_path(output, os.path.join(tmp_entry, 'outputs', str(position)))
+        outputs.append({'path': output, 'fingerprint': artifacts_fingerprint([output])})
+    if not stage.outputs:
+        save_object(os.path.join(tmp_entry, 'value.pkl'), value)
+
+    with open(os.path.join(tmp_entry, ENTRY_FILE), 'w') as file_obj:
+        json.dump({'stage': stage.name, 'params': stage.params, 'created_at': datetime.now().isoformat(),
+                   'outputs': outputs}, file_obj, indent=2, default=str)
+
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(tmp_entry, entry)
+
+
+def _given(value=None):
+    return value
+
+
+def _run_stage(stage, providers, entry):
+    """
+    Runs one stage in a worker process and caches its result when entry is given.
+
+    Returns:
+        tuple: The value when it is not cached and has no artifacts to be read back
+        from (None otherwise), the start and end times and the worker pid.
+    """
+    start = time.time()
+    try:
+        kwargs = {argument: provider() for argument, provider in providers.items()}
+        value = stage.func(**kwargs, **stage.params)
+        if entry is not None:
+            _store_entry(stage, entry, value)
+    except Exception as e:
+        # CustomException can not be pickled back to the parent process
+        raise RuntimeError(f"Stage {stage.name} failed: {e}") from None
+
+    returned = value if entry is None and not stage.outputs else None
+    return returned, start, time.time(), os.getpid()
+
+
+def _copy_path(source, target):
+    """
+    Copies a file or a directory over another one, file by file through a temporary
+    file and os.replace, so processes that still have the previous files open or
+    memory-mapped keep reading valid data. Array stores are copied with
+    copy_array_store, only the arrays of their manifest and the manifest last.
+    """
+    if is_array_store(source):
+        copy_array_store(source, target)
+        return
+
+    if os.path.isfile(source):
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        shutil.copy2(source, target + '.tmp')
+        os.replace(target + '.tmp', target)
+        return
+
+    os.makedirs(target, exist_ok=True)
+    for name in sorted(os.listdir(source)):
+        _copy_path(os.path.join(source, name), os.path.join(target, name))
+
+
+class StagePipeline:
+    """
+    Runs a DAG of stages with a content-addressed cache of their outputs.
+
+    The key of a stage is a hash of its name, code, parameters, input file contents and
+    the keys of its upstream stages, so it changes when anything the stage depends on
+    changes, directly or upstream. A stage whose key is in the cache is not run: its
+    artifacts are restored (only when they differ from the cached ones) and its value is
+    only loaded if a downstream stage has to run.
+
+    Args:
+        stages (list): Stages of the pipeline, in any order.
+        use_cache (bool): When False every stage runs and nothing is cached.
+        max_size_bytes (int, optional): Size budget of the cache, see StageCacheConfig.
+        n_workers (int): Number of worker processes, 1 runs every stage in this process,
+            -1 uses every core.
+    """
+
+    def __init__(self, stages, use_cache=True, max_size_bytes=None, n_workers=1):
+        self.cache_config = StageCacheConfig()
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage {stage.name!r}")
+            self.stages[stage.name] = stage
+        self.use_cache = use_cache
+        self.max_size_bytes = max_size_bytes or self.cache_config.max_size_bytes
+        self.n_workers = (os.cpu_count() or 1) if n_workers == -1 else n_workers
+        self._checksums = None
+
+    def order(self, targets=None):
+        """
+        Stages needed to build the targets (every stage by default), upstream first.
+        """
+        order, visiting = [], set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage {name!r}")
+            if name in visiting:
+                raise ValueError(f"Stage {name!r} depends on itself")
+            visiting.add(name)
+            for upstream in self.stages[name].inputs.values():
+                visit(upstream)
+            order.append(name)
+
+        for name in targets or self.stages:
+            visit(name)
+        return order
+
+    def file_fingerprint(self, file_path):
+        """
+        Content checksum of an input file. Checksums are remembered by path, size and
+        modification time, so an unchanged file is not read again.
+        """
+        if self._checksums is None:
+            self._checksums = {}
+            if os.path.isfile(self.cache_config.checksums_path):
+                with open(self.cache_config.checksums_path) as file_obj:
+                    self._checksums = json.load(file_obj)
+
+        stat = os.stat(file_path)
+        stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+        remembered = self._checksums.get(os.path.abspath(file_path))
+        if remembered is None or remembered['stamp'] != stamp:
+            remembered = {'stamp': stamp, 'sha256': file_checksum(file_path)}
+            self._checksums[os.path.abspath(file_path)] = remembered
+        return remembered['sha256']
+
+    def stage_key(self, stage, upstream_keys):
+        """
+        Cache key of a stage given the keys of its upstream stages.
+        """
+        payload = {
+            'version': STAGE_CACHE_VERSION,
+            'stage': stage.name,
+            'code': code_version((stage.func,) + tuple(stage.code)),
+            'params': stage.params,
+            'files': [self.file_fingerprint(file_path) for file_path in stage.files],
+            'inputs': {argument: upstream_keys[upstream] for argument, upstream in sorted(stage.inputs.items())},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def entry_path(self, stage, key):
+        return os.path.join(self.cache_config.cache_dir, stage.name, key)
+
+    def run(self, targets=None, force=()):
+        """
+        Runs the stages needed to build the targets, skipping the cached ones.
+
+        Keys only depend on upstream keys, so every cached stage is known and restored
+        before anything runs. With n_workers > 1 the other stages run in a process pool
+        as soon as their upstream stages are done, so independent stages (e.g. svd,
+        knn and the neighbour tables) build concurrently. Workers read the artifacts of
+        upstream stages from disk (memory-mapped) rather than receiving a copy.
+
+        Args:
+            targets (list, optional): Stages to build, every stage by default.
+            force (tuple): Stages that run even when cached, their entry is then replaced.
+
+        Returns:
+            list: One dict per stage, upstream first, with its 'stage', 'key', 'status'
+            ('cached' or 'ran'), 'start' and 'end' (seconds since the run started),
+            'seconds' and the pid of the 'worker' that ran it.
+        """
+        logging.info(f"Running the pipeline stages with {self.n_workers} worker(s)")
+
+        try:
+            order = self.order(targets)
+            keys, values, report = {}, {}, {}
+            run_start = time.time()
+
+            pending = []
+            for name in order:
+                stage = self.stages[name]
+                keys[name] = self.stage_key(stage, keys)
+                entry = self.entry_path(stage, keys[name])
+
+                if self.use_cache and name not in force and self._is_cached(entry):
+                    logging.info(f"Stage {name} is cached ({keys[name][:12]}), skipping it")
+                    start = time.time()
+                    self._restore(stage, entry)
+                    report[name] = self._timing(name, keys[name], 'cached', start, time.time(), run_start, os.getpid())
+                else:
+                    pending.append(name)
+
+            if self.n_workers > 1 and len(pending) > 1:
+                self._run_parallel(pending, keys, values, report, run_start)
+            else:
+                self._run_sequential(pending, keys, values, report, run_start)
+
+            if self.use_cache:
+                self._save_checksums()
+                self.evict(keep={self.entry_path(self.stages[name], keys[name]) for name in order})
+
+            return [report[name] for name in order]
+
+        except Exception as e:
+            logging.error("Error occurred while running the pipeline stages")
+            raise CustomException(e, sys)
+
+    def _run_sequential(self, pending, keys, values, report, run_start):
+        """
+        Runs the pending stages one after the other in this process, passing values in
+        memory and dropping them once every stage consuming them has run.
+        """
+        consumers = {name: sum(upstream == name for other in pending for upstream in self.stages[other].inputs.values())
+                     for name in keys}
+
+        for name in pending:
+            stage = self.stages[name]
+            logging.info(f"Running stage {name} ({keys[name][:12]})")
+            start = time.time()
+            kwargs = {argument: self._provider(upstream, keys, values)() for argument, upstream in stage.inputs.items()}
+            values[name] = stage.func(**kwargs, **stage.params)
+            if self.use_cache:
+                _store_entry(stage, self.entry_path(stage, keys[name]), values[name])
+            report[name] = self._timing(name, keys[name], 'ran', start, time.time(), run_start, os.getpid())
+
+            for upstream in stage.inputs.values():
+                consumers[upstream] -= 1
+                if consumers[upstream] == 0:
+                    values.pop(upstream, None)
+
+    def _run_parallel(self, pending, keys, values, report, run_start):
+        """
+        Runs the pending stages in a process pool, each one as soon as its upstream
+        stages are done.
+        """
+        waiting_on = {name: {upstream for upstream in self.stages[name].inputs.values() if upstream in pending}
+                      for name in pending}
+        running = {}
+
+        with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+            while waiting_on or running:
+                for name in [name for name, upstreams in waiting_on.items() if not upstreams]:
+                    stage = self.stages[name]
+                    logging.info(f"Submitting stage {name} ({keys[name][:12]})")
+                    providers = {argument: self._provider(upstream, keys, values)
+                                 for argument, upstream in stage.inputs.items()}
+                    entry = self.entry_path(stage, keys[name]) if self.use_cache else None
+                    running[executor.submit(_run_stage, stage, providers, entry)] = name
+                    del waiting_on[name]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    value, start, end, worker = future.result()
+                    if value is not None:
+                        values[name] = value
+                    report[name] = self._timing(name, keys[name], 'ran', start, end, run_start, worker)
+                    for upstreams in waiting_on.values():
+                        upstreams.discard(name)
+
+    def _timing(self, name, key, status, start, end, run_start, worker):
+        logging.info(f"Stage {name} {status} in {end - start:.2f} s")
+        return {'stage': name, 'key': key, 'status': status, 'start': start - run_start, 'end': end - run_start,
+                'seconds': end - start, 'worker': worker}
+
+    def critical_path(self, report):
+        """
+        Longest chain of dependent stages of a run, by the seconds each stage took: the
+        lower bound of the wall-clock time whatever the number of workers.
+
+        Returns:
+            tuple: The stage names of the chain, upstream first, and its total seconds.
+        """
+        seconds = {entry['stage']: entry['seconds'] for entry in report}
+        finish, previous = {}, {}
+        for entry in report:
+            name = entry['stage']
+            upstreams = [upstream for upstream in self.stages[name].inputs.values() if upstream in finish]
+            slowest = max(upstreams, key=lambda upstream: finish[upstream], default=None)
+            previous[name] = slowest
+            finish[name] = seconds[name] + (finish[slowest] if slowest else 0)
+
+        name = max(finish, key=finish.get)
+        total, path = finish[name], []
+        while name:
+            path.append(name)
+            name = previous[name]
+
+        return path[::-1], total
+
+    def format_report(self, report):
+        """
+        Per-stage timings of a run as text lines, followed by the wall-clock time and
+        the critical path.
+        """
+        lines = [f"{'stage':<16} {'status':<7} {'start s':>8} {'end s':>8} {'seconds':>8} {'worker':>8}"]
+        for entry in report:
+            lines.append(f"{entry['stage']:<16} {entry['status']:<7} {entry['start']:8.2f} {entry['end']:8.2f} "
+                         f"{entry['seconds']:8.2f} {entry['worker']:>8}")
+
+        path, total = self.critical_path(report)
+        lines.append(f"wall clock {max(entry['end'] for entry in report):.2f} s, "
+                     f"critical path {total:.2f} s: {' -> '.join(path)}")
+        return lines
+
+    def _is_cached(self, entry):
+        return os.path.isfile(os.path.join(entry, ENTRY_FILE))
+
+    def _provider(self, name, keys, values):
+        """
+        Zero-argument callable giving the value of an upstream stage: the value computed
+        in this run, the artifacts it wrote, or the value pickled in its cache entry.
+        """
+        if name in values:
+            return partial(_given, values[name])
+
+        stage = self.stages[name]
+        if stage.outputs:
+            return stage.load or _given
+        return partial(load_object, os.path.join(self.entry_path(stage, keys[name]), 'value.pkl'))
+
+    def _restore(self, stage, entry):
+        """
+        Puts the cached outputs of a skipped stage back in place, unless the artifacts
+        on disk already are the cached ones. Also marks the entry as recently used.
+        """
+        with open(os.path.join(entry, ENTRY_FILE)) as file_obj:
+            outputs = json.load(file_obj)['outputs']
+
+        for position, output in enumerate(outputs):
+            if artifacts_fingerprint([output['path']]) != output['fingerprint']:
+                logging.info(f"Restoring {output['path']} from the stage cache")
+                _copy_path(os.path.join(entry, 'outputs', str(position)), output['path'])
+
+        os.utime(os.path.join(entry, ENTRY_FILE))
+
+    def _save_checksums(self):
+        if self._checksums is None:
+            return
+        os.makedirs(os.path.dirname(self.cache_config.checksums_path), exist_ok=True)
+        with open(self.cache_config.checksums_path + '.tmp', 'w') as file_obj:
+            json.dump(self._checksums, file_obj)
+        os.replace(self.cache_config.checksums_path + '.tmp', self.cache_config.checksums_path)
+
+    def entries(self):
+        """
+        Every complete cache entry with its size and last use, least recently used first.
+        """
+        entries = []
+        cache_dir = self.cache_config.cache_dir
+        if not os.path.isdir(cache_dir):
+            return entries
+
+        for stage_name in os.listdir(cache_dir):
+            stage_dir = os.path.join(cache_dir, stage_name)
+            if not os.path.isdir(stage_dir):
+                continue
+            for key in os.listdir(stage_dir):
+                entry = os.path.join(stage_dir, key)
+                if self._is_cached(entry):
+                    entries.append({'path': entry, 'size': path_size(entry),
+                                    'last_used': os.path.getmtime(os.path.join(entry, ENTRY_FILE))})
+
+        return sorted(entries, key=lambda entry: entry['last_used'])
+
+    def evict(self, keep=()):
+        """
+        Removes the least recently used entries until the cache fits in max_size_bytes.
+        Entries in keep (those of the current run) are never removed.
+
+        Returns:
+            int: Number of bytes freed.
+        """
+        entries = self.entries()
+        total = sum(entry['size'] for entry in entries)
+        freed = 0
+
+        for entry in entries:
+            if total - freed <= self.max_size_bytes:
+                break
+            if entry['path'] in keep:
+                continue
+            logging.info(f"Evicting {entry['path']} ({entry['size'] / 1e6:.1f} MB) from the stage cache")
+            shutil.rmtree(entry['path'], ignore_errors=True)
+            freed += entry['size']
+
+        logging.info(f"Stage cache size: {(total - freed) / 1e6:.1f} MB")
+        return freed
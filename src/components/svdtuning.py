@@ -0,0 +1,328 @@
+import os
+import sys
+import json
+import time
+import math
+import hashlib
+import itertools
+from functools import partial
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from scipy.sparse import coo_matrix
+from surprise import Dataset, Reader, SVD
+
+from src.logger import logging
+from src.exception import CustomException
+from src.utils import load_object, artifacts_fingerprint
+from src.components.ratings import ratings_frame
+from src.components.factors import export_svd_factors, svd_scores
+from src.components.scoring import top_k_rows
+from src.components.stagecache import code_version
+
+# Grid of the GridSearchCV run in the recommendationsystem notebook (81 configurations)
+DEFAULT_PARAM_GRID = {
+    'n_factors': [20, 50, 100],
+    'n_epochs': [10, 20, 30],
+    'lr_all': [0.002, 0.005, 0.01],
+    'reg_all': [0.02, 0.1, 0.2],
+}
+
+
+@dataclass  # Decorator
+class SVDTuningConfig:
+    """
+    Stores the paths of the SVD tuning results:
+
+    1. `trials_dir`: One JSON file per finished trial, named by the hash of the trial.
+    2. `results_path`: Metrics of every trial of the last search, one row per trial and fold.
+    3. `best_params_path`: Best configuration of the last search and its mean metrics.
+    """
+
+    trials_dir = os.path.join('artifacts', 'svd_tuning', 'trials')
+    results_path = os.path.join('artifacts', 'svd_tuning', 'results.csv')
+    best_params_path = os.path.join('artifacts', 'svd_tuning', 'best_params.json')
+
+
+def param_configs(param_grid):
+    """
+    Every combination of a parameter grid, as a list of dicts.
+    """
+    names = sorted(param_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+
+
+def fold_assignment(n_ratings, n_folds, seed=42):
+    """
+    Assigns every rating to one of n_folds folds of (almost) equal size, reproducibly.
+    """
+    folds = np.empty(n_ratings, dtype=np.int32)
+    folds[np.random.default_rng(seed).permutation(n_ratings)] = np.arange(n_ratings) % n_folds
+    return folds
+
+
+def train_svd(table, rows, params, seed=42):
+    """
+    Trains a surprise SVD on some ratings of a ratings table.
+
+    Args:
+        table (dict): Filtered ratings table.
+        rows (np.ndarray): Positions of the training ratings in the table.
+        params (dict): SVD hyperparameters.
+        seed (int): Seed of the factor initialization and of the SGD order.
+
+    Returns:
+        tuple: The trained model and its trainset.
+    """
+    frame = ratings_frame(table, columns=["User-ID", "Book-Title", "Book-Rating"]).iloc[rows]
+    trainset = Dataset.load_from_df(frame, Reader(rating_scale=(0, 10))).build_full_trainset()
+
+    model = SVD(random_state=seed, **params)
+    model.fit(trainset)
+    return model, trainset
+
+
+def rated_pattern(table, rows):
+    """
+    Users x books pattern of some ratings of a ratings table, in matrix order.
+    """
+    shape = (len(table['user_ids']), len(table['book_titles']))
+    rated = coo_matrix((np.ones(len(rows), dtype=np.bool_),
+                        (np.asarray(table['user_codes'])[rows], np.asarray(table['book_codes'])[rows])), shape=shape).tocsr()
+    rated.sum_duplicates()
+    return rated
+
+
+def evaluate_factors(factors, table, test_rows, k=10, relevance_threshold=7, block_size=1024):
+    """
+    Evaluates SVD factors on held-out ratings.
+
+    RMSE and MAE compare the estimates of the held-out ratings with the ratings. The
+    ranking metrics rank every book a user did not rate in training, like the
+    recommender does, and count as relevant the held-out books the user rated at least
+    relevance_threshold. They are averaged over the users with a relevant book.
+
+    Args:
+        factors (dict): Factors exported by export_svd_factors, 'rated' holds the training
+            ratings only.
+        table (dict): Filtered ratings table the factors are aligned with.
+        test_rows (np.ndarray): Positions of the held-out ratings in the table.
+        k (int): Cut-off of the ranking metrics.
+        relevance_threshold (int): Lowest rating of a relevant book.
+        block_size (int): Number of users scored together.
+
+    Returns:
+        dict: 'rmse', 'mae', 'precision@k', 'recall@k', 'ndcg@k' and 'ranked_users'.
+    """
+    users = np.asarray(table['user_codes'])[test_rows].astype(np.int64)
+    books = np.asarray(table['book_codes'])[test_rows].astype(np.int64)
+    ratings = np.asarray(table['ratings'])[test_rows].astype(np.float64)
+
+    # Rating estimates of the held-out pairs
+    estimates = np.einsum('ij,ij->i', factors['user_factors'][users], factors['item_factors'][books])
+    estimates += factors['global_mean'] + factors['user_biases'][users] + factors['item_biases'][books]
+    estimates = np.clip(estimates, *factors['rating_bounds'])
+    errors = estimates - ratings
+
+    return dict({'rmse': float(np.sqrt(np.mean(errors ** 2))), 'mae': float(np.mean(np.abs(errors)))},
+                **ranking_metrics(partial(svd_scores, factors), factors['rated'], table, test_rows, k=k,
+                                  relevance_threshold=relevance_threshold, block_size=block_size))
+
+
+def ranking_metrics(score_users, rated, table, test_rows, k=10, relevance_threshold=7, block_size=1024):
+    """
+    Ranking metrics of any scoring model on held-out ratings: every book a user did not
+    rate in training is ranked, like the recommender does, and the held-out books the
+    user rated at least relevance_threshold are relevant. They are averaged over the
+    users with a relevant book.
+
+    Args:
+        score_users (callable): Maps an array of user rows to a new (n_users, n_books) score array.
+        rated (scipy.sparse.csr_matrix): Users x books pattern of the training ratings.
+        table (dict): Filtered ratings table the scores are aligned with.
+        test_rows (np.ndarray): Positions of the held-out ratings in the table.
+        k (int): Cut-off of the ranking metrics.
+        relevance_threshold (int): Lowest rating of a relevant book, 0 counts every
+            held-out interaction.
+        block_size (int): Number of users scored together.
+
+    Returns:
+        dict: 'precision@k', 'recall@k', 'ndcg@k' and 'ranked_users'.
+    """
+    users = np.asarray(table['user_codes'])[test_rows].astype(np.int64)
+    books = np.asarray(table['book_codes'])[test_rows].astype(np.int64)
+    ratings = np.asarray(table['ratings'])[test_rows].astype(np.float64)
+
+    # Relevant held-out books of every user, as a sorted (user, book) list
+    relevant = ratings >= relevance_threshold
+    relevant_users, relevant_books = users[relevant], books[relevant]
+    order = np.lexsort((relevant_books, relevant_users))
+    relevant_users, relevant_books = relevant_users[order], relevant_books[order]
+    ranked_users, n_relevant = np.unique(relevant_users, return_counts=True)
+
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    precision, recall, ndcg = [], [], []
+    n_books = len(table['book_titles'])
+    for start in range(0, len(ranked_users), block_size):
+        block_users = ranked_users[start:start + block_size]
+        scores = score_users(block_users)
+        rated_rows, rated_cols = rated[block_users].nonzero()
+        scores[rated_rows, rated_cols] = -np.inf
+        top = top_k_rows(scores, k)
+
+        # Whether each recommended book is relevant, through the sorted (user, book) keys
+        keys = relevant_users * n_books + relevant_books
+        top_keys = block_users[:, None] * n_books + np.where(top >= 0, top, -1)
+        positions = np.minimum(np.searchsorted(keys, top_keys), len(keys) - 1)
+        hits = (keys[positions] == top_keys) & (top >= 0)
+
+        block_relevant = n_relevant[start:start + block_size]
+        ideal = np.cumsum(discounts)[np.minimum(block_relevant, k) - 1]
+        precision.append(hits.sum(axis=1) / k)
+        recall.append(hits.sum(axis=1) / block_relevant)
+        ndcg.append((hits * discounts[:hits.shape[1]]).sum(axis=1) / ideal)
+
+    mean = lambda values: float(np.concatenate(values).mean()) if values else 0.0
+    return {
+        f'precision@{k}': mean(precision),
+        f'recall@{k}': mean(recall),
+        f'ndcg@{k}': mean(ndcg),
+        'ranked_users': int(len(ranked_users)),
+    }
+
+
+def run_trial(table_path, params, fold, n_folds, fraction, seed, k, relevance_threshold, trial_path=None):
+    """
+    Trains one configuration on the other folds (or a fraction of them) and evaluates it
+    on one fold. Runs in a worker process: the ratings table is opened memory-mapped
+    and the result is written to trial_path when given.
+
+    Returns:
+        dict: The trial settings, its metrics and the training 'seconds'.
+    """
+    start = time.time()
+    table = load_object(table_path)
+
+    folds = fold_assignment(len(table['ratings']), n_folds, seed)
+    train_rows = np.flatnonzero(folds != fold)
+    test_rows = np.flatnonzero(folds == fold)
+    if fraction < 1:
+        # Same subsample for every configuration of a rung
+        subsample = np.random.default_rng([seed, fold]).permutation(len(train_rows))
+        train_rows = np.sort(train_rows[subsample[:max(int(len(train_rows) * fraction), 1)]])
+
+    model, trainset = train_svd(table, train_rows, params, seed)
+    factors = export_svd_factors(model, trainset, np.asarray(table['user_ids']), np.asarray(table['book_titles']),
+                                 rated_pattern(table, train_rows))
+    metrics = evaluate_factors(factors, table, test_rows, k=k, relevance_threshold=relevance_threshold)
+
+    trial = dict(params=params, fold=fold, fraction=fraction, seed=seed, seconds=time.time() - start, **metrics)
+    if trial_path:
+        with open(trial_path + '.tmp', 'w') as file_obj:
+            json.dump(trial, file_obj, indent=2)
+        os.replace(trial_path + '.tmp', trial_path)
+    return trial
+
+
+def tune_svd(table_path, param_grid=None, n_folds=3, eta=3, n_rungs=3, n_workers=-1, seed=42, k=10,
+             relevance_threshold=7, use_cache=True):
+    """
+    Searches SVD hyperparameters with k-fold cross-validation and successive halving.
+
+    Every configuration is first trained on 1/eta^(n_rungs-1) of the training ratings of
+    every fold. Only the best 1/eta of the configurations by mean RMSE move to the next
+    rung, which trains on eta times more ratings, up to the full folds in the last rung.
+    Trials (configuration, fold, fraction) run in parallel in a process pool. Each one
+    is cached as a JSON file named by the hash of its settings, the ratings table and
+    the code, so a rerun only trains the trials it has not finished yet.
+
+    Args:
+        table_path (str): Array store of the filtered ratings table.
+        param_grid (dict, optional): Values of every SVD parameter, DEFAULT_PARAM_GRID by default.
+        n_folds (int): Number of cross-validation folds.
+        eta (int): Reduction factor between rungs.
+        n_rungs (int): Number of rungs, 1 evaluates every configuration on the full folds.
+        n_workers (int): Number of worker processes, -1 for every core.
+        seed (int): Seed of the folds, the subsamples and the SVD training.
+        k (int): Cut-off of the ranking metrics.
+        relevance_threshold (int): Lowest rating of a relevant book.
+        use_cache (bool): Reuse and write the cached trials.
+
+    Returns:
+        tuple: The results DataFrame (one row per trial), and the best parameters with
+        their mean metrics over the folds of the last rung.
+    """
+    logging.info("Tuning the svd hyperparameters")
+
+    try:
+        config = SVDTuningConfig()
+        os.makedirs(config.trials_dir, exist_ok=True)
+        n_workers = (os.cpu_count() or 1) if n_workers == -1 else n_workers
+
+        # Part of every trial key: the data, and the code that trains and evaluates
+        data_fingerprint = artifacts_fingerprint([table_path])
+        code = code_version((run_trial, train_svd, evaluate_factors, fold_assignment, rated_pattern))
+
+        def trial_path(params, fold, fraction):
+            payload = json.dumps({'params': params, 'fold': fold, 'n_folds': n_folds, 'fraction': fraction,
+                                  'seed': seed, 'k': k, 'relevance_threshold': relevance_threshold,
+                                  'data': data_fingerprint, 'code': code}, sort_keys=True)
+            return os.path.join(config.trials_dir, hashlib.sha256(payload.encode()).hexdigest() + '.json')
+
+        configs = param_configs(param_grid or DEFAULT_PARAM_GRID)
+        rows = []
+        for rung in range(n_rungs):
+            fraction = float(eta) ** (rung - n_rungs + 1)
+            logging.info(f"Rung {rung}: {len(configs)} configurations on {fraction:.3f} of the training ratings")
+
+            trials, tasks = [], []
+            for config_id, params in enumerate(configs):
+                for fold in range(n_folds):
+                    path = trial_path(params, fold, fraction)
+                    if use_cache and os.path.isfile(path):
+                        with open(path) as file_obj:
+                            trials.append(dict(json.load(file_obj), config=config_id, cached=True))
+                    else:
+                        tasks.append((config_id, (table_path, params, fold, n_folds, fraction, seed, k,
+                                                  relevance_threshold, path if use_cache else None)))
+            logging.info(f"Rung {rung}: {len(trials)} cached trials, {len(tasks)} to run")
+
+            if n_workers <= 1:
+                trials += [dict(run_trial(*arguments), config=config_id, cached=False) for config_id, arguments in tasks]
+            else:
+                with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                    futures = {executor.submit(run_trial, *arguments): config_id for config_id, arguments in tasks}
+                    for future in as_completed(futures):
+                        trials.append(dict(future.result(), config=futures[future], cached=False))
+
+            rung_rows = pd.DataFrame([dict(rung=rung, **{key: value for key, value in trial.items() if key != 'params'},
+                                           **trial['params']) for trial in trials])
+            rows.append(rung_rows)
+
+            # The best configurations by mean RMSE over the folds go to the next rung
+            mean_rmse = rung_rows.groupby('config')['rmse'].mean().sort_values(kind='stable')
+            if rung < n_rungs - 1:
+                keep = mean_rmse.index[:max(math.ceil(len(configs) / eta), 1)]
+                configs = [configs[config_id] for config_id in sorted(keep)]
+
+        results = pd.concat(rows, ignore_index=True)
+        metric_columns = ['rmse', 'mae', f'precision@{k}', f'recall@{k}', f'ndcg@{k}']
+        last = results[results['rung'] == n_rungs - 1]
+        summary = last.groupby('config')[metric_columns].mean().sort_values('rmse', kind='stable')
+        best = {'params': configs[int(summary.index[0])], 'rung': n_rungs - 1, 'n_folds': n_folds, 'seed': seed,
+                **{column: float(value) for column, value in summary.iloc[0].items()}}
+
+        # Saving the results
+        results = results.drop(columns='config')
+        results.to_csv(config.results_path, index=False)
+        with open(config.best_params_path, 'w') as file_obj:
+            json.dump(best, file_obj, indent=2)
+        logging.info(f"Best svd parameters {best['params']}: rmse {best['rmse']:.4f}, "
+                     f"{len(results)} trials written to {config.results_path}")
+
+        return results, best
+
+    except Exception as e:
+        logging.error("Error occurred while tuning the svd hyperparameters")
+        raise CustomException(e, sys)
@@ -1,28 +1,86 @@
+import os
+import json
+import argparse
 from src.components.helper import Helper
-from src.utils import load_object
+from src.components.stagecache import StagePipeline
+from src.logger import logging
+
+
+def read_params(value):
+    '''
+    Parameters given as a JSON string or as a JSON file, with the tuned parameters of a
+    tuning results file under 'params'.
+    '''
+    if os.path.isfile(value):
+        with open(value) as file_obj:
+            params = json.load(file_obj)
+        return params.get('params', params)
+    return json.loads(value)
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the recommender artifacts")
+    parser.add_argument('--delta', default=None,
+                        help="Cleaned ratings file (parquet or csv) to fold into the existing artifacts "
+                             "instead of rebuilding them")
+    parser.add_argument('--svd-epochs', type=int, default=3,
+                        help="Epochs the svd factors are trained for from the previous ones, with --delta")
+    parser.add_argument('--svd-params', type=read_params, default=None,
+                        help='SVD hyperparameters as JSON, e.g. \'{"n_factors": 50}\', or a JSON file such as the '
+                             'best_params.json written by svdtuningpipeline, merged over the defaults')
+    parser.add_argument('--als-iterations', type=int, default=3,
+                        help="Iterations the als factors are trained for from the previous ones, with --delta")
+    parser.add_argument('--als-backend', choices=['auto', 'numpy', 'implicit'], default=None,
+                        help="Backend the als factors are trained with from the previous ones, with --delta; the "
+                             "backend of the previous build by default, required after --builder spark")
+    parser.add_argument('--als-params', type=read_params, default=None,
+                        help='Implicit-feedback ALS hyperparameters as JSON, e.g. \'{"n_factors": 32, "alpha": 20}\', '
+                             'merged over the defaults')
+    parser.add_argument('--similarity-dtype', choices=['float64', 'float32', 'float16'], default='float64',
+                        help="Type of the stored book similarities")
+    parser.add_argument('--similarity-top-k', type=int, default=None,
+                        help="Keep only the top-k similarities of every book instead of the square matrix")
+    parser.add_argument('--precompute-top-n', type=int, default=20,
+                        help="Number of recommendations precomputed for every user, answers any top_n up to it")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Run every stage, without reading or writing the stage cache")
+    parser.add_argument('--workers', type=int, default=4,
+                        help="Worker processes running independent stages concurrently (1 runs them in turn, -1 uses every core)")
+    parser.add_argument('--builder', choices=['pandas', 'spark'], default='pandas',
+                        help="Runs the filter, pivot, similarity, neighbours and als stages on pandas/NumPy or on a "
+                             "local Spark session (needs pyspark and a Java runtime)")
+    parser.add_argument('--spark-cores', type=int, default=-1,
+                        help="Cores of the local Spark session with --builder spark, -1 uses every core")
+    args = parser.parse_args()
+
     ##Artifacts
-    #Create object of the helper class
-    helper_obj = Helper() 
-    
-    #Saving the filtered data file
-    helper_obj.filter_data()
-    
-    #Loading the filtered data        
-    books_dataset = load_object(file_path=helper_obj.helper_config.final_filtered_data_path)
-            
-    #Saving the pivot table data        
-    helper_obj.pivot_table_data(filtered_data=books_dataset)
-    
-    #Loading the pivot table 
-    books_titles = load_object(file_path=helper_obj.helper_config.users_item_matrix_path)
-    
-    #Saving the similarity_score data
-    helper_obj.similarity_score(pivot_table=books_titles)
-    
-    #Saving the knn model and book_pivot
-    helper_obj.knn_model(final_filtered_data= books_dataset)
-    
-    #Saving the svd model
-    helper_obj.svd_model(final_filtered_data= books_dataset)
+    if args.delta:
+        #Updating the existing artifacts with the new ratings only
+        helper_obj = Helper(load_data= False)
+        helper_obj.update_artifacts(delta_data_path= args.delta, svd_epochs= args.svd_epochs,
+                                    als_iterations= args.als_iterations, als_backend= args.als_backend)
+    else:
+        #Create object of the helper class, the filter stage reads the cleaned data itself
+        helper_obj = Helper(load_data= False)
+
+        #SVD hyperparameters
+        svd_params = dict(helper_obj.helper_config.svd_params, **(args.svd_params or {}))
+        als_params = dict(helper_obj.helper_config.als_params, **(args.als_params or {}))
+
+        #Running the filter, catalog, pivot, similarity, neighbours, knn, svd, als, cold start and recommendations stages,
+        #the stages whose inputs, parameters and code did not change are reused from the cache
+        similarity_params = {'dtype': args.similarity_dtype, 'top_k': args.similarity_top_k}
+        recommendation_params = {'top_n': args.precompute_top_n}
+        stages = helper_obj.artifact_stages(svd_params= svd_params, similarity_params= similarity_params,
+                                            recommendation_params= recommendation_params, als_params= als_params,
+                                            builder= args.builder, spark_cores= args.spark_cores)
+
+        #The spark stages share one session, so they run in this process and Spark spreads them over the cores
+        n_workers = 1 if args.builder == 'spark' else args.workers
+        pipeline = StagePipeline(stages, use_cache= not args.no_cache, n_workers= n_workers)
+        report = pipeline.run()
+
+        #Wall-clock time of every stage and the critical path of the build
+        for line in pipeline.format_report(report):
+            logging.info(line)
+            print(line)
@@ -1,32 +1,31 @@
+import argparse
 from src.components.datacleaning import DataIngestion
+from src.components.stagecache import StagePipeline
+from src.logger import logging
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cleans the Books, Ratings and Users datasets")
+    parser.add_argument('--chunk-size', type=int, default=0,
+                        help="Stream the ratings in chunks of this many rows (0 loads them all at once)")
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet',
+                        help="Format of the cleaned dataset")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Run every stage, without reading or writing the stage cache")
+    parser.add_argument('--workers', type=int, default=4,
+                        help="Worker processes running independent stages concurrently (1 runs them in turn, -1 uses every core)")
+    args = parser.parse_args()
+    
     #Data Cleaning
     #Create a object for data cleaning/Ingestion class
     object_dataIngestion = DataIngestion()
     
-    #Loading the data sets
-    raw_books_df,raw_ratings_df,raw_users_df = object_dataIngestion.initiate_data_ingestion()
-    
-    #Spliting the laction feature
-    splitted_users_df = object_dataIngestion.split_location(users_df= raw_users_df)
-    
-    #Handling the nan values of books dataset
-    null_val_free_books_df = object_dataIngestion.handle_nullvalues_booksdataset(books_df= raw_books_df)
-    
-    #Dropping the urls of books
-    url_dropped_books_df = object_dataIngestion.remove_imageUrls(books_df= null_val_free_books_df)
-    
-    #Cleanning the year of publication feature
-    cleaned_year_of_publication_books_df = object_dataIngestion.clean_year_of_publication(books_df= url_dropped_books_df)
-    
-    #Merging all the cleaned datasets
-    merged_df = object_dataIngestion.megring_datasets(users_df= splitted_users_df,
-                                     ratings_df= raw_ratings_df,
-                                     books_df= cleaned_year_of_publication_books_df)
-    
-    #Cleaning the age feature of the data set
-    cleaned_merged_df = object_dataIngestion.handling_age_nan_values(final_merged_df= merged_df)
+    #Reading, spliting the location, cleaning the books, merging, imputing the age and saving,
+    #the stages whose raw files and code did not change are reused from the cache
+    stages = object_dataIngestion.cleaning_stages(chunk_size= args.chunk_size, file_format= args.format)
+    pipeline = StagePipeline(stages, use_cache= not args.no_cache, n_workers= args.workers)
+    report = pipeline.run()
     
-    #Saving the cleaned file
-    object_dataIngestion.save_cleaned_csv(df=cleaned_merged_df)
\ No newline at end of file
+    #Wall-clock time of every stage and the critical path of the cleaning
+    for line in pipeline.format_report(report):
+        logging.info(line)
+        print(line)
@@ -0,0 +1,33 @@
+import json
+import argparse
+from src.utils import load_object
+from src.components.recommendationservice import load_test, request_json
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load tests a running recommendation service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32, help="Number of concurrent keep-alive connections")
+    parser.add_argument('--top-n', type=int, default=5)
+    parser.add_argument('--method', choices=['cosine', 'svd', 'hybrid', 'als'], default=None)
+    parser.add_argument('--skew', type=float, default=1.1,
+                        help="Zipf exponent of the user popularity, 0 requests users uniformly")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    #Users known to the service, read from the same artifacts
+    user_item_matrix = load_object('artifacts/user_item_matrix')
+    user_ids = user_item_matrix['user_ids'] if isinstance(user_item_matrix, dict) else user_item_matrix.index.to_numpy()
+
+    #Sending the requests and reporting throughput and latency percentiles
+    result = load_test(args.host, args.port, user_ids, n_requests= args.requests, concurrency= args.concurrency,
+                       top_n= args.top_n, method= args.method, skew= args.skew, seed= args.seed)
+    print(f"requests={result['requests']} errors={result['errors']} concurrency={args.concurrency}")
+    print(f"throughput : {result['qps']:8.1f} requests/sec")
+    print(f"latency    : p50 {result['p50']:.2f} ms  p95 {result['p95']:.2f} ms  p99 {result['p99']:.2f} ms  "
+          f"max {result['max']:.2f} ms")
+
+    #Counters of the worker that answers the health check
+    _, health = request_json(args.host, args.port, '/health')
+    print(json.dumps(health, indent=2))
@@ -0,0 +1,23 @@
+import argparse
+from src.components.recommendationservice import serve
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves recommendations over HTTP from the artifacts")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000, help="Port to listen on, 0 picks a free one")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes sharing the socket and the memory-mapped artifacts, -1 for every core")
+    parser.add_argument('--score-threads', type=int, default=2, help="Batches scored concurrently per worker")
+    parser.add_argument('--max-batch', type=int, default=64,
+                        help="Largest number of requests scored together, 1 disables micro-batching")
+    parser.add_argument('--batch-wait-ms', type=float, default=2.0,
+                        help="Milliseconds a batch waits for more requests after its first one")
+    parser.add_argument('--cache-size', type=int, default=1024, help="Results kept in the LRU cache of every worker")
+    parser.add_argument('--method', choices=['cosine', 'svd', 'hybrid', 'als'], default='cosine',
+                        help="Method of the requests that do not name one")
+    args = parser.parse_args()
+
+    #Serving until interrupted, every worker loads the recommender from the artifacts
+    serve(host= args.host, port= args.port, n_workers= args.workers, score_threads= args.score_threads,
+          max_batch= args.max_batch, batch_wait= args.batch_wait_ms / 1000, cache_size= args.cache_size,
+          method= args.method)
@@ -0,0 +1,26 @@
+import json
+import argparse
+from src.components.helper import Helper
+from src.components.svdtuning import DEFAULT_PARAM_GRID
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tunes the svd hyperparameters on the filtered ratings")
+    parser.add_argument('--grid', type=json.loads, default=None,
+                        help='Parameter grid as JSON, e.g. \'{"n_factors": [20, 50]}\', merged over the notebook grid')
+    parser.add_argument('--folds', type=int, default=3, help="Number of cross-validation folds")
+    parser.add_argument('--eta', type=int, default=3, help="Only the best 1/eta configurations move to the next rung")
+    parser.add_argument('--rungs', type=int, default=3, help="Number of successive halving rungs (1 disables it)")
+    parser.add_argument('--workers', type=int, default=-1, help="Worker processes running the trials, -1 for every core")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--k', type=int, default=10, help="Cut-off of precision@k, recall@k and NDCG@k")
+    parser.add_argument('--no-cache', action='store_true', help="Retrain the trials that already finished")
+    args = parser.parse_args()
+
+    #Create object of the helper class, the filtered ratings are read from the artifacts
+    helper_obj = Helper(load_data= False)
+
+    #Searching the svd hyperparameters, results are written to artifacts/svd_tuning
+    best = helper_obj.tune_svd(param_grid= dict(DEFAULT_PARAM_GRID, **(args.grid or {})), n_folds= args.folds,
+                               eta= args.eta, n_rungs= args.rungs, n_workers= args.workers, seed= args.seed,
+                               k= args.k, use_cache= not args.no_cache)
+    print(json.dumps(best, indent=2))
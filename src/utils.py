@@ -1,12 +1,21 @@
 import os
 import sys
+import json
+import hashlib
 import pandas as pd
 import numpy as np
 import pickle
+import shutil
+from datetime import datetime
+from scipy.sparse import csr_matrix, issparse
 
 from src.logger import logging
 from src.exception import CustomException
 
+# Version of the array store layout written by save_arrays
+ARTIFACT_STORE_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+
 def save_object(file_path,object):
     try:
         dir_path = os.path.dirname(file_path)
@@ -20,10 +29,207 @@ def save_object(file_path,object):
         raise CustomException(e,sys)
 
 def load_object(file_path):
+    '''
+    Loads an artifact saved with save_arrays (memory-mapped) or save_object (pickle).
+    A path without extension falls back to the legacy "<path>.pkl" pickle file.
+    '''
     try:
+        if is_array_store(file_path):
+            return load_arrays(file_path)
+
+        if not os.path.exists(file_path) and os.path.exists(file_path + '.pkl'):
+            file_path = file_path + '.pkl'
+
         with open(file_path,"rb") as file_obj:
             return pickle.load(file_obj)
 
     except Exception as e:
         logging.info("Error while loading the object")
-        raise CustomException(e,sys)
\ No newline at end of file
+        raise CustomException(e,sys)
+
+def artifact_exists(file_path):
+    '''
+    Checks whether an artifact exists as an array store or as a (legacy) pickle file.
+    '''
+    return is_array_store(file_path) or os.path.exists(file_path) or os.path.exists(file_path + '.pkl')
+
+def is_array_store(dir_path):
+    return os.path.isfile(os.path.join(dir_path, MANIFEST_FILE))
+
+def file_checksum(file_path):
+    '''
+    SHA-256 of a file, read in 1 MB chunks.
+    '''
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file_obj:
+        for chunk in iter(lambda: file_obj.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def create_array(dir_path, name, shape, dtype):
+    '''
+    Creates a memory-mapped .npy file in an array store, to be filled in place and then
+    saved with save_arrays under the same name, which moves it into the store instead
+    of copying it. Arrays larger than memory can be written tile by tile this way.
+    '''
+    os.makedirs(dir_path, exist_ok=True)
+    return np.lib.format.open_memmap(os.path.join(dir_path, f"{name}.npy.tmp"), mode='w+', dtype=dtype, shape=shape)
+
+def _write_array(dir_path, name, array):
+    '''
+    Writes one .npy file named after its content, "<name>.<sha256 prefix>.npy". A new
+    version of an array never overwrites the file the current manifest points to.
+    '''
+    tmp_path = os.path.join(dir_path, f"{name}.npy.tmp")
+    if isinstance(array, np.memmap) and array.filename == os.path.abspath(tmp_path):
+        # Filled in place (see create_array), only flushed and renamed
+        array.flush()
+    else:
+        with open(tmp_path, "wb") as file_obj:
+            np.save(file_obj, array, allow_pickle=False)
+    checksum = file_checksum(tmp_path)
+    file_name = f"{name}.{checksum[:16]}.npy"
+    os.replace(tmp_path, os.path.join(dir_path, file_name))
+
+    return {'file': file_name, 'dtype': array.dtype.str, 'shape': list(array.shape), 'sha256': checksum}
+
+def store_files(manifest):
+    '''
+    Names of the .npy files an array store manifest refers to.
+    '''
+    files = {entry['file'] for entry in manifest['arrays'].values() if 'file' in entry}
+    files |= {part['file'] for entry in manifest['arrays'].values() for part in entry.get('parts', {}).values()}
+    return files
+
+def _write_manifest(dir_path, manifest):
+    '''
+    Swaps in a new manifest, then removes the .npy files that neither it nor the
+    manifest it replaces refer to. The files of the previous version are kept until the
+    next save, so a reader that read the previous manifest can still open them.
+    '''
+    manifest_path = os.path.join(dir_path, MANIFEST_FILE)
+    keep = store_files(manifest)
+    if os.path.isfile(manifest_path):
+        keep |= store_files(read_manifest(dir_path))
+
+    with open(manifest_path + '.tmp', "w") as file_obj:
+        json.dump(manifest, file_obj, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    for file_name in os.listdir(dir_path):
+        if file_name.endswith('.npy') and file_name not in keep:
+            os.remove(os.path.join(dir_path, file_name))
+
+def save_arrays(dir_path, arrays, metadata=None):
+    '''
+    Saves a dictionary of numeric/string arrays and CSR matrices as an array store:
+    one .npy file per array plus a JSON manifest with the store version, shapes,
+    dtypes and a SHA-256 checksum of every file. String arrays are stored as fixed
+    width unicode so that they can be memory-mapped as well.
+
+    Array files are named after their content and the manifest is swapped in last, so
+    a reader sees either the previous store or the new one, never new arrays under the
+    previous manifest. The files of the previous version stay on disk until the next
+    save (see _write_manifest), so a rewritten store takes up to twice its size.
+    '''
+    try:
+        os.makedirs(dir_path, exist_ok=True)
+        manifest = {
+            'version': ARTIFACT_STORE_VERSION,
+            'created_at': datetime.now().isoformat(),
+            'metadata': metadata or {},
+            'arrays': {},
+        }
+
+        for name, value in arrays.items():
+            if issparse(value):
+                value = value.tocsr()
+                manifest['arrays'][name] = {
+                    'format': 'csr',
+                    'shape': list(value.shape),
+                    'parts': {part: _write_array(dir_path, f"{name}.{part}", getattr(value, part))
+                              for part in ('data', 'indices', 'indptr')},
+                }
+            else:
+                value = np.asanyarray(value)
+                if value.dtype == object:
+                    #Missing values (None, NaN) are stored as empty strings, not as 'None' or 'nan'
+                    value = np.where(pd.isna(value), '', value).astype(str)
+                manifest['arrays'][name] = dict(format='dense', **_write_array(dir_path, name, value))
+
+        # The manifest is written last, a store is only visible once it is complete
+        _write_manifest(dir_path, manifest)
+
+    except Exception as e:
+        logging.info("Error while saving the arrays")
+        raise CustomException(e,sys)
+
+def copy_array_store(source, target):
+    '''
+    Copies the arrays of a store over another store, the manifest last. Files already
+    in the target have the same content (their names are content hashes) and are not
+    copied again, and the files of older versions of the source are left behind.
+    '''
+    manifest = read_manifest(source)
+    os.makedirs(target, exist_ok=True)
+    for file_name in store_files(manifest):
+        if not os.path.isfile(os.path.join(target, file_name)):
+            shutil.copy2(os.path.join(source, file_name), os.path.join(target, file_name + '.tmp'))
+            os.replace(os.path.join(target, file_name + '.tmp'), os.path.join(target, file_name))
+    _write_manifest(target, manifest)
+
+def read_manifest(dir_path):
+    with open(os.path.join(dir_path, MANIFEST_FILE)) as file_obj:
+        return json.load(file_obj)
+
+def load_arrays(dir_path, mmap_mode='r', verify=False):
+    '''
+    Opens an array store written by save_arrays. Arrays are memory-mapped by default,
+    so every process serving the same files shares their pages through the OS page
+    cache. With verify=True every file is checked against its manifest checksum.
+    '''
+    try:
+        manifest = read_manifest(dir_path)
+        if manifest['version'] > ARTIFACT_STORE_VERSION:
+            raise ValueError(f"Unsupported artifact store version {manifest['version']} in {dir_path}")
+
+        def open_array(entry):
+            file_path = os.path.join(dir_path, entry['file'])
+            if verify and file_checksum(file_path) != entry['sha256']:
+                raise ValueError(f"Checksum mismatch for {file_path}")
+            return np.load(file_path, mmap_mode=mmap_mode, allow_pickle=False)
+
+        arrays = {}
+        for name, entry in manifest['arrays'].items():
+            if entry['format'] == 'csr':
+                parts = {part: open_array(part_entry) for part, part_entry in entry['parts'].items()}
+                arrays[name] = csr_matrix((parts['data'], parts['indices'], parts['indptr']),
+                                          shape=tuple(entry['shape']), copy=False)
+            else:
+                arrays[name] = open_array(entry)
+
+        return arrays
+
+    except Exception as e:
+        logging.info("Error while loading the arrays")
+        raise CustomException(e,sys)
+
+def artifacts_fingerprint(paths):
+    '''
+    Cheap fingerprint of a set of artifacts, used to detect that they changed on disk.
+    Array stores contribute their manifest (which holds every file checksum), pickle
+    files their modification time and size.
+    '''
+    digest = hashlib.sha256()
+    for path in paths:
+        if is_array_store(path):
+            with open(os.path.join(path, MANIFEST_FILE), "rb") as file_obj:
+                digest.update(file_obj.read())
+            continue
+
+        for candidate in (path, path + '.pkl'):
+            if os.path.isfile(candidate):
+                stat = os.stat(candidate)
+                digest.update(f"{candidate}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+
+    return digest.hexdigest()
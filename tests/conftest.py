@@ -0,0 +1,41 @@
+import os
+import pytest
+
+from tests.synthetic import make_synthetic_data
+from tests.legacy import build_legacy_artifacts
+
+
+@pytest.fixture(scope='module')
+def legacy_artifacts(tmp_path_factory):
+    """
+    Notebook-style artifacts of a small synthetic dataset, written to ./artifacts of a
+    scratch directory the tests of the module run in.
+    """
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(tmp_path_factory.mktemp('legacy'))
+        data = make_synthetic_data(n_users=300, n_books=800, seed=42)
+        yield build_legacy_artifacts(data)
+
+
+@pytest.fixture(scope='module')
+def store_artifacts(tmp_path_factory):
+    """
+    Filtered ratings, catalog, user-item matrix, user neighbours and svd model built by
+    Helper from a small synthetic dataset, in ./artifacts of a scratch directory the
+    tests of the module run in.
+    """
+    from src.components.helper import Helper
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(tmp_path_factory.mktemp('store'))
+        data = make_synthetic_data(n_users=300, n_books=800, seed=42)
+        os.makedirs('artifacts')
+        data.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+
+        helper = Helper()
+        filtered = helper.filter_data()
+        helper.book_catalog(filtered_data=filtered)
+        pivot_table = helper.pivot_table_data(filtered_data=filtered)
+        helper.user_neighbours(pivot_table=pivot_table)
+        model = helper.svd_model(final_filtered_data=filtered)
+        yield {'helper': helper, 'filtered': filtered, 'pivot_table': pivot_table, 'model': model}
@@ -0,0 +1,52 @@
+import os
+import pandas as pd
+
+from src.utils import save_object
+
+
+def legacy_top_recommendations(final_filtered_data, user_item_matrix, user_similarity_matrix, user_id):
+    """
+    Reference copy of the original pandas loop in BookRecommendationSystem.get_top_recommendations.
+    """
+    similar_users_cs = user_similarity_matrix[user_id].sort_values(ascending=False)[1:6].index
+    books_rated_by_user = set(user_item_matrix.columns[user_item_matrix.loc[user_id] > 0])
+
+    recommended_books = {}
+    for sim_user in similar_users_cs:
+        sim_user_books = user_item_matrix.loc[sim_user]
+        for book, rating in sim_user_books.items():
+            if book not in books_rated_by_user and rating > 0:
+                recommended_books[book] = recommended_books.get(book, 0) + rating
+    recommended_books = sorted(recommended_books.items(), key=lambda x: x[1], reverse=True)[:5]
+
+    result = []
+    for book_data in recommended_books:
+        book_info = final_filtered_data[final_filtered_data['Book-Title'] == book_data[0]].iloc[0]
+        result.append({
+            "Title": book_info["Book-Title"],
+            "Author": book_info["Book-Author"],
+            "Image URL": book_info["Image-URL-M"]
+        })
+
+    return result
+
+
+def build_legacy_artifacts(data):
+    """
+    Writes the notebook-style artifacts (filtered data, dense user-item matrix and
+    dense user similarity matrix) to ./artifacts and returns them.
+    """
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    users = data.loc[data.groupby('User-ID')['Book-Rating'].transform('count') >= 200]
+    final_filtered_data = users.loc[users.groupby('Book-Title')['Book-Rating'].transform('count') >= 50]
+
+    user_item_matrix = final_filtered_data.pivot_table(index="User-ID", columns="Book-Title", values="Book-Rating", fill_value=0)
+    user_similarity_matrix = pd.DataFrame(cosine_similarity(user_item_matrix),
+                                          index=user_item_matrix.index, columns=user_item_matrix.index)
+
+    save_object(os.path.join('artifacts', 'final_filtered_data.pkl'), final_filtered_data)
+    save_object(os.path.join('artifacts', 'user_item_matrix.pkl'), user_item_matrix)
+    save_object(os.path.join('artifacts', 'user_similarity_matrix.pkl'), user_similarity_matrix)
+
+    return final_filtered_data, user_item_matrix, user_similarity_matrix
@@ -0,0 +1,142 @@
+import os
+import numpy as np
+import pandas as pd
+
+
+def make_synthetic_data(n_users=600, n_books=1500, ratings_per_user=(150, 450), seed=42, n_tastes=0, taste_boost=20.0):
+    """
+    Builds a synthetic dataset with the same columns as artifacts/cleaned_data.csv.
+
+    Book popularity follows a Zipf-like curve and around 60% of the ratings are
+    implicit zeros, which roughly matches the Book-Crossing distribution. With
+    n_tastes > 0 every user belongs to one of n_tastes reader communities and picks
+    the books of its community taste_boost times more often, which gives the
+    neighbourhood structure approximate indexes rely on.
+
+    Returns:
+        pandas DataFrame: Cleaned-data shaped ratings table.
+    """
+    rng = np.random.default_rng(seed)
+
+    popularity = 1.0 / np.arange(1, n_books + 1) ** 0.8
+    popularity /= popularity.sum()
+
+    # Separate stream, so n_tastes=0 gives the same data as before
+    tastes = np.random.default_rng(seed + 1).integers(0, max(n_tastes, 1), n_users)
+    book_tastes = np.arange(n_books) % max(n_tastes, 1)
+
+    user_ids, book_idx = [], []
+    for user in range(n_users):
+        n_ratings = rng.integers(*ratings_per_user)
+        user_ids.append(np.full(n_ratings, 1000 + user * 7))
+        p = popularity
+        if n_tastes:
+            p = popularity * np.where(book_tastes == tastes[user], taste_boost, 1.0)
+            p /= p.sum()
+        book_idx.append(rng.choice(n_books, size=n_ratings, replace=False, p=p))
+
+    user_ids = np.concatenate(user_ids)
+    book_idx = np.concatenate(book_idx)
+    ratings = np.where(rng.random(len(book_idx)) < 0.6, 0, rng.integers(1, 11, len(book_idx)))
+
+    countries = np.array(['usa', 'canada', 'united kingdom', 'germany', 'spain', 'australia'])
+    user_age = rng.integers(12, 80, n_users).astype(float)
+    user_country = countries[rng.integers(0, len(countries), n_users)]
+    user_pos = (user_ids - 1000) // 7
+
+    return pd.DataFrame({
+        'User-ID': user_ids,
+        'ISBN': np.char.add('isbn', book_idx.astype(str)),
+        'Book-Rating': ratings,
+        'Book-Title': np.char.add('Title ', book_idx.astype(str)),
+        'Book-Author': np.char.add('Author ', (book_idx % 400).astype(str)),
+        'Year-Of-Publication': 1950.0 + book_idx % 70,
+        'Publisher': np.char.add('Publisher ', (book_idx % 50).astype(str)),
+        'Image-URL-M': np.char.add('http://images.example.com/', np.char.add(book_idx.astype(str), '.jpg')),
+        'Age': user_age[user_pos],
+        'City': 'city',
+        'State': 'state',
+        'Country': user_country[user_pos],
+    })
+
+
+def make_raw_data(n_users=20000, n_books=30000, n_ratings=1000000, seed=42):
+    """
+    Writes synthetic Books.csv, Ratings.csv and Users.csv to ./notebooks/data, with the
+    quirks the cleaning stage handles: invalid years, missing authors, out-of-range and
+    missing ages, 1 to 4 part locations with 'n/a' states, and ratings of unknown books
+    and users.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join('notebooks', 'data'), exist_ok=True)
+
+    isbns = np.char.zfill(np.arange(n_books).astype(str), 9)
+    isbns = np.char.add(isbns, np.where(np.arange(n_books) % 7 == 0, 'X', '0'))
+    years = rng.integers(1900, 2010, n_books).astype(str).astype(object)
+    years[rng.random(n_books) < 0.02] = '0'
+    years[rng.random(n_books) < 0.001] = 'DK Publishing Inc'
+    authors = np.char.add('Author ', rng.integers(0, n_books // 3, n_books).astype(str)).astype(object)
+    authors[rng.random(n_books) < 0.001] = None
+    pd.DataFrame({
+        'ISBN': isbns,
+        'Book-Title': np.char.add('Title ', rng.integers(0, int(n_books * 0.9), n_books).astype(str)),
+        'Book-Author': authors,
+        'Year-Of-Publication': years,
+        'Publisher': np.char.add('Publisher ', rng.integers(0, 500, n_books).astype(str)),
+        'Image-URL-S': np.char.add('http://images.example.com/s/', isbns),
+        'Image-URL-M': np.char.add('http://images.example.com/m/', isbns),
+        'Image-URL-L': np.char.add('http://images.example.com/l/', isbns),
+    }).to_csv(os.path.join('notebooks', 'data', 'Books.csv'), index=False)
+
+    locations = np.array(['nyc, new york, usa', 'toronto, ontario, canada', 'london, n/a, united kingdom',
+                          'berlin, germany', 'madrid', 'porto, porto, porto, portugal', 'sydney, N/A, australia'])
+    ages = rng.integers(0, 120, n_users).astype(float)
+    ages[rng.random(n_users) < 0.4] = np.nan
+    pd.DataFrame({
+        'User-ID': np.arange(1, n_users + 1),
+        'Location': locations[rng.integers(0, len(locations), n_users)],
+        'Age': ages,
+    }).to_csv(os.path.join('notebooks', 'data', 'Users.csv'), index=False)
+
+    popularity = 1.0 / np.arange(1, n_books + 1) ** 0.9
+    popularity /= popularity.sum()
+    rating_isbns = isbns[rng.choice(n_books, size=n_ratings, p=popularity)].astype(object)
+    rating_isbns[rng.random(n_ratings) < 0.01] = '99999999X'
+    pd.DataFrame({
+        'User-ID': rng.integers(1, int(n_users * 1.05), n_ratings),
+        'ISBN': rating_isbns,
+        'Book-Rating': np.where(rng.random(n_ratings) < 0.6, 0, rng.integers(1, 11, n_ratings)),
+    }).to_csv(os.path.join('notebooks', 'data', 'Ratings.csv'), index=False)
+
+
+def build_artifacts(helper):
+    """
+    Runs the full artifacts pipeline with an existing Helper, in process.
+    """
+    filtered = helper.filter_data()
+    helper.book_catalog(filtered_data=filtered)
+    user_item_matrix = helper.pivot_table_data(filtered_data=filtered)
+    helper.similarity_score(pivot_table=user_item_matrix)
+    helper.user_neighbours(pivot_table=user_item_matrix)
+    helper.item_neighbours(pivot_table=user_item_matrix)
+    helper.knn_model(final_filtered_data=filtered)
+    helper.svd_model(final_filtered_data=filtered)
+    helper.als_model(final_filtered_data=filtered)
+
+
+def split_delta(data, seed):
+    """
+    Splits ratings into a base and a delta: the last tenth of the ratings of 2% of the
+    users, plus every rating of a few new users.
+    """
+    rng = np.random.default_rng(seed)
+    users = data['User-ID'].unique()
+    updated = rng.choice(users, max(len(users) // 50, 1), replace=False)
+    new_users = rng.choice(np.setdiff1d(users, updated), 5, replace=False)
+    position = data.groupby('User-ID').cumcount()
+    size = data.groupby('User-ID')['User-ID'].transform('size')
+    in_delta = (data['User-ID'].isin(updated) & (position >= 0.9 * size)) | data['User-ID'].isin(new_users)
+    print(f"base ratings={(~in_delta).sum()} delta ratings={in_delta.sum()} updated users={len(updated)} "
+          f"new users={len(new_users)}")
+
+    return data[~in_delta], data[in_delta]
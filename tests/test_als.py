@@ -0,0 +1,101 @@
+import os
+import numpy as np
+import pytest
+
+from src.utils import load_object, read_manifest
+from src.components.helper import Helper
+from src.components.recommender import BookRecommendationSystem
+from src.components.svdtuning import fold_assignment, rated_pattern, ranking_metrics
+from src.components.als import confidence_matrix, implicit_confidence, train_als, als_scores, _least_squares
+from tests.synthetic import make_synthetic_data, build_artifacts
+
+
+def make_table(n_users=120, n_books=150, n_ratings=4000, seed=0):
+    """
+    Small ratings table with encode_ratings' layout, 60% implicit 0 ratings.
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        'user_codes': rng.integers(0, n_users, n_ratings).astype(np.int32),
+        'book_codes': rng.integers(0, n_books, n_ratings).astype(np.int32),
+        'ratings': np.where(rng.random(n_ratings) < 0.6, 0, rng.integers(1, 11, n_ratings)).astype(np.uint8),
+        'user_ids': np.arange(n_users),
+        'book_titles': np.arange(n_books).astype(str).astype(object),
+    }
+
+
+def exact_user_factors(weights, Y, regularization):
+    """
+    Solves (Y^T C_u Y + reg I) x_u = Y^T C_u p_u for every user with confidence 1 + weight.
+    """
+    X = np.zeros((weights.shape[0], Y.shape[1]))
+    for user in range(weights.shape[0]):
+        confidence = np.ones(weights.shape[1])
+        row = weights[user]
+        confidence[row.indices] += row.data
+        preference = np.zeros(weights.shape[1])
+        preference[row.indices] = 1
+        A = (Y.T * confidence) @ Y + regularization * np.eye(Y.shape[1])
+        X[user] = np.linalg.solve(A, (Y.T * confidence) @ preference)
+    return X
+
+
+def test_conjugate_gradient_matches_exact_solve():
+    weights = confidence_matrix(make_table(), alpha=2.0)
+    Y = (np.random.default_rng(1).standard_normal((weights.shape[1], 8)) * 0.3).astype(np.float32)
+
+    X = np.zeros((weights.shape[0], 8), dtype=np.float32)
+    _least_squares(weights, X, Y, regularization=5.0, cg_steps=40, n_threads=2, block_size=32)
+
+    np.testing.assert_allclose(X, exact_user_factors(weights, Y.astype(np.float64), 5.0), atol=1e-4)
+
+
+def test_implicit_backend_solves_the_same_system():
+    implicit_als = pytest.importorskip('implicit.cpu.als')
+    weights = confidence_matrix(make_table(), alpha=2.0)
+    Y = (np.random.default_rng(1).standard_normal((weights.shape[1], 8)) * 0.3).astype(np.float32)
+
+    X = np.zeros((weights.shape[0], 8), dtype=np.float32)
+    implicit_als.least_squares(implicit_confidence(weights), X, Y, 5.0)
+
+    np.testing.assert_allclose(X, exact_user_factors(weights, Y.astype(np.float64), 5.0), atol=1e-4)
+
+
+def test_threads_give_the_same_factors():
+    weights = confidence_matrix(make_table(), alpha=2.0)
+
+    single = train_als(weights, n_factors=8, regularization=1.0, n_iterations=3, n_threads=1, backend='numpy')
+    threaded = train_als(weights, n_factors=8, regularization=1.0, n_iterations=3, n_threads=2, backend='numpy')
+
+    for a, b in zip(single, threaded):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_als_stage_metrics_and_serving(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('artifacts')
+    make_synthetic_data(n_users=300, n_books=800, seed=42, n_tastes=5, taste_boost=100.0).to_csv(
+        os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+    helper = Helper()
+    build_artifacts(helper)
+    table = load_object('artifacts/final_filtered_data')
+    params = helper.helper_config.als_params
+
+    # The stored metrics are those of the held-out fold, with the stage's factors
+    folds = fold_assignment(len(table['ratings']), n_folds=5, seed=42)
+    train_rows, test_rows = np.flatnonzero(folds != 0), np.flatnonzero(folds == 0)
+    weights = confidence_matrix(table, train_rows, alpha=params['alpha'], implicit_rating=params['implicit_rating'])
+    factors = dict(zip(('user_factors', 'item_factors'),
+                       train_als(weights, n_factors=params['n_factors'], regularization=params['regularization'],
+                                 n_iterations=params['n_iterations'], n_threads=1, backend='numpy')))
+    metrics = ranking_metrics(lambda user_indices: als_scores(factors, user_indices), rated_pattern(table, train_rows),
+                              table, test_rows, k=10, relevance_threshold=7)
+    assert read_manifest('artifacts/als_factors')['metadata']['ndcg@10'] == pytest.approx(metrics['ndcg@10'])
+
+    # Precomputed als lists are those of live scoring
+    helper.recommendation_table(pivot_table=load_object('artifacts/user_item_matrix'), top_n=20, n_jobs=1)
+    live = BookRecommendationSystem(cache_size=0, precomputed=False)
+    served = BookRecommendationSystem(cache_size=0)
+    assert 'als' in served.precomputed['methods']
+    for user_id in live.user_ids:
+        assert served.get_top_recommendations(user_id, method='als') == live.get_top_recommendations(user_id, method='als')
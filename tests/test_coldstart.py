@@ -0,0 +1,98 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics.pairwise import cosine_similarity
+
+from src.utils import load_object
+from src.components.helper import Helper
+from src.components.recommender import BookRecommendationSystem
+from src.components.coldstart import age_bands, clean_countries
+from src.components.scoring import top_k_indices
+from tests.synthetic import make_synthetic_data, build_artifacts
+
+
+@pytest.fixture(scope='module')
+def cold_start(tmp_path_factory):
+    """
+    Artifacts of a synthetic dataset plus new users with 2 to 12 ratings, who are
+    filtered out of the matrix and served from the cold-start arrays.
+    """
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(tmp_path_factory.mktemp('coldstart'))
+        data = make_synthetic_data(n_users=300, n_books=800, seed=42, n_tastes=10, taste_boost=100.0)
+        new_users = make_synthetic_data(n_users=100, n_books=800, ratings_per_user=(2, 13), seed=49, n_tastes=10,
+                                        taste_boost=100.0)
+        new_users['User-ID'] += 10 ** 6
+        new_users['Book-Rating'] = np.random.default_rng(42).integers(1, 11, len(new_users))
+        ratings = pd.concat([data, new_users])
+        os.makedirs('artifacts')
+        ratings.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+
+        helper = Helper()
+        build_artifacts(helper)
+        arrays = helper.cold_start_model(pivot_table=load_object('artifacts/user_item_matrix'))
+        yield arrays, ratings, BookRecommendationSystem(cache_size=0)
+
+
+def test_segment_scores_match_a_pandas_bayesian_average(cold_start):
+    arrays, ratings, recommender = cold_start
+    frame = ratings[ratings['Book-Title'].isin(recommender.book_titles) & (ratings['Book-Rating'] > 0)]
+    prior = 10
+    global_stats = frame.groupby('Book-Title')['Book-Rating'].agg(['sum', 'count'])
+    global_mean = global_stats['sum'].sum() / global_stats['count'].sum()
+    global_score = (prior * global_mean + global_stats['sum']) / (prior + global_stats['count'])
+    prior_scores = global_score.reindex(recommender.book_titles).fillna(global_mean).to_numpy()
+
+    for country_idx in range(len(arrays['countries'])):
+        for band in range(arrays['segment_books'].shape[1] - 1):
+            segment = frame[(clean_countries(frame['Country']) == arrays['countries'][country_idx])
+                            & (age_bands(frame['Age']) == band)]
+            stats = segment.groupby('Book-Title')['Book-Rating'].agg(['sum', 'count'])
+            stats = stats.reindex(recommender.book_titles, fill_value=0)
+            expected = (prior * prior_scores + stats['sum'].to_numpy()) / (prior + stats['count'].to_numpy())
+
+            books = arrays['segment_books'][country_idx, band]
+            np.testing.assert_allclose(arrays['segment_scores'][country_idx, band], expected[books], atol=1e-4)
+            assert arrays['segment_scores'][country_idx, band][0] == pytest.approx(expected.max(), abs=1e-4)
+
+
+def test_projected_neighbours_match_a_brute_force_search(cold_start):
+    arrays, _, recommender = cold_start
+    new_users = [user_id for user_id in np.setdiff1d(arrays['user_ids'], recommender.user_ids) if user_id >= 10 ** 6]
+    assert new_users
+
+    for user_id in new_users:
+        row = arrays['user_ratings'][np.searchsorted(arrays['user_ids'], user_id)]
+        similarity = cosine_similarity(row, recommender.rating_matrix).ravel()
+        similarity[similarity <= 0] = -np.inf
+        projected = np.asarray(arrays['normalized_items'][row.indices].T @ row.data).ravel()
+        projected[projected <= 0] = -np.inf
+        np.testing.assert_array_equal(top_k_indices(projected, 5), top_k_indices(similarity, 5))
+
+
+def test_every_cold_user_gets_top_n_books(cold_start):
+    arrays, _, recommender = cold_start
+    cold_users = list(np.setdiff1d(arrays['user_ids'], recommender.user_ids)) + [-1, -2]
+
+    for user_id in cold_users:
+        assert len(recommender.get_top_recommendations(user_id, top_n=5)) == 5
+
+
+def test_books_rated_0_are_not_recommended_back(cold_start):
+    _, ratings, recommender = cold_start
+    new_users = ratings[(ratings['User-ID'] >= 10 ** 6) & ratings['Book-Title'].isin(recommender.book_titles)
+                        & (ratings['Book-Rating'] > 0)]
+    new_user = new_users[new_users['User-ID'] == new_users['User-ID'].value_counts().index[0]]
+    visible = dict(zip(new_user['Book-Title'], new_user['Book-Rating']))
+    titles = [book['Title'] for book in recommender.cold_start_recommendations(top_n=10, n_neighbors=20,
+                                                                               ratings=visible)]
+
+    # The neighbours' favourite book, read by the user without a rating
+    with_implicit = dict(visible, **{titles[0]: 0})
+    implicit_titles = [book['Title'] for book in recommender.cold_start_recommendations(top_n=10, n_neighbors=20,
+                                                                                        ratings=with_implicit)]
+
+    assert titles[0] not in implicit_titles
+    # Implicit ratings do not change the neighbours, the other books keep their ranks
+    assert implicit_titles[:9] == titles[1:]
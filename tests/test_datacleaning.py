@@ -0,0 +1,133 @@
+import os
+import filecmp
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.components.datacleaning import DataIngestion, read_cleaned_data
+from src.components.stagecache import StagePipeline
+from src.components.helper import Helper
+from tests.synthetic import make_raw_data, make_synthetic_data
+
+
+def make_merged(n_rows=2000, seed=42):
+    """
+    Merged ratings with missing and out-of-range ages. Every age of rating 10 is
+    missing, so its group median is NaN and the year (then overall) median is used.
+    """
+    rng = np.random.default_rng(seed)
+    ages = rng.integers(0, 110, n_rows).astype(float)
+    ages[rng.random(n_rows) < 0.4] = np.nan
+    merged = pd.DataFrame({
+        'Book-Rating': rng.integers(0, 11, n_rows),
+        'Year-Of-Publication': rng.integers(1900, 2010, n_rows).astype(float),
+        'Age': ages,
+    })
+    merged.loc[merged['Book-Rating'] == 10, 'Age'] = np.nan
+
+    return merged
+
+
+def legacy_impute_ages(ingestion, merged):
+    """
+    Original row-wise imputation of handling_age_nan_values.
+    """
+    reference = ingestion.replace_out_of_range_ages(merged.copy())
+    rating_medians = reference.groupby('Book-Rating')['Age'].median()
+    year_medians = reference.groupby('Year-Of-Publication')['Age'].median()
+    overall_median = reference['Age'].median()
+
+    def impute_age(row):
+        if pd.notna(row['Age']):
+            return row['Age']
+        elif row['Book-Rating'] in rating_medians:
+            return rating_medians[row['Book-Rating']]
+        elif row['Year-Of-Publication'] in year_medians:
+            return year_medians[row['Year-Of-Publication']]
+        else:
+            return overall_median
+
+    reference['Age'] = reference.apply(impute_age, axis=1)
+    reference['Age'] = reference['Age'].fillna(overall_median)
+
+    return reference
+
+
+def test_age_imputation_matches_row_wise_apply():
+    ingestion = DataIngestion()
+    merged = make_merged()
+
+    expected = legacy_impute_ages(ingestion, merged)
+    imputed = ingestion.handling_age_nan_values(merged.copy())
+
+    pd.testing.assert_series_equal(imputed['Age'], expected['Age'])
+    assert imputed['Age'].notna().all()
+
+
+def legacy_extract_location(location):
+    """
+    Original per-row parsing of split_location, without its per-row logging.
+    """
+    parts = [part.strip() for part in str(location).split(',')]
+    city, state, country = "", "", ""
+    if len(parts) == 3:
+        city, state, country = parts
+    elif len(parts) == 2:
+        city, state, country = parts[0], "", parts[1]
+    elif len(parts) == 1:
+        city = parts[0]
+    if state.lower() == "n/a":
+        state = ""
+    return pd.Series([city, state, country])
+
+
+def test_split_location_matches_per_row_parsing():
+    # Every arity, padding, n/a state and a missing location
+    locations = np.array(['nyc, new york, usa', ' toronto ,ontario,  canada ', 'london, n/a, united kingdom',
+                          'berlin, germany', 'madrid', 'porto, porto, porto, portugal', 'sydney, N/A, australia',
+                          '', ',', 'a,,b', 'x, , y, z, w', 'n/a, n/a, n/a', 'paris, N/a', np.nan], dtype=object)
+    users = pd.DataFrame({'User-ID': np.arange(len(locations)), 'Location': locations, 'Age': 30.0})
+
+    expected = users['Location'].apply(legacy_extract_location)
+    split = DataIngestion().split_location(users.copy())
+
+    for position, column in enumerate(['City', 'State', 'Country']):
+        assert split[column].tolist() == expected[position].tolist(), column
+    assert 'Location' not in split.columns
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'parquet'])
+def test_streaming_cleaning_matches_batch_cleaning(tmp_path, monkeypatch, file_format):
+    monkeypatch.chdir(tmp_path)
+    make_raw_data(n_users=2000, n_books=3000, n_ratings=40000, seed=42)
+    ingestion = DataIngestion()
+    output = (ingestion.ingestion_config.cleaned_data_path if file_format == 'csv'
+              else ingestion.ingestion_config.cleaned_parquet_path)
+
+    # Chunks smaller than the ratings, so the medians are merged across chunks
+    StagePipeline(ingestion.cleaning_stages(chunk_size=7000, file_format=file_format), use_cache=False).run()
+    os.replace(output, output + '.streamed')
+    StagePipeline(ingestion.cleaning_stages(file_format=file_format), use_cache=False).run()
+
+    if file_format == 'csv':
+        assert filecmp.cmp(output, output + '.streamed', shallow=False)
+    else:
+        pd.testing.assert_frame_equal(read_cleaned_data(output + '.streamed'), read_cleaned_data(output))
+
+
+def test_parquet_holds_the_values_of_the_csv(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ingestion = DataIngestion()
+    data = make_synthetic_data(n_users=100, n_books=300, ratings_per_user=(5, 60), seed=42)
+    ingestion.save_cleaned_csv(data)
+    ingestion.save_cleaned_parquet(data)
+
+    # Helper prefers the parquet file, hiding it reads the CSV
+    parquet_data = Helper().data
+    os.replace(ingestion.ingestion_config.cleaned_parquet_path, 'hidden.parquet')
+    csv_data = Helper().data
+
+    # Text columns are categoricals in the parquet file
+    assert list(parquet_data.columns) == list(csv_data.columns)
+    for column in csv_data.columns:
+        assert parquet_data[column].to_numpy(dtype=object).tolist() == csv_data[column].to_numpy(dtype=object).tolist(), column
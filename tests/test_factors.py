@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from src.components.recommender import BookRecommendationSystem
+
+
+def test_svd_factors_pick_the_books_model_test_ranks_first(store_artifacts):
+    filtered, model = store_artifacts['filtered'], store_artifacts['model']
+    recommender = BookRecommendationSystem(method='svd')
+    user_ids = list(recommender.user_ids[:40])
+    titles = np.asarray(filtered['book_titles'])
+    rated_titles = pd.Series(titles[filtered['book_codes']]).groupby(
+        np.asarray(filtered['user_ids'])[filtered['user_codes']]).agg(set)
+
+    batched = {}
+    for chunk in recommender.get_top_recommendations_batch(user_ids, block_size=16):
+        batched.update(chunk)
+
+    for user_id in user_ids:
+        predictions = model.test([(user_id, title, 0) for title in titles if title not in rated_titles[user_id]])
+        expected = sorted(prediction.est for prediction in predictions)[::-1][:5]
+        books = recommender.get_top_recommendations(user_id)
+
+        # Ties between estimates may be ordered differently, so the estimates are compared
+        np.testing.assert_allclose([model.predict(user_id, book['Title']).est for book in books], expected, atol=1e-4)
+        assert batched[user_id] == books
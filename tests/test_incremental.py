@@ -0,0 +1,71 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.exception import CustomException
+from src.utils import load_object, save_arrays, read_manifest
+from src.components.helper import Helper
+from src.components.ratings import ratings_frame
+from tests.synthetic import make_synthetic_data, split_delta, build_artifacts
+
+NAMES = ('final_filtered_data', 'book_catalog', 'user_item_matrix', 'user_neighbours', 'item_neighbours',
+         'similarity_scores')
+
+
+def build_into(frame, directory):
+    os.makedirs('artifacts', exist_ok=True)
+    frame.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+    build_artifacts(Helper())
+    shutil.move('artifacts', directory)
+
+
+def test_update_matches_a_full_rebuild(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data = make_synthetic_data(n_users=300, n_books=800, seed=42, n_tastes=10, taste_boost=100.0)
+    base, delta = split_delta(data, 42)
+
+    build_into(pd.concat([base, delta]), 'full')
+    build_into(base, 'artifacts_base')
+    delta.to_csv('delta.csv', index=False)
+    shutil.copytree('artifacts_base', 'artifacts')
+    summary = Helper(load_data=False).update_artifacts(delta_data_path='delta.csv', svd_epochs=1, als_iterations=1)
+
+    full = {name: load_object(os.path.join('full', name)) for name in NAMES}
+    updated = {name: load_object(os.path.join('artifacts', name)) for name in NAMES}
+
+    assert summary['changed_users'] > 0
+    pd.testing.assert_frame_equal(ratings_frame(updated['final_filtered_data']).astype(str),
+                                  ratings_frame(full['final_filtered_data']).astype(str))
+    for key in full['book_catalog']:
+        assert np.array_equal(updated['book_catalog'][key], full['book_catalog'][key]), key
+    for key in ('user_ids', 'book_titles'):
+        assert np.array_equal(updated['user_item_matrix'][key], full['user_item_matrix'][key]), key
+    assert (updated['user_item_matrix']['matrix'] != full['user_item_matrix']['matrix']).nnz == 0
+
+    # Neighbours with equal similarity may come in another order, so the similarities are compared
+    for name in ('user_neighbours', 'item_neighbours'):
+        np.testing.assert_allclose(updated[name]['scores'], full[name]['scores'], atol=1e-6)
+    np.testing.assert_allclose(updated['similarity_scores']['similarity'], full['similarity_scores']['similarity'],
+                               atol=1e-6)
+
+
+def test_update_trains_the_als_factors_with_a_supported_backend(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    base, delta = split_delta(make_synthetic_data(n_users=300, n_books=800, seed=42), 42)
+    os.makedirs('artifacts')
+    base.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+    delta.to_csv('delta.csv', index=False)
+    build_artifacts(Helper())
+
+    # Factors stored like the Spark builder stores them
+    path = Helper(load_data=False).helper_config.als_factors_path
+    save_arrays(path, load_object(path), metadata=dict(read_manifest(path)['metadata'], backend='spark'))
+
+    with pytest.raises(CustomException, match="Unknown ALS backend 'spark'"):
+        Helper(load_data=False).update_artifacts(delta_data_path='delta.csv', svd_epochs=1, als_iterations=1)
+
+    Helper(load_data=False).update_artifacts(delta_data_path='delta.csv', svd_epochs=1, als_iterations=1,
+                                             als_backend='numpy')
+    assert read_manifest(path)['metadata']['backend'] == 'numpy'
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from src.components.matrix import user_item_bundle
+from src.components.neighbours import ExactIndex, IVFIndex, make_index
+from tests.synthetic import make_synthetic_data
+
+
+def recall(exact, found):
+    valid = exact >= 0
+    return ((exact[:, :, None] == found[:, None, :]) & valid[:, :, None]).any(axis=2).sum() / valid.sum()
+
+
+@pytest.fixture(scope='module')
+def matrix():
+    data = make_synthetic_data(n_users=400, n_books=600, ratings_per_user=(5, 150), seed=42, n_tastes=10,
+                               taste_boost=100.0)
+    return user_item_bundle(data)['matrix']
+
+
+@pytest.mark.parametrize('transpose', [False, True])
+def test_ivf_probing_every_list_is_exact(matrix, transpose):
+    rows = matrix.T.tocsr() if transpose else matrix
+    exact, _ = ExactIndex(block_size=64).fit(rows).query_all(10)
+
+    n_lists = len(IVFIndex().fit(rows).list_offsets) - 1
+    found, _ = IVFIndex(n_probe=n_lists, block_size=64).fit(rows).query_all(10)
+
+    # Up to ties between equal similarities
+    assert recall(exact, found) > 0.99
+
+
+def test_ivf_recall_grows_with_n_probe(matrix):
+    exact, _ = ExactIndex().fit(matrix).query_all(10)
+    recalls = [recall(exact, IVFIndex(n_probe=n_probe).fit(matrix).query_all(10)[0]) for n_probe in (1, 4, 16)]
+
+    assert recalls == sorted(recalls)
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        make_index('hnsw')
@@ -0,0 +1,45 @@
+import os
+import pytest
+
+from src.utils import load_object
+from src.components.helper import Helper
+from src.components.recommender import BookRecommendationSystem
+from tests.synthetic import make_synthetic_data, build_artifacts, split_delta
+
+CASES = [('cosine', 5), ('cosine', 20), ('svd', 5), ('svd', 20), ('hybrid', 5)]
+
+
+def assert_table_matches_live_scoring():
+    live = BookRecommendationSystem(cache_size=0, precomputed=False)
+    served = BookRecommendationSystem(cache_size=0)
+    user_ids = list(live.user_ids)
+    assert (served.precomputed['rows'] >= 0).any()
+
+    for method, top_n in CASES:
+        for user_id in user_ids:
+            assert (served.get_top_recommendations(user_id, top_n=top_n, method=method)
+                    == live.get_top_recommendations(user_id, top_n=top_n, method=method)), (method, top_n, user_id)
+
+    batched = {}
+    for chunk in served.get_top_recommendations_batch(user_ids, block_size=64, n_jobs=2, parallel_min_users=0):
+        batched.update(chunk)
+    assert batched == {user_id: live.get_top_recommendations(user_id) for user_id in user_ids}
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_precomputed_table_matches_live_scoring(tmp_path, monkeypatch, n_jobs):
+    monkeypatch.chdir(tmp_path)
+    data = make_synthetic_data(n_users=300, n_books=800, seed=42, n_tastes=10, taste_boost=100.0)
+    base, delta = split_delta(data, 42)
+    os.makedirs('artifacts')
+    base.to_csv(os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+    delta.to_csv('delta.csv', index=False)
+    helper = Helper()
+    build_artifacts(helper)
+    helper.recommendation_table(pivot_table=load_object('artifacts/user_item_matrix'), top_n=20, n_jobs=n_jobs)
+
+    assert_table_matches_live_scoring()
+
+    # The carried-over table, with the stale and new users scored live
+    Helper(load_data=False).update_artifacts(delta_data_path='delta.csv', svd_epochs=1)
+    assert_table_matches_live_scoring()
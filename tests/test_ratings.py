@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from src.components.matrix import user_item_bundle
+from src.components.catalog import build_book_catalog
+from src.components.ratings import (encode_ratings, filter_ratings, ratings_frame, table_book_catalog,
+                                    table_user_item_bundle)
+from tests.synthetic import make_synthetic_data
+
+
+@pytest.fixture(scope='module')
+def ratings():
+    # Users with 5 to 450 ratings, so every threshold keeps a different part of them
+    return make_synthetic_data(n_users=300, n_books=800, ratings_per_user=(5, 450), seed=42)
+
+
+def groupby_filter(data, min_user, min_book):
+    """
+    Original filter of the notebook, two groupby-transform counts.
+    """
+    users = data.loc[data.groupby('User-ID')['Book-Rating'].transform('count') >= min_user]
+    return users.loc[users.groupby('Book-Title')['Book-Rating'].transform('count') >= min_book]
+
+
+@pytest.mark.parametrize('min_user, min_book', [(200, 50), (10, 5)])
+def test_sparse_matrix_matches_dense_pivot(ratings, min_user, min_book):
+    filtered = groupby_filter(ratings, min_user, min_book)
+
+    dense = filtered.pivot_table(index='User-ID', columns='Book-Title', values='Book-Rating').fillna(0)
+    sparse = user_item_bundle(filtered)
+
+    assert np.array_equal(sparse['user_ids'], dense.index.to_numpy())
+    assert np.array_equal(sparse['book_titles'], dense.columns.to_numpy())
+    np.testing.assert_allclose(sparse['matrix'].toarray(), dense.to_numpy())
+
+
+@pytest.mark.parametrize('min_user, min_book', [(200, 50), (10, 5)])
+def test_filtered_table_matches_groupby_filter(ratings, min_user, min_book):
+    expected = groupby_filter(ratings, min_user, min_book)
+
+    table = filter_ratings(encode_ratings(ratings), min_user_ratings=min_user, min_book_ratings=min_book)
+
+    frame = ratings_frame(table)
+    for column in frame.columns:
+        assert frame[column].to_numpy(dtype=object).tolist() == expected[column].to_numpy(dtype=object).tolist(), column
+
+    catalog, expected_catalog = table_book_catalog(table), build_book_catalog(expected)
+    for key in catalog:
+        assert np.array_equal(catalog[key], expected_catalog[key].astype(str)), key
+
+    bundle, expected_bundle = table_user_item_bundle(table), user_item_bundle(expected)
+    assert np.array_equal(bundle['user_ids'], expected_bundle['user_ids'])
+    assert np.array_equal(bundle['book_titles'], expected_bundle['book_titles'])
+    assert (bundle['matrix'] != expected_bundle['matrix']).nnz == 0
+
+
+def test_rows_without_an_isbn_keep_the_metadata_aligned(ratings):
+    data = ratings.copy()
+    data['ISBN'] = data['ISBN'].astype(object)
+    data.loc[data.index[[0, 10]], 'ISBN'] = np.nan
+
+    table = encode_ratings(data)
+
+    # The metadata of every ISBN comes from its first row
+    first = data.dropna(subset=['ISBN']).drop_duplicates('ISBN').set_index('ISBN').sort_index()
+    assert table['isbns'].tolist() == first.index.tolist()
+    assert table['authors'].tolist() == first['Book-Author'].tolist()
+    assert table['image_urls'].tolist() == first['Image-URL-M'].tolist()
+
+    filtered = filter_ratings(table, min_user_ratings=1, min_book_ratings=1)
+    isbn_codes = np.asarray(filtered['isbn_codes'])
+    assert (isbn_codes == -1).sum() == 2
+    coded = isbn_codes[isbn_codes >= 0]
+    authors = first.loc[np.asarray(filtered['isbns'])[coded], 'Book-Author']
+    assert np.asarray(filtered['authors'])[coded].tolist() == authors.tolist()
@@ -0,0 +1,66 @@
+import os
+import asyncio
+import pytest
+
+from src.components.helper import Helper
+from src.components.recommender import BookRecommendationSystem
+from src.components.recommendationservice import RecommendationService
+from tests.synthetic import make_synthetic_data, build_artifacts
+
+
+@pytest.fixture(scope='module')
+def recommender(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(tmp_path_factory.mktemp('service'))
+        os.makedirs('artifacts')
+        make_synthetic_data(n_users=300, n_books=800, seed=42).to_csv(
+            os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+        build_artifacts(Helper())
+        yield BookRecommendationSystem(cache_size=0)
+
+
+def serve_requests(service, requests):
+    """
+    Sends the requests to the service concurrently on a fresh event loop.
+    """
+    async def run():
+        await service.start()
+        try:
+            return await asyncio.gather(*(service.route('GET', target) for target in requests))
+        finally:
+            await service.close()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('max_batch', [1, 64])
+def test_service_answers_like_the_recommender(recommender, max_batch):
+    service = RecommendationService(recommender=recommender, max_batch=max_batch)
+    user_ids = [int(user_id) for user_id in recommender.user_ids[:40]]
+
+    responses = serve_requests(service, [f'/recommendations?user_id={user_id}&top_n=7' for user_id in user_ids])
+
+    assert [status for status, _ in responses] == [200] * len(user_ids)
+    for user_id, (_, body) in zip(user_ids, responses):
+        assert body['recommendations'] == recommender.get_top_recommendations(user_id, top_n=7)
+    assert service.stats['errors'] == 0
+
+
+def test_concurrent_identical_requests_are_coalesced(recommender):
+    service = RecommendationService(recommender=recommender)
+    user_id = int(recommender.user_ids[0])
+
+    responses = serve_requests(service, [f'/recommendations?user_id={user_id}'] * 10)
+
+    assert all(body['recommendations'] == recommender.get_top_recommendations(user_id) for _, body in responses)
+    assert service.stats['coalesced'] == 9
+    assert service.stats['scored'] == 1
+
+
+def test_bad_requests_get_client_errors(recommender):
+    service = RecommendationService(recommender=recommender)
+
+    responses = serve_requests(service, ['/recommendations?user_id=-1', '/recommendations?user_id=abc',
+                                         '/recommendations?user_id=1&method=unknown', '/unknown'])
+
+    assert [status for status, _ in responses] == [404, 400, 400, 404]
@@ -0,0 +1,51 @@
+import os
+import pytest
+
+from src.utils import save_object
+from src.components.matrix import user_item_bundle
+from src.components.similarity import top_k_cosine
+from src.components.recommender import BookRecommendationSystem
+from tests.synthetic import make_synthetic_data
+from tests.legacy import build_legacy_artifacts, legacy_top_recommendations
+
+
+def test_recommendations_match_the_legacy_loop(legacy_artifacts):
+    final_filtered_data, user_item_matrix, user_similarity_matrix = legacy_artifacts
+    recommender = BookRecommendationSystem()
+
+    for user_id in user_item_matrix.index[:60]:
+        expected = legacy_top_recommendations(final_filtered_data, user_item_matrix, user_similarity_matrix, user_id)
+        assert recommender.get_top_recommendations(user_id) == expected
+        # Answered from the LRU cache the second time
+        assert recommender.get_top_recommendations(user_id) == expected
+
+
+@pytest.mark.parametrize('n_jobs, parallel_min_users', [(1, 4096), (2, 4096), (2, 0)])
+def test_batch_matches_per_user_recommendations(legacy_artifacts, n_jobs, parallel_min_users):
+    recommender = BookRecommendationSystem(cache_size=0)
+    user_ids = list(recommender.user_ids)
+    expected = {user_id: recommender.get_top_recommendations(user_id) for user_id in user_ids}
+
+    batched = {}
+    for chunk in recommender.get_top_recommendations_batch(user_ids, block_size=64, n_jobs=n_jobs,
+                                                           parallel_min_users=parallel_min_users):
+        batched.update(chunk)
+
+    assert batched == expected
+
+
+def test_neighbour_table_serves_the_legacy_recommendations(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    final_filtered_data, user_item_matrix, user_similarity_matrix = build_legacy_artifacts(
+        make_synthetic_data(n_users=300, n_books=800, seed=42))
+
+    # Sparse user-item matrix and top-k user neighbours in place of the dense artifacts
+    bundle = user_item_bundle(final_filtered_data)
+    indices, scores = top_k_cosine(bundle['matrix'], k=20)
+    save_object(os.path.join('artifacts', 'user_item_matrix.pkl'), bundle)
+    save_object(os.path.join('artifacts', 'user_neighbours.pkl'), {'indices': indices, 'scores': scores})
+    recommender = BookRecommendationSystem()
+
+    for user_id in user_item_matrix.index[:60]:
+        expected = legacy_top_recommendations(final_filtered_data, user_item_matrix, user_similarity_matrix, user_id)
+        assert recommender.get_top_recommendations(user_id) == expected
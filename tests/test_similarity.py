@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from scipy.sparse import random as sparse_random
+from sklearn.metrics.pairwise import cosine_similarity
+
+from src.components.scoring import top_k_rows
+from src.components.similarity import top_k_cosine, blocked_cosine_similarity
+
+
+@pytest.fixture(scope='module')
+def matrix():
+    # Integer ratings, so ties between neighbours are common
+    matrix = sparse_random(300, 120, density=0.08, format='csr', random_state=0)
+    matrix.data = np.ceil(matrix.data * 10)
+    return matrix
+
+
+@pytest.mark.parametrize('block_size, n_jobs', [(7, 1), (64, 2), (1024, 1)])
+def test_top_k_cosine_matches_the_full_matrix(matrix, block_size, n_jobs):
+    full = cosine_similarity(matrix)
+    expected = top_k_rows(full, 20, exclude=np.arange(matrix.shape[0]))
+
+    indices, scores = top_k_cosine(matrix, k=20, block_size=block_size, n_jobs=n_jobs)
+
+    assert np.array_equal(indices, expected)
+    np.testing.assert_allclose(scores, np.take_along_axis(full, np.maximum(expected, 0), axis=1) * (expected >= 0),
+                               rtol=1e-6)
+
+
+def test_item_neighbours_have_the_knn_model_similarities(matrix):
+    from sklearn.neighbors import NearestNeighbors
+
+    book_pivot = matrix.T.tocsr()
+    knn_model = NearestNeighbors(metric="cosine", algorithm="brute").fit(book_pivot)
+
+    _, scores = top_k_cosine(book_pivot, k=10, block_size=32, n_jobs=2)
+
+    # Neighbours with equal similarity may come in another order, so the similarities are compared
+    for idx in range(book_pivot.shape[0]):
+        distances, indices = knn_model.kneighbors(book_pivot[idx], n_neighbors=11)
+        expected = 1 - distances[0][indices[0] != idx][:10]
+        np.testing.assert_allclose(scores[idx], expected, atol=1e-5)
+
+
+@pytest.mark.parametrize('dtype, tolerance', [('float64', 1e-12), ('float32', 1e-6), ('float16', 1e-3)])
+def test_blocked_similarity_matches_sklearn(matrix, dtype, tolerance):
+    expected = cosine_similarity(matrix)
+
+    similarity = blocked_cosine_similarity(matrix, dtype=dtype, block_size=64, n_jobs=2)
+
+    assert similarity.dtype == np.dtype(dtype)
+    np.testing.assert_allclose(similarity.astype(np.float64), expected, atol=tolerance)
+
+
+def test_similarity_matrix_is_written_tile_by_tile_into_the_store(matrix, tmp_path):
+    from src.utils import create_array, save_arrays, load_arrays
+
+    path = str(tmp_path / 'similarity_scores')
+    out = create_array(path, 'similarity', (matrix.shape[0], matrix.shape[0]), 'float32')
+    save_arrays(path, {'similarity': blocked_cosine_similarity(matrix, out=out, block_size=50)})
+
+    np.testing.assert_allclose(load_arrays(path)['similarity'], cosine_similarity(matrix), atol=1e-6)
@@ -0,0 +1,56 @@
+import os
+import shutil
+import numpy as np
+import pytest
+
+from src.utils import load_object, read_manifest
+from src.components.helper import Helper
+from src.components.stagecache import StagePipeline
+from tests.synthetic import make_synthetic_data
+
+pytest.importorskip('pyspark')
+if shutil.which('java') is None and 'JAVA_HOME' not in os.environ:
+    pytest.skip("Spark needs a Java runtime", allow_module_level=True)
+
+NAMES = ('ratings_table', 'final_filtered_data', 'book_catalog', 'user_item_matrix', 'similarity_scores',
+         'user_neighbours', 'item_neighbours')
+
+
+def assert_same(first, second, name):
+    if isinstance(first, dict):
+        assert first.keys() == second.keys(), name
+        for key in first:
+            assert_same(first[key], second[key], f'{name}.{key}')
+    elif hasattr(first, 'nnz'):
+        assert first.shape == second.shape and (first != second).nnz == 0, name
+    elif first.dtype == object:
+        assert (first.astype(str) == second.astype(str)).all(), name
+    else:
+        assert first.dtype == second.dtype and np.array_equal(first, second), name
+
+
+def test_spark_builder_matches_the_pandas_stages(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('artifacts')
+    make_synthetic_data(n_users=300, n_books=800, seed=42).to_csv(os.path.join('artifacts', 'cleaned_data.csv'),
+                                                                   index=False)
+
+    results, ndcg = {}, {}
+    for builder in ('pandas', 'spark'):
+        helper = Helper(load_data=False)
+        stages = helper.artifact_stages(similarity_params={'top_k': 20}, builder=builder)
+        try:
+            StagePipeline(stages, use_cache=False, n_workers=1).run()
+        finally:
+            if builder == 'spark':
+                stages[0].func.__self__.stop()
+
+        results[builder] = {name: load_object(os.path.join('artifacts', name)) for name in NAMES}
+        results[builder]['recommendations'] = {key: value for key, value in
+                                               load_object(helper.helper_config.user_recommendations_path).items()
+                                               if key.startswith('cosine_')}
+        ndcg[builder] = read_manifest(helper.helper_config.als_factors_path)['metadata']['ndcg@10']
+
+    for name in NAMES + ('recommendations',):
+        assert_same(results['pandas'][name], results['spark'][name], name)
+    assert ndcg['spark'] >= 0.9 * ndcg['pandas']
@@ -0,0 +1,112 @@
+import os
+import pytest
+
+from src.components.stagecache import Stage, StagePipeline
+
+
+def read_number(file_path):
+    with open(file_path) as file_obj:
+        return int(file_obj.read())
+
+
+def scale(number, factor=2):
+    return number * factor
+
+
+def write_total(number, offset=0):
+    os.makedirs('artifacts', exist_ok=True)
+    with open(os.path.join('artifacts', 'total.txt'), 'w') as file_obj:
+        file_obj.write(str(number + offset))
+
+
+def make_stages(factor=2):
+    return [
+        Stage('source', read_number, params={'file_path': 'number.txt'}, files=('number.txt',), code=(read_number,)),
+        Stage('scale', scale, inputs={'number': 'source'}, params={'factor': factor}, code=(scale,)),
+        Stage('total', write_total, inputs={'number': 'scale'}, params={'offset': 1},
+              outputs=(os.path.join('artifacts', 'total.txt'),), code=(write_total,)),
+    ]
+
+
+def run(stages, **params):
+    return {entry['stage'] for entry in StagePipeline(stages, **params).run() if entry['status'] == 'ran'}
+
+
+def total():
+    with open(os.path.join('artifacts', 'total.txt')) as file_obj:
+        return file_obj.read()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open('number.txt', 'w') as file_obj:
+        file_obj.write('5')
+    return tmp_path
+
+
+def test_only_the_stages_whose_inputs_changed_run(workdir):
+    assert run(make_stages()) == {'source', 'scale', 'total'}
+    assert run(make_stages()) == set()
+
+    # A parameter reruns its stage and everything downstream
+    assert run(make_stages(factor=3)) == {'scale', 'total'}
+    assert total() == '16'
+    assert run(make_stages(factor=2)) == set()
+    assert total() == '11'
+
+    # So does the content of an input file
+    with open('number.txt', 'w') as file_obj:
+        file_obj.write('7')
+    assert run(make_stages()) == {'source', 'scale', 'total'}
+    assert total() == '15'
+
+
+def test_cached_outputs_are_restored(workdir):
+    run(make_stages())
+    os.remove(os.path.join('artifacts', 'total.txt'))
+
+    assert run(make_stages()) == set()
+    assert total() == '11'
+
+
+def test_without_cache_every_stage_runs(workdir):
+    run(make_stages())
+    assert run(make_stages(), use_cache=False) == {'source', 'scale', 'total'}
+
+
+def test_parallel_run_matches_a_sequential_run(workdir):
+    stages = make_stages() + [Stage('other', scale, inputs={'number': 'source'}, params={'factor': 5}, code=(scale,))]
+
+    assert run(stages, n_workers=2, use_cache=False) == {'source', 'scale', 'total', 'other'}
+    assert total() == '11'
+
+
+def test_artifact_stages_build_the_same_artifacts_in_worker_processes(tmp_path, monkeypatch):
+    import pickle
+    import numpy as np
+    from src.utils import load_object
+    from src.components.helper import Helper
+    from tests.synthetic import make_synthetic_data
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('artifacts')
+    make_synthetic_data(n_users=300, n_books=800, seed=42).to_csv(os.path.join('artifacts', 'cleaned_data.csv'),
+                                                                   index=False)
+    # Stages are pickled to the worker processes, code included
+    pickle.dumps(Helper(load_data=False).artifact_stages())
+
+    names = ('final_filtered_data', 'book_catalog', 'user_item_matrix', 'similarity_scores', 'user_neighbours',
+             'item_neighbours', 'book_pivot')
+    results = {}
+    for n_workers in (1, 2):
+        StagePipeline(Helper(load_data=False).artifact_stages(), use_cache=False, n_workers=n_workers).run()
+        results[n_workers] = {name: load_object(os.path.join('artifacts', name)) for name in names}
+
+    for name in names:
+        for key, value in results[1][name].items():
+            other = results[2][name][key]
+            if hasattr(value, 'nnz'):
+                assert (value != other).nnz == 0, (name, key)
+            else:
+                assert np.array_equal(value, other), (name, key)
@@ -0,0 +1,58 @@
+import os
+import numpy as np
+import pytest
+
+from src.utils import load_object
+from src.components.helper import Helper
+from src.components.svdtuning import fold_assignment, train_svd, run_trial, tune_svd
+from tests.synthetic import make_synthetic_data
+
+PARAMS = {'n_factors': 20, 'n_epochs': 5, 'lr_all': 0.005, 'reg_all': 0.1}
+
+
+@pytest.fixture(scope='module')
+def table_path(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(tmp_path_factory.mktemp('tuning'))
+        os.makedirs('artifacts')
+        make_synthetic_data(n_users=300, n_books=800, seed=42, n_tastes=10).to_csv(
+            os.path.join('artifacts', 'cleaned_data.csv'), index=False)
+        helper = Helper()
+        helper.filter_data()
+        yield helper.helper_config.final_filtered_data_path
+
+
+def test_trial_metrics_match_surprise(table_path):
+    from surprise import accuracy
+
+    table = load_object(table_path)
+    folds = fold_assignment(len(table['ratings']), 3, 42)
+    trial = run_trial(table_path, PARAMS, 0, 3, 1.0, 42, 10, 7)
+
+    model, _ = train_svd(table, np.flatnonzero(folds != 0), PARAMS, 42)
+    test_rows = np.flatnonzero(folds == 0)
+    testset = list(zip(np.asarray(table['user_ids'])[table['user_codes'][test_rows]].tolist(),
+                       np.asarray(table['book_titles'])[table['book_codes'][test_rows]].tolist(),
+                       table['ratings'][test_rows].astype(float).tolist()))
+    predictions = model.test(testset)
+
+    assert trial['rmse'] == pytest.approx(accuracy.rmse(predictions, verbose=False), abs=1e-6)
+    assert trial['mae'] == pytest.approx(accuracy.mae(predictions, verbose=False), abs=1e-6)
+
+
+def test_seeded_trial_is_reproducible(table_path):
+    first = run_trial(table_path, PARAMS, 1, 3, 1.0, 42, 10, 7)
+    second = run_trial(table_path, PARAMS, 1, 3, 1.0, 42, 10, 7)
+
+    assert all(first[key] == second[key] for key in ('rmse', 'mae', 'ndcg@10'))
+
+
+def test_cached_search_trains_nothing(table_path):
+    grid = {'n_factors': [5, 10], 'n_epochs': [3], 'lr_all': [0.005], 'reg_all': [0.1]}
+
+    first, best = tune_svd(table_path, param_grid=grid, n_folds=2, n_rungs=1, n_workers=1, use_cache=True)
+    cached, cached_best = tune_svd(table_path, param_grid=grid, n_folds=2, n_rungs=1, n_workers=1, use_cache=True)
+
+    assert (~first['cached']).sum() == len(first)
+    assert (~cached['cached']).sum() == 0
+    assert cached_best['params'] == best['params']
@@ -0,0 +1,65 @@
+import os
+import numpy as np
+from scipy.sparse import random as sparse_random
+
+from src.utils import save_arrays, load_arrays, read_manifest, create_array, store_files, copy_array_store
+
+
+def npy_files(dir_path):
+    return {name for name in os.listdir(dir_path) if name.endswith('.npy')}
+
+
+def test_array_store_round_trip(tmp_path):
+    path = str(tmp_path / 'store')
+    matrix = sparse_random(40, 30, density=0.1, format='csr', random_state=0)
+    titles = np.array(['a', 'bb', None, np.nan], dtype=object)
+    save_arrays(path, {'matrix': matrix, 'codes': np.arange(5, dtype=np.int32), 'titles': titles},
+                metadata={'top_k': 3})
+
+    arrays = load_arrays(path, verify=True)
+
+    assert (arrays['matrix'] != matrix).nnz == 0
+    assert np.array_equal(arrays['codes'], np.arange(5, dtype=np.int32))
+    assert arrays['titles'].tolist() == ['a', 'bb', '', '']
+    assert read_manifest(path)['metadata'] == {'top_k': 3}
+
+
+def test_rewrite_keeps_the_previous_version_readable(tmp_path):
+    path = str(tmp_path / 'store')
+    save_arrays(path, {'values': np.zeros(10)})
+    previous = read_manifest(path)
+    previous_values = np.load(os.path.join(path, previous['arrays']['values']['file']), mmap_mode='r')
+
+    save_arrays(path, {'values': np.ones(10)})
+
+    # The previous manifest's files are untouched, the new arrays live in new files
+    assert np.array_equal(previous_values, np.zeros(10))
+    assert np.array_equal(np.load(os.path.join(path, previous['arrays']['values']['file'])), np.zeros(10))
+    assert np.array_equal(load_arrays(path)['values'], np.ones(10))
+
+    # One save later only the current and previous versions are left
+    second = read_manifest(path)
+    save_arrays(path, {'values': np.full(10, 2.0)})
+    assert npy_files(path) == store_files(read_manifest(path)) | store_files(second)
+
+
+def test_created_array_is_moved_into_the_store(tmp_path):
+    path = str(tmp_path / 'store')
+    out = create_array(path, 'similarity', (4, 4), 'float32')
+    out[:] = np.eye(4)
+
+    save_arrays(path, {'similarity': out})
+
+    assert np.array_equal(load_arrays(path)['similarity'], np.eye(4))
+    assert not [name for name in os.listdir(path) if name.endswith('.tmp')]
+
+
+def test_copy_array_store_copies_the_current_version_only(tmp_path):
+    source, target = str(tmp_path / 'source'), str(tmp_path / 'target')
+    save_arrays(source, {'values': np.zeros(3)})
+    save_arrays(source, {'values': np.ones(3)})
+
+    copy_array_store(source, target)
+
+    assert npy_files(target) == store_files(read_manifest(source))
+    assert np.array_equal(load_arrays(target, verify=True)['values'], np.ones(3))